@@ -0,0 +1,43 @@
+#! /usr/bin/python
+"""
+bench_build_command.py
+
+Measures the rate at which commands can be built and sent to a serial
+port by each XBee series class.
+"""
+import struct, timeit
+from xbee import XBee, ZigBee
+
+class NullDevice(object):
+    """
+    A serial port which discards everything written to it
+    """
+    def write(self, data):
+        pass
+
+COMMANDS = [
+    (XBee, 'at', {'frame_id': b'A', 'command': b'MY'}),
+    (XBee, 'tx', {'dest_addr': b'\x12\x34', 'data': b'x' * 32}),
+    (ZigBee, 'remote_at', {'dest_addr_long': struct.pack('>Q', 1),
+                           'command': b'IS'}),
+    (ZigBee, 'tx', {'dest_addr_long': struct.pack('>Q', 1),
+                    'dest_addr': b'\xFF\xFE', 'data': b'x' * 32}),
+]
+
+def main():
+    print("%-8s %-10s %14s %14s" % ("class", "command", "builds/s", "sends/s"))
+    
+    for cls, cmd, fields in COMMANDS:
+        xbee = cls(NullDevice())
+        number = 20000
+        
+        build = min(timeit.repeat(lambda: xbee._build_command(cmd, **fields),
+                                  number=number, repeat=5))
+        send = min(timeit.repeat(lambda: xbee.send(cmd, **fields),
+                                 number=number, repeat=5))
+        
+        print("%-8s %-10s %14.0f %14.0f" % (
+            cls.__name__, cmd, number / build, number / send))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#! /usr/bin/python
+"""
+bench_escape.py
+
+Measures the throughput of APIFrame.escape() and APIFrame.unescape()
+(as used for API mode 2) for payloads containing few and many special
+bytes.
+"""
+import random, timeit
+from xbee.frame import APIFrame
+
+PAYLOAD_SIZE = 4096
+REPEAT = 5
+
+def make_payload(special_ratio, seed=0):
+    """
+    Builds a payload in which roughly the given fraction of bytes
+    must be escaped
+    """
+    rng = random.Random(seed)
+    special = bytearray(b'\x7E\x7D\x11\x13')
+    plain = bytearray(b for b in range(256) if b not in special)
+    
+    return bytes(bytearray(
+        rng.choice(special) if rng.random() < special_ratio
+        else rng.choice(plain)
+        for i in range(PAYLOAD_SIZE)))
+
+def throughput(func, data):
+    """
+    Returns the best throughput of func(data) in megabytes per second
+    """
+    number = 200
+    best = min(timeit.repeat(lambda: func(data), number=number, repeat=REPEAT))
+    return len(data) * number / best / 1e6
+
+def main():
+    print("%-12s %12s %12s" % ("special", "escape MB/s", "unescape MB/s"))
+    
+    for ratio in (0.0, 0.01, 0.1, 0.5, 1.0):
+        payload = make_payload(ratio)
+        escaped = APIFrame.escape(payload)
+        
+        print("%-12s %12.1f %12.1f" % (
+            "%d%%" % (ratio * 100),
+            throughput(APIFrame.escape, payload),
+            throughput(APIFrame.unescape, escaped)))
+
+if __name__ == '__main__':
+    main()
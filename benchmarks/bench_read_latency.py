@@ -0,0 +1,65 @@
+#! /usr/bin/python
+"""
+bench_read_latency.py
+
+Measures the latency between a frame arriving on a serial port and it
+being returned by XBeeBase, for each reader mode. A pipe stands in for
+the serial port, so that the 'select' and 'blocking' readers wait on
+a real file descriptor.
+"""
+import random, struct, threading, time
+from xbee.base import XBeeBase
+from xbee.frame import APIFrame
+from xbee.tests.Fake import FakePipeDevice
+
+FRAME_COUNT = 500
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def send_frames(device, sent_at):
+    """
+    Writes numbered frames to the fake port at irregular intervals
+    """
+    rng = random.Random(0)
+    
+    for seq in range(FRAME_COUNT):
+        time.sleep(rng.uniform(0, .004))
+        frame = APIFrame(b'\x90' + struct.pack('>I', seq)).output()
+        sent_at[seq] = time.time()
+        device.feed(frame)
+
+def measure(reader):
+    """
+    Returns (p50, p99, CPU seconds) for the given reader mode
+    """
+    device = FakePipeDevice(timeout=.1)
+    xbee = XBeeBase(device, reader=reader)
+    sent_at = {}
+    latencies = []
+    
+    writer = threading.Thread(target=send_frames, args=(device, sent_at))
+    cpu_start = time.process_time()
+    writer.start()
+    
+    for i in range(FRAME_COUNT):
+        frame = xbee._wait_for_frame()
+        seq = struct.unpack('>I', frame.data[1:])[0]
+        latencies.append(time.time() - sent_at[seq])
+        
+    writer.join()
+    cpu = time.process_time() - cpu_start
+    device.close()
+    
+    return percentile(latencies, .5), percentile(latencies, .99), cpu
+
+def main():
+    print("%-10s %10s %10s %10s" % ("reader", "p50 ms", "p99 ms", "CPU s"))
+    
+    for reader in XBeeBase.READERS:
+        p50, p99, cpu = measure(reader)
+        print("%-10s %10.3f %10.3f %10.3f" % (reader, p50 * 1e3, p99 * 1e3, cpu))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#! /usr/bin/python
+"""
+bench_records.py
+
+Compares the memory used per frame and the parse rate of each frame
+format. A lazy frame is only split when its fields are read, so its
+rate is measured both for reading only 'id' and for reading every field.
+"""
+import timeit, tracemalloc
+from xbee import XBee, ZigBee
+
+FRAMES = [
+    (XBee,   'rx',          b'\x81\x00\x01\x28\x00' + b'x' * 16),
+    (XBee,   'tx_status',   b'\x89\x01\x00'),
+    (ZigBee, 'rx',          b'\x90\x00\x13\xa2\x00@oG\xe4v\x1a\x01' + b'x' * 16),
+    (ZigBee, 'rx_explicit', b'\x91\x00\x13\xa2\x00@oG\xe4v\x1a\xe8\xe8'
+                            b'\x00\x11\xc1\x05\x01' + b'x' * 16),
+    (ZigBee, 'tx_status',   b'\x8b\x01\xff\xfe\x00\x00\x00'),
+]
+
+KEPT = 10000
+
+def memory_per_frame(xbee, data):
+    """
+    Returns the bytes allocated for each of many frames kept at once,
+    including their field values
+    """
+    # Compile the response first
+    xbee._split_response(data)
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    kept = [xbee._split_response(data) for i in range(KEPT)]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return size / float(KEPT)
+
+def read_id(xbee, data):
+    return xbee._split_response(data)['id']
+
+def read_all(xbee, data):
+    frame = xbee._split_response(data)
+    return [frame[name] for name in frame]
+
+def main():
+    print("%-8s %-12s %-7s %12s %14s %14s" % (
+        "class", "frame", "format", "bytes/frame", "id frames/s", 
+        "all frames/s"))
+    
+    for cls, name, data in FRAMES:
+        for frame_format in XBee.FRAME_FORMATS:
+            xbee = cls(None, frame_format=frame_format)
+            number = 20000
+            rates = []
+            
+            for read in (read_id, read_all):
+                elapsed = min(timeit.repeat(lambda: read(xbee, data),
+                                            number=number, repeat=5))
+                rates.append(number / elapsed)
+            
+            print("%-8s %-12s %-7s %12.0f %14.0f %14.0f" % (
+                cls.__name__, name, frame_format, 
+                memory_per_frame(xbee, data), rates[0], rates[1]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+#! /usr/bin/python
+"""
+bench_samples.py
+
+Measures the rate at which IO sample data is parsed, for a range of
+sample counts and channel masks.
+"""
+import os, timeit
+from xbee import XBee, ZigBee
+
+# (label, class, header mask bytes)
+MASKS = [
+    ('dio x9',       XBee,   b'\x01\xFF'),
+    ('adc x6',       XBee,   b'\x7E\x00'),
+    ('dio x9 adc x6', XBee,  b'\x7F\xFF'),
+    ('zb dio x4 adc x4', ZigBee, b'\x00\x0F\x0F'),
+]
+
+SAMPLE_COUNTS = [1, 16, 128, 255]
+
+def main():
+    print("%-18s %8s %14s %14s" % ("masks", "samples", "frames/s", "samples/s"))
+    
+    for label, cls, masks in MASKS:
+        xbee = cls(None)
+        
+        for count in SAMPLE_COUNTS:
+            header = bytearray([count]) + masks
+            layout = xbee.sample_format.read_header(bytes(header))[1]
+            data = bytes(header) + os.urandom(layout.sample_size * count)
+            number = max(10, 20000 // count)
+            
+            elapsed = min(timeit.repeat(lambda: xbee._parse_samples(data),
+                                        number=number, repeat=5))
+            
+            print("%-18s %8d %14.0f %14.0f" % (
+                label, count, number / elapsed, number * count / elapsed))
+
+if __name__ == '__main__':
+    main()
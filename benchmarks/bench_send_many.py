@@ -0,0 +1,73 @@
+#! /usr/bin/python
+"""
+bench_send_many.py
+
+Measures the time taken to send the same tx payload to many ZigBee
+destinations: with a send() per destination, and with send_many(),
+both without responses (frame_id 0) and with a frame ID allocated to
+each destination while any are free (as with request() per
+destination), the rest being sent with frame_id 0.
+"""
+import struct, timeit
+from xbee import ZigBee
+from xbee.pending import PendingRequests
+
+class CountingDevice(object):
+    """
+    A serial port which counts its writes and discards what is written
+    """
+    def __init__(self):
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+
+PAYLOAD = b'x' * 64
+
+def main():
+    print("%-8s %-13s %-10s %12s %10s" % (
+        "escaped", "method", "responses", "us/dest", "writes"))
+
+    for escaped in (False, True):
+        device = CountingDevice()
+        xbee = ZigBee(device, escaped=escaped)
+
+        def send_each(addresses, responses):
+            if responses:
+                # Every frame ID is needed for each round
+                xbee._requests = PendingRequests()
+                free = 256 - PendingRequests.FIRST_FRAME_ID
+                for addr in addresses[:free]:
+                    xbee.request('tx', dest_addr_long=addr,
+                                 dest_addr=b'\xFF\xFE', data=PAYLOAD)
+                for addr in addresses[free:]:
+                    xbee.send('tx', frame_id=b'\x00', dest_addr_long=addr,
+                              dest_addr=b'\xFF\xFE', data=PAYLOAD)
+            else:
+                for addr in addresses:
+                    xbee.send('tx', frame_id=b'\x00', dest_addr_long=addr,
+                              dest_addr=b'\xFF\xFE', data=PAYLOAD)
+
+        def send_many(addresses, responses):
+            if responses:
+                xbee._requests = PendingRequests()
+                xbee.send_many('tx', addresses, dest_addr=b'\xFF\xFE', 
+                               data=PAYLOAD)
+            else:
+                xbee.send_many('tx', addresses, frame_id=b'\x00',
+                               dest_addr=b'\xFF\xFE', data=PAYLOAD)
+
+        for count, responses in ((500, False), (500, True)):
+            addresses = [struct.pack('>Q', 0x0013A20040000000 + i)
+                         for i in range(count)]
+
+            for method in (send_each, send_many):
+                device.writes = 0
+                elapsed = min(timeit.repeat(
+                    lambda: method(addresses, responses), number=20, repeat=5))
+                print("%-8s %-13s %-10s %12.2f %10d" % (
+                    escaped, method.__name__, responses, 
+                    elapsed / 20 / count * 1e6, device.writes // 100))
+
+if __name__ == '__main__':
+    main()
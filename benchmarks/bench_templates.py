@@ -0,0 +1,46 @@
+#! /usr/bin/python
+"""
+bench_templates.py
+
+Measures the rate at which a ZigBee remote_at 'IS' poll can be sent
+to a changing node and frame ID, by sending the command in full each
+time, and by sending copies of a template with those fields replaced.
+"""
+import struct, timeit
+from xbee import ZigBee
+
+class NullDevice(object):
+    """
+    A serial port which discards everything written to it
+    """
+    def write(self, data):
+        pass
+
+ADDRESSES = [struct.pack('>Q', 0x0013A20040000000 + i) for i in range(256)]
+
+def main():
+    print("%-8s %-14s %14s" % ("escaped", "method", "sends/s"))
+    number = 256 * 100
+
+    for escaped in (False, True):
+        xbee = ZigBee(NullDevice(), escaped=escaped)
+        template = xbee.template('remote_at', frame_id=b'\x01',
+                                 dest_addr_long=ADDRESSES[0], command=b'IS')
+
+        def send():
+            for i, addr in enumerate(ADDRESSES):
+                xbee.send('remote_at', frame_id=struct.pack('B', i),
+                          dest_addr_long=addr, command=b'IS')
+
+        def send_template():
+            for i, addr in enumerate(ADDRESSES):
+                xbee.send_template(template, frame_id=struct.pack('B', i),
+                                   dest_addr_long=addr)
+
+        for method in (send, send_template):
+            elapsed = min(timeit.repeat(method, number=100, repeat=5))
+            print("%-8s %-14s %14.0f" % (escaped, method.__name__,
+                                         number / elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#! /usr/bin/python
+"""
+bench_transmit.py
+
+Measures the rate at which 1, 4 and 16 threads sharing one ZigBee
+object can send tx frames, with each send() writing to the port itself
+and with a TransmitQueue joining the frames waiting into one write().
+Writes go to /dev/null, each waiting in select() for the file to be
+writable and then calling os.write(), as PySerial's write() does, so
+that each costs the system calls it would on a real serial port.
+"""
+import os, select, struct, threading, time
+from xbee import ZigBee
+from xbee.transmit import TransmitQueue
+
+FRAMES = 40000
+
+class NullDevice(object):
+    """
+    A serial port which counts its writes and discards what is written
+    """
+    def __init__(self):
+        self.fd = os.open(os.devnull, os.O_WRONLY)
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        select.select([], [self.fd], [], None)
+        os.write(self.fd, data)
+
+    def close(self):
+        os.close(self.fd)
+
+def produce(xbee, count):
+    fields = {'dest_addr_long': struct.pack('>Q', 1),
+              'dest_addr': b'\xFF\xFE', 'data': b'x' * 32}
+    for i in range(count):
+        xbee.send('tx', **fields)
+
+def measure(producers, queued):
+    """
+    Returns (frames/s, frames per write) for the given number of
+    producer threads
+    """
+    device = NullDevice()
+    xbee = ZigBee(device, transmit_queue=TransmitQueue() if queued else None)
+    threads = [threading.Thread(target=produce,
+                                args=(xbee, FRAMES // producers))
+               for i in range(producers)]
+
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    xbee.halt()
+    elapsed = time.time() - start
+
+    device.close()
+    return FRAMES / elapsed, float(FRAMES) / device.writes
+
+def main():
+    print("%-10s %-8s %14s %16s" % (
+        "producers", "queue", "frames/s", "frames/write"))
+
+    for producers in (1, 4, 16):
+        for queued in (False, True):
+            rate, per_write = measure(producers, queued)
+            print("%-10d %-8s %14.0f %16.1f" % (
+                producers, 'yes' if queued else 'no', rate, per_write))
+
+if __name__ == '__main__':
+    main()
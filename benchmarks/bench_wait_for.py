@@ -0,0 +1,98 @@
+#! /usr/bin/python
+"""
+bench_wait_for.py
+
+Measures the latency and CPU use of waiting for particular frames
+(tx_status frames, among a stream of rx frames) with wait_for(),
+against a loop which calls wait_read_frame() and discards the frames
+it does not want. With wait_for(), a second thread consumes the rx
+frames at the same time. A pipe stands in for the serial port.
+"""
+import random, struct, threading, time
+from xbee import ZigBee
+from xbee.frame import APIFrame
+from xbee.tests.Fake import FakePipeDevice
+
+TARGETS = 200
+NOISE_PER_TARGET = 10
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def send_frames(device, sent_at):
+    """
+    Writes rx frames at irregular intervals, with a numbered tx_status
+    frame after every NOISE_PER_TARGET of them
+    """
+    rng = random.Random(0)
+    rx = APIFrame(b'\x90' + b'\x00' * 11 + b'noise').output()
+    
+    for seq in range(TARGETS):
+        for i in range(NOISE_PER_TARGET):
+            time.sleep(rng.uniform(0, .0005))
+            device.feed(rx)
+        frame = APIFrame(b'\x8b' + struct.pack('>B', seq % 256) 
+                         + b'\xff\xfe\x00\x00\x00').output()
+        sent_at[seq] = time.time()
+        device.feed(frame)
+
+def is_status(frame):
+    return frame['id'] == 'tx_status'
+
+def discard_loop(xbee):
+    while True:
+        frame = xbee.wait_read_frame()
+        if is_status(frame):
+            return frame
+
+def wait_for(xbee):
+    return xbee.wait_for(is_status)
+
+def consume_noise(xbee, done):
+    while not done.is_set():
+        xbee.wait_for(lambda frame: frame['id'] == 'rx', timeout=.1)
+
+def measure(reader, wait):
+    """
+    Returns (p50, p99, CPU seconds) for the given reader mode and way
+    of waiting
+    """
+    device = FakePipeDevice(timeout=.1)
+    xbee = ZigBee(device, reader=reader)
+    sent_at = {}
+    latencies = []
+    
+    done = threading.Event()
+    writer = threading.Thread(target=send_frames, args=(device, sent_at))
+    consumer = threading.Thread(target=consume_noise, args=(xbee, done))
+    cpu_start = time.process_time()
+    writer.start()
+    if wait is wait_for:
+        consumer.start()
+    
+    for seq in range(TARGETS):
+        frame = wait(xbee)
+        latencies.append(time.time() - sent_at[seq])
+        
+    writer.join()
+    done.set()
+    if consumer.is_alive():
+        consumer.join()
+    cpu = time.process_time() - cpu_start
+    device.close()
+    
+    return percentile(latencies, .5), percentile(latencies, .99), cpu
+
+def main():
+    print("%-8s %-14s %10s %10s %10s" % (
+        "reader", "wait", "p50 ms", "p99 ms", "CPU s"))
+    
+    for reader in ('poll', 'select'):
+        for wait in (discard_loop, wait_for):
+            p50, p99, cpu = measure(reader, wait)
+            print("%-8s %-14s %10.3f %10.3f %10.3f" % (
+                reader, wait.__name__, p50 * 1000, p99 * 1000, cpu))
+
+if __name__ == '__main__':
+    main()
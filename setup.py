@@ -6,6 +6,10 @@ packages=[
     'xbee.helpers', 
     'xbee.helpers.dispatch',
     'xbee.helpers.dispatch.tests',
+    'xbee.helpers.pipeline',
+    'xbee.helpers.pipeline.tests',
+    'xbee.helpers.multiplex',
+    'xbee.helpers.multiplex.tests',
 ]
 
 setup(
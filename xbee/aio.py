@@ -0,0 +1,171 @@
+"""
+aio.py
+
+Provides asyncio protocols for XBee devices, as an alternative to the
+background thread started by XBeeBase. Any number of devices may then
+be served by a single event loop. Requires Python 3.6 or later.
+
+A protocol may be used with any stream transport; for example, with
+pyserial-asyncio:
+
+    transport, xbee = await serial_asyncio.create_serial_connection(
+        loop, AsyncZigBee, '/dev/ttyUSB0', baudrate=9600)
+
+    await xbee.at(command=b'MY')
+
+    async for frame in xbee.frames():
+        print(frame)
+"""
+import asyncio
+from xbee.frame import APIFrame, APIFrameDecoder
+from xbee.ieee import XBee
+from xbee.zigbee import ZigBee
+from xbee.pro900 import XBeePro900
+
+# Marks the end of the received frames
+_CLOSED = object()
+
+def _send_method(name):
+    """
+    Returns a coroutine method which sends the named command
+    """
+    async def send_command(self, **kwargs):
+        await self.send(name, **kwargs)
+
+    send_command.__name__ = name
+    send_command.__doc__ = "Sends the '%s' command; see send()." % name
+    return send_command
+
+class AsyncXBeeBase(asyncio.Protocol):
+    """
+    Abstract base class providing an asyncio protocol for XBee modules.
+
+    Subclasses set xbee_class to the XBeeBase subclass whose
+    api_commands and api_responses specifications should be used.
+    A coroutine method is created for each command, so that
+    'await xbee.at(...)' is equivalent to 'await xbee.send("at", ...)'.
+
+    Constructor arguments:
+        escaped: boolean flag which determines whether the protocol
+                 should operate in escaped mode; see XBeeBase.
+
+        max_queue: number of received frames which may wait to be read
+                   before reading from the transport is paused.
+    """
+    xbee_class = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        if cls.xbee_class is not None:
+            for name in cls.xbee_class.api_commands:
+                if not hasattr(cls, name):
+                    setattr(cls, name, _send_method(name))
+
+    def __init__(self, escaped=False, max_queue=1024):
+        if self.xbee_class is None:
+            raise NotImplementedError("An XBee class could not be found; use a derived class which defines 'xbee_class'.")
+
+        # Only used to build commands and split responses
+        self._xbee = self.xbee_class(None, shorthand=False, escaped=escaped)
+        self._escaped = escaped
+        self._decoder = APIFrameDecoder(escaped)
+        self._max_queue = max_queue
+        self._queue = asyncio.Queue()
+        self._reading_paused = False
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+        self._exception = None
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self._exception = exc
+        self._queue.put_nowait(_CLOSED)
+        # Release any writers; their next write will fail
+        self._can_write.set()
+
+    def pause_writing(self):
+        self._can_write.clear()
+
+    def resume_writing(self):
+        self._can_write.set()
+
+    def data_received(self, data):
+        for frame in self._decoder.feed(data):
+            try:
+                self._queue.put_nowait(self._xbee._split_response(frame.data))
+            except Exception as exc:
+                # Raised when the frame is read, as in wait_read_frame()
+                self._queue.put_nowait(exc)
+
+        if self._queue.qsize() >= self._max_queue and not self._reading_paused:
+            self._reading_paused = True
+            self.transport.pause_reading()
+
+    async def read_frame(self):
+        """
+        read_frame: None -> frame info dictionary
+
+        Waits for the next frame to arrive and returns it, parsed as
+        by XBeeBase.wait_read_frame(). Once the connection has been
+        closed, EOFError is raised, or the exception which closed it.
+        """
+        item = await self._queue.get()
+
+        if item is _CLOSED:
+            # Leave it for any other readers
+            self._queue.put_nowait(item)
+            raise self._exception or EOFError("The connection has been closed")
+
+        if self._reading_paused and self._queue.qsize() < self._max_queue // 2:
+            self._reading_paused = False
+            self.transport.resume_reading()
+
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    async def frames(self):
+        """
+        frames: None -> async iterator of frame info dictionaries
+
+        Yields each frame as it arrives until the connection is closed.
+        """
+        while True:
+            try:
+                frame = await self.read_frame()
+            except EOFError:
+                return
+            yield frame
+
+    async def send(self, cmd, **kwargs):
+        """
+        send: string param=binary data ... -> None
+
+        Writes the given command to the transport, as XBeeBase.send()
+        does, and waits while the transport's write buffer is full.
+        """
+        data = self._xbee._build_command(cmd, **kwargs)
+        self.transport.write(APIFrame(data, self._escaped).output())
+        await self._can_write.wait()
+
+class AsyncXBee(AsyncXBeeBase):
+    """
+    Provides an asyncio protocol for XBee (IEEE 802.15.4) modules.
+    """
+    xbee_class = XBee
+
+class AsyncZigBee(AsyncXBeeBase):
+    """
+    Provides an asyncio protocol for XBee ZB (ZigBee) modules.
+    """
+    xbee_class = ZigBee
+
+class AsyncXBeePro900(AsyncXBeeBase):
+    """
+    Provides an asyncio protocol for XBee-PRO 900 modules.
+    """
+    xbee_class = XBeePro900
@@ -11,10 +11,346 @@ This class defines data and methods common to all XBee modules.
 This class should be subclassed in order to provide
 series-specific functionality.
 """
-import struct, threading, time
-from xbee.frame import APIFrame
+import os, select, struct, threading, time
+from collections import deque
+from xbee.frame import APIFrame, APIFrameDecoder, FrameTemplate
+from xbee.pending import PendingRequests
+from xbee.records import LazyFrame, record_class
+from xbee.samples import SampleFormat, SampleLayout
 from xbee.python2to3 import byteToInt, intToByte
 
+def _compile_command(cmd_spec):
+    """
+    _compile_command: command specification -> function
+
+    Compiles the given api_commands specification into a function 
+    which accepts a dictionary of field data and returns the command
+    packet, as described by XBeeBase._build_command(). Everything
+    which depends only on the specification (defaults, lengths and
+    error messages) is worked out once, here.
+    """
+    fields = []
+    # Position of each field in the packet, for those which are 
+    # preceded only by fields of a specific length
+    offsets = {}
+    offset = 0
+
+    for field in cmd_spec:
+        name, length = field['name'], field['len']
+
+        if length is None:
+            # Variable length; only written if given
+            fields.append((name, None, None, None))
+            offset = None
+            continue
+
+        if offset is not None:
+            offsets[name] = (offset, length)
+            offset += length
+
+        # A field with a specific length must be given, unless it
+        # has a default value
+        missing = None
+        if not field['default']:
+            missing = ("The expected field %s of length %d was not provided"
+                       % (name, length))
+
+        fields.append((name, length, field['default'], missing))
+
+    fields = tuple(fields)
+
+    def encode(kwargs):
+        packet = []
+
+        for name, length, default, missing in fields:
+            if name in kwargs:
+                data = kwargs[name]
+            elif missing:
+                raise KeyError(missing)
+            else:
+                data = default
+
+            # Ensure that the proper number of elements will be written
+            if length and len(data) != length:
+                raise ValueError(
+                    "The data provided for '%s' was not %d bytes long"
+                    % (name, length))
+
+            if data:
+                packet.append(data)
+
+        return b''.join(packet)
+
+    encode.offsets = offsets
+    return encode
+
+def _compile_response(packet):
+    """
+    _compile_response: response specification -> function
+
+    Compiles the given api_responses specification into a function 
+    which splits the binary data of a response packet into a 
+    dictionary, as described by XBeeBase._split_response() (without
+    applying any parsing rules).
+
+    The structure is divided into segments: a run of fields of a
+    specific length, whose positions within the run are worked out
+    here, optionally followed by a null-terminated field or a final
+    field holding the remaining bytes.
+    """
+    segments = []
+    fields = []
+    size = 0
+
+    for field in packet['structure']:
+        name, length = field['name'], field['len']
+
+        if length == 'null_terminated' or length is None:
+            segments.append((tuple(fields), size, length, name))
+            fields = []
+            size = 0
+
+            # Nothing follows the remaining bytes
+            if length is None:
+                break
+        else:
+            fields.append((name, size, size + length))
+            size += length
+    else:
+        if fields:
+            segments.append((tuple(fields), size, False, None))
+
+    segments = tuple(segments)
+    packet_name = packet['name']
+
+    # Position of each field in the data, for those which are preceded
+    # only by fields of a specific length; a final field's end is None
+    offsets = {}
+    if segments:
+        fields, size, tail, tail_name = segments[0]
+        for name, start, end in fields:
+            offsets[name] = (1 + start, 1 + end)
+        if tail is None:
+            offsets[tail_name] = (1 + size, None)
+
+    # The shortest a packet may be, and the longest (None if there is
+    # no limit), counting the id byte and each field's null terminator
+    min_length = 1 + sum(size + (tail == 'null_terminated')
+                         for fields, size, tail, tail_name in segments)
+    max_length = min_length
+    if any(tail in ('null_terminated', None) 
+           for fields, size, tail, tail_name in segments):
+        max_length = None
+
+    def decode(data):
+        # Current byte index in the data stream
+        index = 1
+        info = {'id':packet_name}
+
+        for fields, size, tail, tail_name in segments:
+            # Are we trying to read beyond the last data element?
+            if index + size > len(data):
+                raise ValueError(
+                    "Response packet was shorter than expected")
+
+            for name, start, end in fields:
+                info[name] = data[index + start:index + end]
+            index += size
+
+            if tail == 'null_terminated':
+                end = data.find(b'\x00', index)
+                if end < 0:
+                    raise ValueError(
+                        "Response packet was shorter than expected")
+
+                info[tail_name] = data[index:end]
+                index = end + 1
+            elif tail is None:
+                # Store any leftover bytes
+                if index < len(data):
+                    info[tail_name] = data[index:]
+                    index = len(data)
+
+        # If there are more bytes than expected, raise an exception
+        if index < len(data):
+            raise ValueError(
+                "Response packet was longer than expected; expected: %d, got: %d bytes" % (index, 
+                                                                                           len(data)))
+
+        return info
+
+    decode.segments = segments
+    decode.offsets = offsets
+    decode.min_length = min_length
+    decode.max_length = max_length
+    return decode
+
+def _compile_record_response(packet):
+    """
+    _compile_record_response: response specification -> function
+
+    Compiles a function which splits the binary data of a response
+    packet as the function compiled by _compile_response() does, but straight
+    into the slots of a record (see xbee.records.record_class()), so
+    that no dictionary is made for the frame. The record class is 
+    available as its record_class attribute.
+    """
+    record = record_class(packet)
+    segments = _compile_response(packet).segments
+    shorter = "Response packet was shorter than expected"
+
+    # The index is known here until a null-terminated field is passed
+    source = ['def decode(data):',
+              '    record = new(cls)',
+              '    length = len(data)']
+    index = 1
+
+    for fields, size, tail, tail_name in segments:
+        if index is None:
+            source.append('    if index + %d > length: raise ValueError(%r)' 
+                          % (size, shorter))
+            for name, start, end in fields:
+                source.append('    record.%s = data[index + %d:index + %d]' 
+                              % (name, start, end))
+            source.append('    index += %d' % size)
+            position = 'index'
+        else:
+            if size:
+                source.append('    if %d > length: raise ValueError(%r)' 
+                              % (index + size, shorter))
+            for name, start, end in fields:
+                source.append('    record.%s = data[%d:%d]' 
+                              % (name, index + start, index + end))
+            index += size
+            position = str(index)
+
+        if tail == 'null_terminated':
+            source += ['    end = data.find(%r, %s)' % (b'\x00', position),
+                       '    if end < 0: raise ValueError(%r)' % shorter,
+                       '    record.%s = data[%s:end]' % (tail_name, position),
+                       '    index = end + 1']
+            index = None
+        elif tail is None:
+            source += ['    if %s < length: record.%s = data[%s:]' 
+                       % (position, tail_name, position),
+                       '    return record']
+            break
+    else:
+        position = 'index' if index is None else str(index)
+        source += ['    if %s < length:' % position,
+                   '        raise ValueError("Response packet was longer than '
+                   'expected; expected: %%d, got: %%d bytes" %% (%s, length))' 
+                   % position,
+                   '    return record']
+
+    namespace = {'new': object.__new__, 'cls': record}
+    exec('\n'.join(source) + '\n', namespace)
+    decode_record = namespace['decode']
+    decode_record.record_class = record
+    return decode_record
+
+def _compile_command_ids(api_commands):
+    """
+    _compile_command_ids: api_commands -> {id byte: command name}
+
+    Maps the id byte of each command which may be sent to its name.
+    """
+    command_ids = {}
+
+    for cmd_name, cmd in api_commands.items():
+        command_ids.setdefault(cmd[0]['default'], cmd_name)
+
+    return command_ids
+
+def _compiled(cls, cache_name, key, source, compile, *args):
+    """
+    Returns the compiled form of a specification, as cached on the
+    given class under the given name and key. It is compiled by
+    calling compile(*args) if it has not been yet, or if source (the
+    specification it was compiled from) has since been replaced.
+    """
+    cache = cls.__dict__.get(cache_name)
+    if cache is None:
+        cache = {}
+        setattr(cls, cache_name, cache)
+
+    entry = cache.get(key)
+    if entry is not None and entry[0] is source:
+        return entry[1]
+
+    compiled = compile(*args)
+    cache[key] = (source, compiled)
+    return compiled
+
+def _source_address(packet_info):
+    """
+    _source_address: frame info dictionary -> int
+
+    Returns the 64-bit source address of the given frame, or failing
+    that its 16-bit source address, as an integer; 0 if it has neither.
+    """
+    if packet_info:
+        for field in ('source_addr_long', 'source_addr'):
+            addr = packet_info.get(field)
+            if addr:
+                return struct.unpack('>Q', addr.rjust(8, b'\x00'))[0]
+    return 0
+
+class _Shorthand(object):
+    """
+    Provides the shorthand method for a command on an XBeeBase subclass,
+    which writes the command as send() would; see _shorthand_method().
+
+    Instances with shorthand disabled have no such method, nor do
+    those of a subclass whose api_commands do not include the command
+    (for which method is None).
+    """
+    def __init__(self, cmd, method):
+        self.cmd = cmd
+        self.method = method
+        if method is not None:
+            self.__doc__ = method.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        if self.method is None or not instance.shorthand:
+            raise AttributeError("XBee has no attribute '%s'" % self.cmd)
+
+        return self.method.__get__(instance, owner)
+
+def _shorthand_method(cmd, cmd_spec):
+    """
+    _shorthand_method: string, command specification -> function or None
+
+    Generates a method which sends the given command through send(),
+    with a keyword-only argument for each of its fields. A field which
+    is not given (or is None) is left out, as if it had not been passed
+    to send(). Any other keyword arguments are passed on to send(), 
+    which ignores them, as the shorthand of __getattr__ does.
+
+    Keyword-only arguments need Python 3; elsewhere, None is returned.
+    """
+    names = [field['name'] for field in cmd_spec]
+
+    source = 'def %s(self, *, %s, **fields):\n' % (cmd, ', '.join(
+        '%s=None' % name for name in names))
+    for name in names:
+        source += '    if %s is not None: fields[%r] = %s\n' % (name, name, name)
+    source += '    self.send(%r, **fields)\n' % cmd
+
+    namespace = {}
+    try:
+        exec(source, namespace)
+    except SyntaxError:
+        # A name which can't be used in Python, or Python 2; 
+        # __getattr__ will do
+        return None
+    method = namespace[cmd]
+    method.__doc__ = "Sends the '%s' command; see send()." % cmd
+    return method
+
 class ThreadQuitException(Exception):
     pass
     
@@ -40,26 +376,248 @@ class XBeeBase(threading.Thread):
                   the port and call the given function is automatically
                   started.
 
+        batch_callback: function which should be called with a list of
+                  frames, instead of calling callback with each one;
+                  each list holds every frame read at once, or which 
+                  arrives within max_linger seconds of the first, up to
+                  max_batch frames. A background thread is started as
+                  for callback.
+
+        max_batch: the greatest number of frames passed to 
+                  batch_callback at once.
+
+        max_linger: seconds to wait for more frames to arrive before
+                  calling batch_callback with fewer than max_batch. By
+                  default, only frames which have already been read
+                  are included.
+
+        callback_workers: an xbee.workers.CallbackWorkers, whose threads
+                  should call the callback instead of the background
+                  thread, so that a slow callback does not hold up
+                  reading. halt() waits for them to finish the frames
+                  already read.
+
+        transmit_queue: an xbee.transmit.TransmitQueue, whose thread 
+                  should write frames to the serial port instead of the
+                  thread sending them, so that frames sent by many
+                  threads at once are written together. halt() waits
+                  for it to write the frames already sent, and should
+                  be called even without a background thread.
+
         escaped: boolean flag which determines whether the library should
                  operate in escaped mode. In this mode, certain data bytes
                  in the output and input streams will be escaped and unescaped
                  in accordance with the XBee API. This setting must match
                  the appropriate api_mode setting of an XBee device; see your
                  XBee device's documentation for more information.
+
+        reader: determines how the serial port is waited upon for data:
+                 'poll':     check inWaiting() every 10 ms (the default).
+                 'select':   wait with select() on the port's file 
+                             descriptor, for at most read_timeout seconds
+                             at a time.
+                 'blocking': wait in read(), for at most the port's own
+                             timeout; this should not be None if the
+                             background thread must be halted, unless
+                             the port provides cancel_read() (as
+                             PySerial 3 does).
+                 Whenever data arrives, everything available is read at
+                 once, into a reusable buffer if the port provides
+                 readinto().
+
+        read_timeout: seconds to wait at a time in 'select' mode.
+
+        In any mode, halt() wakes the background thread at once, rather
+        than waiting for the wait in progress to end.
+
+        max_length: the greatest length of frame data which may be
+                 received; a frame claiming to be longer is rejected as
+                 corrupt as soon as its length is read (see 
+                 APIFrameDecoder). The default, 512 bytes, is ample for
+                 every series of module.
+
+        max_inbox: the greatest number of frames kept for wait_for() 
+                 and wait_read_frame() calls which have yet to take
+                 them, and of those read by poll() which have yet to be
+                 parsed. Once there are this many, the oldest is 
+                 dropped as each frame arrives, counting it in the
+                 inbox_frames_dropped attribute.
+
+        inter_byte_timeout: seconds after which a partially received 
+                 frame is given up on if no more bytes have arrived, so
+                 that a device which falls silent in the middle of a 
+                 frame can't hold up the frames which follow it (see
+                 APIFrameDecoder.abandon()). This is checked whenever a
+                 wait for data ends with none, so it is only as precise
+                 as the reader mode's waits. By default, a partial frame
+                 is kept until the rest of it arrives.
+
+        unknown_frames: determines what wait_read_frame() does with a
+                 frame whose id byte is not in api_responses:
+                 'raise': raise an exception, as _split_response() 
+                          does (the default).
+                 'drop':  skip the frame, counting it in the 
+                          unknown_frames_dropped attribute.
+                 'pass':  return {'id':'unknown', 'data':frame data}.
+
+        sample_columns: an xbee.samples.SampleColumns to which IO samples
+                 are appended, instead of being returned as a list of
+                 dictionaries; the 'samples' field of each IO frame
+                 (or the 'parameter' field of an IS response) is then
+                 the number of samples appended. It may not be used
+                 with frame_format 'lazy'.
+
+        frame_format: 'dict' (the default) to return each frame as a
+                 dictionary, 'record' to return it as a read-only
+                 record with a slot for each field, which uses less
+                 memory, or 'lazy' to return a read-only view which
+                 splits out each field only when it is read; see
+                 xbee.records.
+
+    The APIFrameDecoder used to read frames from the serial port is
+    available as the decoder attribute; its counters report any corrupt
+    data which has been received.
     """
                        
-    def __init__(self, ser, shorthand=True, callback=None, escaped=False):
+    READERS = ('poll', 'select', 'blocking')
+    UNKNOWN_FRAME_POLICIES = ('raise', 'drop', 'pass')
+    FRAME_FORMATS = ('dict', 'record', 'lazy')
+
+    # Reads the headers of IO sample data
+    sample_format = SampleFormat()
+
+    # The responses which answer each command sent with request(); the
+    # frame ID is the first field of each of them
+    api_command_responses = {'at':           ('at_response',),
+                             'queued_at':    ('at_response',),
+                             'remote_at':    ('remote_at_response',),
+                             'tx':           ('tx_status',),
+                             'tx_long_addr': ('tx_status',),
+                             'tx_explicit':  ('tx_status',)}
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Compiles the specifications of each series class as it is
+        created, rather than when each is first used, and generates a
+        shorthand method for each command. (Where this hook is not
+        supported, specifications are still compiled on first use, and
+        __getattr__ provides the shorthand methods.)
+        """
+        super(XBeeBase, cls).__init_subclass__(**kwargs)
+
+        api_commands = getattr(cls, 'api_commands', None)
+        if api_commands:
+            _compiled(cls, '_command_ids', None, api_commands,
+                      _compile_command_ids, api_commands)
+
+            for cmd, cmd_spec in api_commands.items():
+                _compiled(cls, '_command_encoders', cmd, cmd_spec,
+                          _compile_command, cmd_spec)
+
+                # Replace the shorthand methods of any base class, but
+                # not methods which have been defined by hand
+                existing = getattr(cls, cmd, None)
+                if existing is None or isinstance(existing, _Shorthand):
+                    method = _shorthand_method(cmd, cmd_spec)
+                    if method is not None:
+                        setattr(cls, cmd, _Shorthand(cmd, method))
+
+        # Hide those of any base class's commands which this class lacks
+        for name in dir(cls):
+            if name not in (api_commands or ()) and \
+               isinstance(getattr(cls, name, None), _Shorthand):
+                setattr(cls, name, _Shorthand(name, None))
+
+        api_responses = getattr(cls, 'api_responses', None)
+        if api_responses:
+            for packet_id, packet in api_responses.items():
+                _compiled(cls, '_response_decoders', packet_id, 
+                          packet['structure'], _compile_response, packet)
+                _compiled(cls, '_record_decoders', packet_id, 
+                          packet['structure'], _compile_record_response, 
+                          packet)
+
+    def __init__(self, ser, shorthand=True, callback=None, escaped=False,
+                 reader='poll', read_timeout=.1, unknown_frames='raise',
+                 sample_columns=None, frame_format='dict',
+                 callback_workers=None, batch_callback=None, max_batch=256,
+                 max_linger=0, inter_byte_timeout=None, transmit_queue=None,
+                 max_length=APIFrameDecoder.MAX_DATA_LENGTH, max_inbox=1024):
         super(XBeeBase, self).__init__()
+
+        if reader not in self.READERS:
+            raise ValueError("reader must be one of %s, not '%s'" 
+                             % (', '.join(self.READERS), reader))
+
+        if unknown_frames not in self.UNKNOWN_FRAME_POLICIES:
+            raise ValueError("unknown_frames must be one of %s, not '%s'" 
+                             % (', '.join(self.UNKNOWN_FRAME_POLICIES), 
+                                unknown_frames))
+
+        if frame_format not in self.FRAME_FORMATS:
+            raise ValueError("frame_format must be one of %s, not '%s'" 
+                             % (', '.join(self.FRAME_FORMATS), frame_format))
+
+        if sample_columns is not None and frame_format == 'lazy':
+            # A lazy frame's samples would only be appended once read
+            raise ValueError("sample_columns may not be used with frame_format 'lazy'")
+
+        if batch_callback and (callback or callback_workers is not None):
+            raise ValueError("batch_callback may not be used with callback or callback_workers")
+
+
         self.serial = ser
         self.shorthand = shorthand
         self._callback = None
         self._thread_continue = False
         self._escaped = escaped  
+        self.decoder = APIFrameDecoder(escaped, max_length)
+        self._frames = deque()
+        # Parsed frames awaiting wait_for(), each numbered in order of
+        # arrival, and whether a thread is reading more
+        self._inbox = deque()
+        self._inbox_count = 0
+        self._max_inbox = max_inbox
+        self.inbox_frames_dropped = 0
+        self._inbox_ready = threading.Condition(threading.Lock())
+        self._inbox_reading = False
+        self._reader = reader
+        self._read_timeout = read_timeout
+        self._read_buffer = bytearray(256)
+        self._inter_byte_timeout = inter_byte_timeout
+        self._last_byte_time = time.time()
+        self._requests = PendingRequests()
+        self._unknown_frames = unknown_frames
+        self.unknown_frames_dropped = 0
+        self._sample_columns = sample_columns
+        self._frame_format = frame_format
+        
+        self._callback_workers = callback_workers
+        self._batch_callback = batch_callback
+        self._max_batch = max_batch
+        self._max_linger = max_linger
+
+        self._transmit_queue = transmit_queue
+        if transmit_queue is not None:
+            transmit_queue.start(ser.write)
         
-        if callback:
-            self._callback = callback
+        # The xbee.helpers.multiplex.Multiplexer reading from the serial
+        # port instead of this object, if any
+        self._multiplexer = None
+
+        # Set by halt(), to wake the background thread
+        self._halt_event = threading.Event()
+        self._wake_read = self._wake_write = None
+
+        if callback or batch_callback:
+            self._callback = callback or batch_callback
             self._thread_continue = True
             self._thread_quit = threading.Event()
+            if reader == 'select':
+                # Written to by halt(), to wake the thread from select()
+                self._wake_read, self._wake_write = os.pipe()
+            if callback_workers is not None:
+                callback_workers.start(callback)
             self.start()
 
     def halt(self):
@@ -68,21 +626,93 @@ class XBeeBase(threading.Thread):
 
         If this instance has a separate thread running, it will be
         halted. This method will wait until the thread has cleaned
-        up before returning.
+        up before returning. The writer thread of any transmit queue
+        is also stopped, once it has written every frame sent, and
+        every request still awaiting a response is cancelled.
+
+        The thread is woken at once from any wait for data on the 
+        serial port.
         """
         if self._callback:
             self._thread_continue = False
+            self._wake()
             self._thread_quit.wait()
+            self.join()
+
+            with self._inbox_ready:
+                # Another thread may still be reading in wait_for()
+                while self._inbox_reading:
+                    self._inbox_ready.wait()
+
+                if self._wake_read is not None:
+                    os.close(self._wake_read)
+                    os.close(self._wake_write)
+                    self._wake_read = self._wake_write = None
+
+            if self._callback_workers is not None:
+                self._callback_workers.close()
+
+        if self._transmit_queue is not None:
+            self._transmit_queue.close()
+
+        self._requests.cancel_all()
         
+    def _wake(self):
+        """
+        _wake: None -> None
+
+        Ends the wait for data in progress, if any, in whichever way
+        the reader mode allows.
+        """
+        self._halt_event.set()
+        self._interrupt_read()
+
+    def _interrupt_read(self):
+        """
+        _interrupt_read: None -> None
+
+        Ends the wait for data in progress, if any, without halting the
+        thread waiting; _read then returns nothing.
+        """
+        if self._wake_write is not None:
+            os.write(self._wake_write, b'\x00')
+        elif self._reader == 'blocking' and hasattr(self.serial, 'cancel_read'):
+            self.serial.cancel_read()
+
+    def _deadline_added(self):
+        """
+        _deadline_added: None -> None
+
+        Wakes whichever thread may be waiting for data without a 
+        deadline, so that it sees the deadline of a request just sent.
+        """
+        if self._multiplexer is not None:
+            self._multiplexer._wake()
+        elif self._reader != 'poll':
+            # halt() closes the wake pipe with this held
+            with self._inbox_ready:
+                self._interrupt_read()
+
     def _write(self, data):
         """
         _write: binary data -> None
         
         Packages the given binary data in an API frame and writes the 
-        result to the serial port
+        result to the serial port, or queues it to be written
+        """
+        self._write_frame(APIFrame(data, self._escaped).output())
+
+    def _write_frame(self, frame):
+        """
+        _write_frame: API frame (binary data) -> None
+
+        Writes the given complete API frame to the serial port, or 
+        queues it to be written
         """
-        frame = APIFrame(data, self._escaped).output()
-        self.serial.write(frame)
+        if self._transmit_queue is not None:
+            self._transmit_queue.put(frame)
+        else:
+            self.serial.write(frame)
         
     def run(self):
         """
@@ -91,57 +721,251 @@ class XBeeBase(threading.Thread):
         This method overrides threading.Thread.run() and is automatically
         called when an instance is created with threading enabled.
         """
-        while True:
-            try:
-                self._callback(self.wait_read_frame())
-            except ThreadQuitException:
-                break
-        self._thread_quit.set()
+        if self._batch_callback:
+            read = self._wait_read_batch
+        else:
+            read = self.wait_read_frame
+
+        if self._callback_workers is not None:
+            deliver = self._callback_workers.put
+        else:
+            deliver = self._callback
+
+        try:
+            while True:
+                try:
+                    deliver(read())
+                except ThreadQuitException:
+                    break
+        finally:
+            # Even if reading failed, so that halt() returns
+            self._thread_quit.set()
     
     def _wait_for_frame(self):
         """
-        _wait_for_frame: None -> binary data
+        _wait_for_frame: None -> APIFrame
         
         _wait_for_frame will read from the serial port until a valid
-        API frame arrives. It will then return the binary data
-        contained within the frame.
+        API frame arrives. It will then return the frame.
+
+        All bytes waiting on the serial port are read at once, so a
+        single read may complete several frames; those which are not
+        returned immediately are kept for subsequent calls.
 
         If this method is called as a separate thread
         and self.thread_continue is set to False, the thread will
         exit by raising a ThreadQuitException.
         """
-        frame = APIFrame(escaped=self._escaped)
-        
         while True:
-                if self._callback and not self._thread_continue:
-                    raise ThreadQuitException
+            if self._callback and not self._thread_continue:
+                raise ThreadQuitException
 
-                if self.serial.inWaiting() == 0:
-                    time.sleep(.01)
-                    continue
-                
-                byte = self.serial.read()
-
-                if byte != APIFrame.START_BYTE:
-                    continue
-
-                # Save all following bytes, if they are not empty
-                if len(byte) == 1:
-                    frame.fill(byte)
-                    
-                while(frame.remaining_bytes() > 0):
-                    byte = self.serial.read()
-                    
-                    if len(byte) == 1:
-                        frame.fill(byte)
+            if self._frames:
+                return self._frames.popleft()
 
-                try:
-                    # Try to parse and return result
-                    frame.parse()
-                    return frame
-                except ValueError:
-                    # Bad frame, so restart
-                    frame = APIFrame(escaped=self._escaped)
+            self._read_frames()
+
+    def _read_frames(self):
+        """
+        _read_frames: None -> None
+
+        _read_frames reads from the serial port once (see _read) and
+        decodes any frames which arrive. Frames which answer a pending
+        request complete it; all others are queued to be returned by
+        _wait_for_frame.
+        """
+        if self._requests:
+            self._requests.expire()
+
+        data = self._read()
+
+        # Occasionally, a read may return nothing
+        if not data:
+            self._abandon_stale_frame()
+            return
+
+        self._receive(data)
+
+    def _receive(self, data):
+        """
+        _receive: binary data -> None
+
+        _receive decodes any frames completed by the given data, as
+        read from the serial port, and handles them as _read_frames
+        does.
+        """
+        if self._inter_byte_timeout is not None:
+            self._last_byte_time = time.time()
+        self._queue_frames(self.decoder.feed(data))
+
+    def _abandon_stale_frame(self):
+        """
+        _abandon_stale_frame: None -> None
+
+        Abandons a partly received frame once inter_byte_timeout
+        seconds have passed without a byte arriving, handling any
+        frames found in its remaining bytes as _read_frames does.
+        """
+        deadline = self._stale_frame_deadline()
+        if deadline is not None and deadline <= time.time():
+            self._queue_frames(self.decoder.abandon())
+
+    def _stale_frame_deadline(self):
+        """
+        _stale_frame_deadline: None -> float or None
+
+        Returns the time at which a partly received frame will be
+        abandoned, or None if there is none or no inter_byte_timeout.
+        """
+        if self._inter_byte_timeout is None or not self.decoder.pending:
+            return None
+        return self._last_byte_time + self._inter_byte_timeout
+
+    def _next_deadline(self):
+        """
+        _next_deadline: None -> float or None
+
+        Returns the earliest time at which a pending request expires
+        or a partly received frame is abandoned, or None if neither
+        will happen without more data being read.
+        """
+        deadlines = [deadline for deadline in (
+                         self._requests.next_deadline(),
+                         self._stale_frame_deadline())
+                     if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def _queue_frames(self, frames):
+        """
+        _queue_frames: [APIFrame ...] -> None
+
+        Completes the pending requests answered by the given frames,
+        and queues the rest. At most max_inbox frames are queued; the
+        oldest is dropped, and counted, to make room for each beyond.
+        """
+        queue = self._frames
+
+        for frame in frames:
+            if not (self._requests and self._complete_request(frame)):
+                if len(queue) >= self._max_inbox:
+                    queue.popleft()
+                    self.inbox_frames_dropped += 1
+                queue.append(frame)
+
+    def _complete_request(self, frame):
+        """
+        _complete_request: APIFrame -> boolean
+
+        Completes the pending request answered by the given frame, if
+        there is one.
+        """
+        data = frame.data
+        if len(data) < 2:
+            return False
+
+        frame_id = byteToInt(data[1:2])
+
+        try:
+            name = self.api_responses[data[0:1]]['name']
+        except (AttributeError, KeyError):
+            return False
+
+        if not self._requests.accepts(frame_id, name):
+            return False
+
+        try:
+            response = self._split_response(data)
+        except ValueError:
+            # Let the reader see the error
+            return False
+
+        return self._requests.complete(frame_id, response)
+
+    def _read(self):
+        """
+        _read: None -> binary data
+
+        _read waits a short time for data to arrive on the serial port,
+        as determined by the reader mode, and then reads all of the
+        bytes available. If none arrive, nothing is returned.
+
+        When the serial port supports readinto(), the result is a view
+        of a buffer which is reused by the next call.
+
+        In 'select' and 'blocking' mode, the wait ends no later than
+        the next deadline (see _next_deadline), so that requests time
+        out even when nothing arrives; in 'blocking' mode, this needs a
+        port whose timeout may be changed, as PySerial's may.
+        """
+        deadline = self._next_deadline()
+
+        if self._reader == 'select':
+            timeout = self._bound_timeout(self._read_timeout, deadline)
+            if self._wake_read is None:
+                ready = select.select([self.serial], [], [], timeout)[0]
+            else:
+                ready = select.select([self.serial, self._wake_read], [], [], 
+                                      timeout)[0]
+            if not ready:
+                return None
+            if self._wake_read in ready:
+                os.read(self._wake_read, 1024)
+                return None
+
+        waiting = self.serial.inWaiting()
+
+        if waiting == 0:
+            if self._reader == 'poll':
+                self._halt_event.wait(.01)
+                return None
+
+            # Otherwise, wait for the next byte in read()
+            if deadline is not None and hasattr(self.serial, 'timeout'):
+                port_timeout = self.serial.timeout
+                timeout = self._bound_timeout(port_timeout, deadline)
+                if timeout != port_timeout:
+                    self.serial.timeout = timeout
+                    try:
+                        return self._read_available(1)
+                    finally:
+                        self.serial.timeout = port_timeout
+
+            waiting = 1
+
+        return self._read_available(waiting)
+
+    @staticmethod
+    def _bound_timeout(timeout, deadline):
+        """
+        _bound_timeout: float or None, float or None -> float or None
+
+        Shortens the given timeout (None for no timeout) so that a wait
+        for that long ends by the given time, if any.
+        """
+        if deadline is None:
+            return timeout
+
+        remaining = max(0, deadline - time.time())
+        if timeout is None or remaining < timeout:
+            return remaining
+        return timeout
+
+    def _read_available(self, waiting):
+        """
+        _read_available: int -> binary data
+
+        Reads the given number of bytes (or, at least, one) from the
+        serial port, as _read does.
+        """
+        if hasattr(self.serial, 'readinto'):
+            if waiting > len(self._read_buffer):
+                self._read_buffer = bytearray(waiting)
+            view = memoryview(self._read_buffer)[:waiting]
+            return view[:self.serial.readinto(view) or 0]
+
+        if waiting > 1:
+            return self.serial.read(waiting)
+        return self.serial.read()
                         
     def _build_command(self, cmd, **kwargs):
         """
@@ -155,48 +979,31 @@ class XBeeBase(threading.Thread):
         Each field will be written out in the order they are defined
         in the command definition.
         """
+        return self._encode_command(cmd, kwargs)
+
+    def _encode_command(self, cmd, fields):
+        """
+        _encode_command: string, {field name: binary data} -> binary data
+
+        _encode_command constructs a command packet from a dictionary of
+        field data, as _build_command does from its named arguments.
+        """
+        return self._command_encoder(cmd)(fields)
+
+    def _command_encoder(self, cmd):
+        """
+        _command_encoder: string -> function
+
+        Returns the compiled form of the given command's specification
+        (see _compile_command).
+        """
         try:
             cmd_spec = self.api_commands[cmd]
         except AttributeError:
             raise NotImplementedError("API command specifications could not be found; use a derived class which defines 'api_commands'.")
-            
-        packet = b''
-        
-        for field in cmd_spec:
-            try:
-                # Read this field's name from the function arguments dict
-                data = kwargs[field['name']]
-            except KeyError:
-                # Data wasn't given
-                # Only a problem if the field has a specific length
-                if field['len'] is not None:
-                    # Was a default value specified?
-                    default_value = field['default']
-                    if default_value:
-                        # If so, use it
-                        data = default_value
-                    else:
-                        # Otherwise, fail
-                        raise KeyError(
-                            "The expected field %s of length %d was not provided" 
-                            % (field['name'], field['len']))
-                else:
-                    # No specific length, ignore it
-                    data = None
-            
-            # Ensure that the proper number of elements will be written
-            if field['len'] and len(data) != field['len']:
-                raise ValueError(
-                    "The data provided for '%s' was not %d bytes long"\
-                    % (field['name'], field['len']))
-        
-            # Add the data to the packet, if it has been specified
-            # Otherwise, the parameter was of variable length, and not 
-            #  given
-            if data:
-                packet += data
-                
-        return packet
+
+        return _compiled(self.__class__, '_command_encoders', cmd, 
+                         cmd_spec, _compile_command, cmd_spec)
     
     def _split_response(self, data):
         """
@@ -218,62 +1025,35 @@ class XBeeBase(threading.Thread):
             raise NotImplementedError("API response specifications could not be found; use a derived class which defines 'api_responses'.")
         except KeyError:
             # Check to see if this ID can be found among transmittible packets
-            for cmd_name, cmd in list(self.api_commands.items()):
-                if cmd[0]['default'] == data[0:1]:
-                    raise CommandFrameException("Incoming frame with id %s looks like a command frame of type '%s' (these should not be received). Are you sure your devices are in API mode?"
-                            % (data[0], cmd_name))
+            command_ids = _compiled(self.__class__, '_command_ids', None,
+                                    self.api_commands, _compile_command_ids,
+                                    self.api_commands)
+            if packet_id in command_ids:
+                raise CommandFrameException("Incoming frame with id %s looks like a command frame of type '%s' (these should not be received). Are you sure your devices are in API mode?"
+                        % (data[0], command_ids[packet_id]))
             
             raise KeyError(
                 "Unrecognized response packet with id byte {0}".format(data[0]))
         
-        # Current byte index in the data stream
-        index = 1
-        
-        # Result info
-        info = {'id':packet['name']}
-        packet_spec = packet['structure']
-        
-        # Parse the packet in the order specified
-        for field in packet_spec:
-            if field['len'] == 'null_terminated':
-                field_data = b''
-                
-                while data[index:index+1] != b'\x00':
-                    field_data += data[index:index+1]
-                    index += 1
-                
-                index += 1
-                info[field['name']] = field_data
-            elif field['len'] is not None:
-                # Store the number of bytes specified
-
-                # Are we trying to read beyond the last data element?
-                if index + field['len'] > len(data):
-                    raise ValueError(
-                        "Response packet was shorter than expected")
-                
-                field_data = data[index:index + field['len']]
-                info[field['name']] = field_data
-                               
-                index += field['len']
-            # If the data field has no length specified, store any
-            #  leftover bytes and quit
-            else:
-                field_data = data[index:]
-                
-                # Were there any remaining bytes?
-                if field_data:
-                    # If so, store them
-                    info[field['name']] = field_data
-                    index += len(field_data)
-                break
-            
-        # If there are more bytes than expected, raise an exception
-        if index < len(data):
-            raise ValueError(
-                "Response packet was longer than expected; expected: %d, got: %d bytes" % (index, 
-                                                                                           len(data)))
-                                                                                           
+        if self._frame_format == 'record':
+            # Split straight into a record, without a dictionary
+            record = _compiled(self.__class__, '_record_decoders', packet_id,
+                               packet['structure'], _compile_record_response,
+                               packet)(data)
+
+            if 'parsing' in packet:
+                for name, rule in packet['parsing']:
+                    if hasattr(record, name):
+                        setattr(record, name, rule(self, record))
+            return record
+
+        decode = _compiled(self.__class__, '_response_decoders', packet_id,
+                           packet['structure'], _compile_response, packet)
+        if self._frame_format == 'lazy':
+            return LazyFrame(self, packet, decode, data)
+
+        info = decode(data)
+
         # Apply parsing rules if any exist
         if 'parsing' in packet:
             for parse_rule in packet['parsing']:
@@ -282,7 +1062,7 @@ class XBeeBase(threading.Thread):
                     # Apply the parse function to the indicated field and 
                     # replace the raw data with the result
                     info[parse_rule[0]] = parse_rule[1](self, info)                                                                                   
-            
+
         return info
         
     def _parse_samples_header(self, io_bytes):
@@ -290,43 +1070,50 @@ class XBeeBase(threading.Thread):
         _parse_samples_header: binary data in XBee IO data format ->
                         (int, [int ...], [int ...], int, int)
                         
-        _parse_samples_header will read the first three bytes of the 
-        binary data given and will return the number of samples which
-        follow, a list of enabled digital inputs, a list of enabled
-        analog inputs, the dio_mask, and the size of the header in bytes
+        _parse_samples_header will read the header of the binary data
+        given, as described by sample_format, and will return the number
+        of samples which follow, a sorted list of enabled digital 
+        inputs, a sorted list of enabled analog inputs, the dio_mask, 
+        and the size of the header in bytes
+
+        A subclass may override this to read headers of another format,
+        which _parse_samples will then use; setting sample_format is 
+        quicker, since each header is then only laid out once.
         """
-        header_size = 3
+        sample_count, layout = self.sample_format.read_header(io_bytes)
         
-        # number of samples (always 1?) is the first byte
-        sample_count = byteToInt(io_bytes[0])
-        
-        # part of byte 1 and byte 2 are the DIO mask ( 9 bits )
-        dio_mask = (byteToInt(io_bytes[1]) << 8 | byteToInt(io_bytes[2])) & 0x01FF
-        
-        # upper 7 bits of byte 1 is the AIO mask
-        aio_mask = (byteToInt(io_bytes[1]) & 0xFE) >> 1
-        
-        # sorted lists of enabled channels; value is position of bit in mask
-        dio_chans = []
-        aio_chans = []
-        
-        for i in range(0,9):
-            if dio_mask & (1 << i):
-                dio_chans.append(i)
-        
-        dio_chans.sort()
-        
-        for i in range(0,7):
-            if aio_mask & (1 << i):
-                aio_chans.append(i)
-        
-        aio_chans.sort()
-            
-        return (sample_count, dio_chans, aio_chans, dio_mask, header_size)
+        return (sample_count, list(layout.dio_chans), list(layout.aio_chans), 
+                layout.dio_mask, self.sample_format.header_size)
+
+    def _read_samples_header(self, io_bytes):
+        """
+        _read_samples_header: binary data in XBee IO data format ->
+                        (int, SampleLayout, int)
+
+        Returns the number of samples which follow the header of the 
+        binary data given, their layout and the size of the header in
+        bytes, through _parse_samples_header if a subclass overrides it.
+        """
+        if self.__class__._parse_samples_header == XBeeBase._parse_samples_header:
+            sample_count, layout = self.sample_format.read_header(io_bytes)
+            return sample_count, layout, self.sample_format.header_size
+
+        sample_count, dio_chans, aio_chans, dio_mask, header_size = \
+            self._parse_samples_header(io_bytes)
+
+        aio_mask = 0
+        for chan in aio_chans:
+            aio_mask |= 1 << chan
+
+        layout = SampleLayout(dio_mask, aio_mask, 
+                              max(list(dio_chans) + [-1]) + 1,
+                              max(list(aio_chans) + [-1]) + 1)
+        return sample_count, layout, header_size
         
-    def _parse_samples(self, io_bytes):
+    def _parse_samples(self, io_bytes, packet_info=None):
         """
-        _parse_samples: binary data in XBee IO data format ->
+        _parse_samples: binary data in XBee IO data format, 
+                        frame info dictionary ->
                         [ {"dio-0":True,
                            "dio-1":False,
                            "adc-0":100"}, ...]
@@ -334,36 +1121,20 @@ class XBeeBase(threading.Thread):
         _parse_samples reads binary data from an XBee device in the IO
         data format specified by the API. It will then return a 
         dictionary indicating the status of each enabled IO port.
+
+        If this instance has sample_columns, the samples are appended
+        to them instead, with the source address found in packet_info
+        (the frame they arrived in), and their number is returned.
         """
 
-        sample_count, dio_chans, aio_chans, dio_mask, header_size = \
-            self._parse_samples_header(io_bytes)
-        
-        samples = []
-        
-        # split the sample data into a list, so it can be pop()'d
-        sample_bytes = [byteToInt(c) for c in io_bytes[header_size:]]
-        
-        # repeat for every sample provided
-        for sample_ind in range(0, sample_count):
-            tmp_samples = {}
-            
-            if dio_chans:
-                # we have digital data
-                digital_data_set = (sample_bytes.pop(0) << 8 | sample_bytes.pop(0))
-                digital_values = dio_mask & digital_data_set
-                
-                for i in dio_chans:
-                    tmp_samples['dio-{0}'.format(i)] = True if (digital_values >> i) & 1 else False
-                        
-            for i in aio_chans:
-                # only first 10 bits are significant
-                analog_sample = (sample_bytes.pop(0) << 8 | sample_bytes.pop(0)) & 0x03FF
-                tmp_samples['adc-{0}'.format(i)] = analog_sample
-            
-            samples.append(tmp_samples)
+        sample_count, layout, header_size = self._read_samples_header(io_bytes)
+
+        if self._sample_columns is not None:
+            return self._sample_columns.extend(
+                layout, io_bytes, header_size, 
+                sample_count, _source_address(packet_info))
         
-        return samples
+        return layout.unpack(io_bytes, header_size, sample_count)
         
     def send(self, cmd, **kwargs):
         """
@@ -378,29 +1149,413 @@ class XBeeBase(threading.Thread):
         field names other than those in reserved_names (like 'id' and
         'order') should be given, unless they are of variable length 
         (of 'None' in the specification. Those are optional).
+
+        A frame ID in use by a request() awaiting its response may not
+        be given, since that request would take the response; a 
+        ValueError is raised instead.
         """
+        if self._requests and 'frame_id' in kwargs:
+            self._check_frame_id(kwargs['frame_id'])
+
         # Pass through the keyword arguments
         self._write(self._build_command(cmd, **kwargs))
+
+    def _check_frame_id(self, frame_id):
+        """
+        _check_frame_id: binary data -> None
+
+        Raises ValueError if the given frame ID is in use by a request
+        awaiting its response.
+        """
+        if len(frame_id) == 1 and byteToInt(frame_id[0:1]) in self._requests:
+            raise ValueError("Frame ID %d is in use by a request awaiting a response"
+                             % byteToInt(frame_id[0:1]))
+
+    def template(self, cmd, **kwargs):
+        """
+        template: string param=binary data ... -> FrameTemplate
+
+        template encodes a command as send() would, given the same 
+        arguments, but returns it as an xbee.frame.FrameTemplate 
+        instead of writing it. Copies of it may then be sent with
+        send_template(), with any of the fields which have a specific
+        length, and follow only fields of a specific length (such as
+        frame_id and dest_addr_long), replaced.
+
+        This avoids encoding the whole of a command which is sent 
+        repeatedly, such as a poll of the same nodes.
+        """
+        encode = self._command_encoder(cmd)
+        fields = dict(encode.offsets)
+        # Replacing it would make it a different command
+        fields.pop('id', None)
+
+        return FrameTemplate(encode(kwargs), fields, self._escaped)
+
+    def send_template(self, template, **kwargs):
+        """
+        send_template: FrameTemplate param=binary data ... -> None
+
+        Writes a copy of the given template (see template()) to the 
+        serial port, with the given fields replaced.
+        """
+        self._write_frame(template.output(**kwargs))
+
+    def send_many(self, cmd, destinations, timeout=None, **kwargs):
+        """
+        send_many: string, [binary data or {field name: binary data} ...],
+                   float param=binary data ... -> [Future ...] or None
+
+        send_many sends the same command to each of the given 
+        destinations. The command is encoded only once, as a template
+        (see template()), from which each destination's frame is made
+        by replacing its address and frame ID; all of the frames are 
+        then written together.
+
+        Each destination is either the value of the command's 
+        dest_addr_long field (or, if it has none, its dest_addr field),
+        or a dictionary of the fields to replace for that destination.
+        Any other arguments are the fields shared by every frame, as
+        for send(); those replaced by the first destination need not be
+        given.
+
+        Unless frame_id is given, each frame is given its own frame ID,
+        as by request(), and a list with a Future for each destination
+        is returned. If fewer frame IDs are free than there are 
+        destinations, the destinations beyond those which could be 
+        given one are sent the command with frame ID 0, requesting no 
+        response, and have None in place of a Future. Give 
+        frame_id=b'\\x00' to send to every destination without any 
+        response. Otherwise, None is returned.
+        """
+        destinations = list(destinations)
+        if not destinations:
+            return None if 'frame_id' in kwargs else []
+
+        encode = self._command_encoder(cmd)
+        if 'dest_addr_long' in encode.offsets:
+            address_field = 'dest_addr_long'
+        else:
+            address_field = 'dest_addr'
+
+        replaced = []
+        for destination in destinations:
+            if isinstance(destination, dict):
+                replaced.append(dict(destination))
+            else:
+                replaced.append({address_field: destination})
+
+        requests = None
+        if 'frame_id' in kwargs:
+            if self._requests:
+                self._check_frame_id(kwargs['frame_id'])
+        elif cmd in self.api_command_responses:
+            requests = self._requests.allocate_many(
+                self.api_command_responses[cmd], len(replaced), timeout,
+                partial=True)
+
+            for fields, (frame_id, future) in zip(replaced, requests):
+                fields['frame_id'] = intToByte(frame_id)
+            for fields in replaced[len(requests):]:
+                fields['frame_id'] = b'\x00'
+
+        try:
+            fields = dict(kwargs)
+            fields.update(replaced[0])
+            template = self.template(cmd, **fields)
+
+            frames = [template.output(**fields) for fields in replaced]
+            self._write_frame(b''.join(frames))
+        except Exception:
+            if requests is not None:
+                for frame_id, future in requests:
+                    self._requests.release(frame_id)
+            raise
+
+        if requests is not None:
+            if timeout is not None:
+                self._deadline_added()
+            return [future for frame_id, future in requests] + \
+                   [None] * (len(replaced) - len(requests))
+        return None
+
+    def request(self, cmd, timeout=None, **kwargs):
+        """
+        request: string, float param=binary data ... -> Future
+
+        request sends a command in the same way as send(), but with a
+        frame ID allocated by this object, and returns a 
+        concurrent.futures.Future. When the matching response arrives,
+        the Future's result is set to that frame's info dictionary.
+        If timeout is given and no response arrives within that many
+        seconds, the Future fails with a TimeoutError and the frame ID
+        may be reused. halt() cancels every request still awaiting its
+        response.
+
+        Many requests may be awaiting a response at once. Responses 
+        are matched as they are read from the serial port, either by
+        the background thread or by calls to wait_read_frame() or
+        poll(); matched responses are not otherwise returned.
+
+        Frame IDs are allocated from 2 to 255, leaving 1, the default
+        frame ID of several commands, to commands sent with send().
+        """
+        if 'frame_id' in kwargs:
+            raise ValueError("The frame_id of a request is allocated automatically")
+
+        try:
+            response_names = self.api_command_responses[cmd]
+        except KeyError:
+            raise ValueError("The command '%s' has no response to wait for" % cmd)
+
+        frame_id, future = self._requests.allocate(response_names, timeout)
+
+        try:
+            self._write(self._build_command(
+                cmd, frame_id=intToByte(frame_id), **kwargs))
+        except Exception:
+            self._requests.release(frame_id)
+            raise
+
+        if timeout is not None:
+            # A thread may be waiting without a deadline
+            self._deadline_added()
+
+        return future
+
+    def poll(self):
+        """
+        poll: None -> None
+
+        poll reads any data waiting on the serial port, waiting for it
+        as determined by the reader mode. Pending requests answered by
+        the frames which arrive are completed; any other frames are 
+        kept for wait_read_frame().
+
+        This allows responses to requests to be received without a
+        background thread; it must not be called while one is running.
+        """
+        self._read_frames()
         
         
-    def wait_read_frame(self):
+    def wait_read_frame(self, timeout=None):
         """
-        wait_read_frame: None -> frame info dictionary
+        wait_read_frame: float -> frame info dictionary
         
         wait_read_frame calls XBee._wait_for_frame() and waits until a
         valid frame appears on the serial port. Once it receives a frame,
         wait_read_frame attempts to parse the data contained within it
         and returns the resulting dictionary
+
+        If timeout is given and no frame arrives within that many
+        seconds, None is returned; see wait_for().
         """
-        
-        frame = self._wait_for_frame()
-        return self._split_response(frame.data)
+        return self.wait_for(None, timeout)
+
+    def wait_for(self, predicate, timeout=None):
+        """
+        wait_for: function, float -> frame info dictionary or None
+
+        wait_for waits until a frame for which the given function
+        returns True has been read (any frame, if it is None), and
+        returns it. If timeout is given and no such frame arrives within
+        that many seconds, None is returned.
+
+        Frames which do not match are kept, in order, for other calls
+        to wait_for() and wait_read_frame(), which may be made from 
+        other threads at the same time: one of the waiting threads 
+        reads from the serial port, while the rest wait to be woken 
+        when it has read frames. A timeout may be overrun by up to one
+        read (see the reader constructor argument).
+
+        A frame which cannot be parsed raises its exception in the 
+        first call without a predicate to reach it. At most max_inbox
+        frames are kept (see the constructor arguments); each call tests
+        each frame with its predicate only once.
+        """
+        # The number of the last frame this call has tested
+        scanned = [0]
+        return self._wait_inbox(
+            lambda: self._take_frame(predicate, scanned), timeout)
+
+    def _wait_inbox(self, take, timeout=None):
+        """
+        _wait_inbox: function, float -> any
+
+        _wait_inbox reads frames, taking turns to read as wait_for()
+        describes, until the given function (called with _inbox_ready
+        held, to take what it needs from the inbox) returns something
+        other than None, and returns that. If timeout is given and 
+        nothing is returned within that many seconds, None is returned.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        reading = False
+        self._inbox_ready.acquire()
+        try:
+            while True:
+                if self._callback and not self._thread_continue:
+                    raise ThreadQuitException
+
+                info = take()
+                if info is not None:
+                    return info
+
+                if timeout is None:
+                    remaining = None
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return None
+
+                if not (reading or self._inbox_reading):
+                    # Become the thread which reads
+                    reading = self._inbox_reading = True
+
+                if reading:
+                    self._inbox_ready.release()
+                    try:
+                        self._read_frames()
+                    finally:
+                        self._inbox_ready.acquire()
+
+                    if self._frames:
+                        self._inbox_ready.notify_all()
+                else:
+                    self._inbox_ready.wait(remaining)
+        finally:
+            if reading:
+                # Let another waiting thread read
+                self._inbox_reading = False
+                self._inbox_ready.notify_all()
+            self._inbox_ready.release()
+
+    def _parse_frames(self):
+        """
+        _parse_frames: None -> None
+
+        Parses the frames which have been read since the last call, and
+        adds them (or the exceptions raised in parsing them) to the 
+        inbox. Must be called with _inbox_ready held.
+        """
+        inbox = self._inbox
+
+        while self._frames:
+            try:
+                info = self._parse_frame(self._frames.popleft())
+            except Exception as exc:
+                info = exc
+            if info is not None:
+                if len(inbox) >= self._max_inbox:
+                    inbox.popleft()
+                    self.inbox_frames_dropped += 1
+                self._inbox_count += 1
+                inbox.append((self._inbox_count, info))
+
+    def _take_frame(self, predicate, scanned):
+        """
+        _take_frame: function, [int] -> frame info dictionary or None
+
+        Removes and returns the first frame read which satisfies the
+        given predicate (or any frame, if it is None). Only frames
+        numbered after scanned[0] are tested, and scanned[0] is advanced
+        past those tested. Must be called with _inbox_ready held.
+        """
+        self._parse_frames()
+        inbox = self._inbox
+
+        if predicate is None:
+            if not inbox:
+                return None
+            number, info = inbox.popleft()
+            if isinstance(info, Exception):
+                raise info
+            return info
+
+        # The frames which have arrived since the last call, newest first
+        fresh = []
+        for number, info in reversed(inbox):
+            if number <= scanned[0]:
+                break
+            fresh.append(info)
+
+        if fresh:
+            scanned[0] = self._inbox_count
+
+        for age in range(len(fresh) - 1, -1, -1):
+            info = fresh[age]
+            if not isinstance(info, Exception) and predicate(info):
+                del inbox[len(inbox) - 1 - age]
+                return info
+
+        return None
+
+    def _parse_frame(self, frame):
+        """
+        _parse_frame: APIFrame -> frame info dictionary or None
+
+        Parses the given frame as wait_read_frame() returns it, or 
+        returns None if it should be dropped.
+        """
+        data = frame.data
+
+        if self._unknown_frames != 'raise' and data[0:1] not in self.api_responses:
+            if self._unknown_frames == 'pass':
+                return {'id':'unknown', 'data':data}
+
+            self.unknown_frames_dropped += 1
+            return None
+
+        return self._split_response(data)
+
+    def _wait_read_batch(self):
+        """
+        _wait_read_batch: None -> [frame info dictionary ...]
+
+        Waits for a frame, as wait_read_frame() does, then returns it
+        along with every other frame which has been read, up to 
+        max_batch frames. While there are fewer, reading continues 
+        until max_linger seconds have passed since the first arrived.
+        """
+        batch = [self.wait_read_frame()]
+
+        def take():
+            self._parse_frames()
+
+            # Stop short of any frame which could not be parsed, so
+            # that it is raised by the next wait_read_frame()
+            inbox = self._inbox
+            while inbox and len(batch) < self._max_batch and \
+                  not isinstance(inbox[0][1], Exception):
+                batch.append(inbox.popleft()[1])
+
+            if inbox or len(batch) >= self._max_batch:
+                return batch
+            return None
+
+        with self._inbox_ready:
+            done = take()
+
+        if done is None and self._max_linger > 0:
+            # Read any more through _wait_inbox(), so that only one 
+            # thread reads at a time
+            try:
+                self._wait_inbox(take, self._max_linger)
+            except ThreadQuitException:
+                # Deliver what has been read; the next read will quit
+                pass
+
+        return batch
         
     def __getattr__(self, name):
         """
         If a method by the name of a valid api command is called,
         the arguments will be automatically sent to an appropriate
         send() call
+
+        This only happens for commands without a generated shorthand
+        method; see __init_subclass__.
         """
 
         # If api_commands is not defined, raise NotImplementedError\
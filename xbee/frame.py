@@ -9,6 +9,70 @@ Represents an API frame for communicating with an XBee
 import struct
 from xbee.python2to3 import byteToInt, intToByte
 
+# Special bytes and their escaped forms. The escape byte itself must be
+# escaped first (and unescaped last) so that the escape bytes inserted
+# for the others are never escaped again.
+_ESCAPES = ((b'\x7D', b'\x7D\x5D'),
+            (b'\x7E', b'\x7D\x5E'),
+            (b'\x11', b'\x7D\x31'),
+            (b'\x13', b'\x7D\x33'))
+
+_SPECIAL_BYTES = b''.join(byte for byte, escaped in _ESCAPES)
+
+# The form in which each byte value is written in escaped mode
+_ESCAPED_FORMS = tuple(dict(_ESCAPES).get(intToByte(value), intToByte(value))
+                       for value in range(256))
+
+def _escape_into(buffer, pos, data):
+    """
+    _escape_into: bytearray, int, binary data -> int
+
+    Writes the given data, escaped, into the bytearray at pos (which
+    must not be greater than its length) and returns the position just
+    past it. Runs of ordinary bytes between the special bytes are 
+    copied straight from the data.
+    """
+    if not hasattr(data, 'find'):
+        # A memoryview
+        data = bytes(data)
+
+    view = memoryview(data)
+    # The position of the next occurrence of each special byte
+    found = [data.find(byte) for byte, escaped in _ESCAPES]
+    start = 0
+
+    while True:
+        index = -1
+        for i, position in enumerate(found):
+            if position >= 0 and (index < 0 or position < found[index]):
+                index = i
+
+        end = len(data) if index < 0 else found[index]
+        buffer[pos:pos + end - start] = view[start:end]
+        pos += end - start
+
+        if index < 0:
+            return pos
+
+        byte, escaped = _ESCAPES[index]
+        buffer[pos:pos + 2] = escaped
+        pos += 2
+        start = end + 1
+        found[index] = data.find(byte, start)
+
+def _byte_sum(data):
+    """
+    _byte_sum: binary data -> int
+
+    Adds together the values of all bytes in the given bytes, bytearray
+    or memoryview.
+    """
+    try:
+        return sum(data)
+    except TypeError:
+        # Python 2 byte strings are made of characters, not integers
+        return sum(bytearray(data))
+
 class APIFrame:
     """
     Represents a frame of data to be sent to or which was received 
@@ -35,16 +99,7 @@ class APIFrame:
         frame, saves the last byte of the result, and subtracts it from 
         0xFF. The final result is the checksum
         """
-        total = 0
-        
-        # Add together all bytes
-        for byte in self.data:
-            total += byteToInt(byte)
-            
-        # Only keep the last byte
-        total = total & 0xFF
-        
-        return intToByte(0xFF - total)
+        return intToByte(0xFF - (_byte_sum(self.data) & 0xFF))
 
     def verify(self, chksum):
         """
@@ -54,20 +109,10 @@ class APIFrame:
         determines whether the result is correct. The result should 
         be 0xFF.
         """
-        total = 0
-        
-        # Add together all bytes
-        for byte in self.data:
-            total += byteToInt(byte)
-                
-        # Add checksum too
-        total += byteToInt(chksum)
+        total = _byte_sum(self.data) + byteToInt(chksum)
         
-        # Only keep low bits
-        total &= 0xFF
-        
-        # Check result
-        return total == 0xFF
+        # Only keep low bits and check result
+        return total & 0xFF == 0xFF
 
     def len_bytes(self):
         """
@@ -86,20 +131,53 @@ class APIFrame:
         output will produce a valid API frame for transmission to an 
         XBee module.
         """
+        buffer = bytearray()
+        self.encode_into(buffer)
+        return bytes(buffer)
+
+    def encode_into(self, buffer, offset=0):
+        """
+        encode_into: bytearray, int -> int
+
+        encode_into writes the same API frame as output() directly into
+        the given bytearray, starting at offset, and returns the offset
+        just past the end of the frame. The bytearray is extended if it
+        is too short to hold the frame; offset must not be greater than
+        its length.
+
+        This allows a single buffer to be reused for every frame sent.
+        """
         # start is one byte long, length is two bytes
         # data is n bytes long (indicated by length)
         # chksum is one byte long
-        data = self.len_bytes() + self.data + self.checksum()
-
-        # Only run the escaoe process if it hasn't been already
-        if self.escaped and len(self.raw_data) < 1:
-            self.raw_data = APIFrame.escape(data)
+        data_len = len(self.data)
+        chksum = 0xFF - (_byte_sum(self.data) & 0xFF)
 
         if self.escaped:
-            data = self.raw_data
+            # Never escape start byte
+            buffer[offset:offset + 1] = APIFrame.START_BYTE
+            pos = offset + 1
+
+            for value in (data_len >> 8, data_len & 0xFF):
+                form = _ESCAPED_FORMS[value]
+                buffer[pos:pos + len(form)] = form
+                pos += len(form)
+
+            pos = _escape_into(buffer, pos, self.data)
+
+            form = _ESCAPED_FORMS[chksum]
+            buffer[pos:pos + len(form)] = form
+            return pos + len(form)
 
-        # Never escape start byte
-        return APIFrame.START_BYTE + data
+        end = offset + 4 + data_len
+        if len(buffer) < end:
+            buffer.extend(b'\x00' * (end - len(buffer)))
+
+        struct.pack_into("> BH", buffer, offset, 
+                         byteToInt(APIFrame.START_BYTE), data_len)
+        buffer[offset + 3:end - 1] = self.data
+        buffer[end - 1] = chksum
+        return end
 
     @staticmethod
     def escape(data):
@@ -108,18 +186,37 @@ class APIFrame:
 
         When a 'special' byte is encountered in the given data string,
         it is preceded by an escape byte and XORed with 0x20.
+
+        Each special byte is replaced throughout the data at once, so
+        runs of ordinary bytes are copied without being inspected
+        individually.
         """
+        escaped_data = bytes(data)
+
+        for byte, escaped in _ESCAPES:
+            if byte in escaped_data:
+                escaped_data = escaped_data.replace(byte, escaped)
 
-        escaped_data = b""
-        for byte in data:
-            if intToByte(byteToInt(byte)) in APIFrame.ESCAPE_BYTES:
-                escaped_data += APIFrame.ESCAPE_BYTE
-                escaped_data += intToByte(0x20 ^ byteToInt(byte))
-            else:
-                escaped_data += intToByte(byteToInt(byte))
-                    
         return escaped_data
 
+    @staticmethod
+    def unescape(data):
+        """
+        unescape: byte string -> byte string
+
+        Reverses escape(). The given data must not end with an escape
+        byte whose escaped byte has not been received yet.
+        """
+        unescaped_data = bytes(data)
+
+        if APIFrame.ESCAPE_BYTE not in unescaped_data:
+            return unescaped_data
+
+        for byte, escaped in reversed(_ESCAPES):
+            unescaped_data = unescaped_data.replace(escaped, byte)
+
+        return unescaped_data
+
     def fill(self, byte):
         """
         fill: byte -> None
@@ -177,3 +274,313 @@ class APIFrame:
         self.data = data
         if not self.verify(chksum):
             raise ValueError("Invalid checksum")
+
+
+class FrameTemplate(object):
+    """
+    An API frame which has been encoded once, from which copies may be
+    made that differ only in some fields of a specific length (such as
+    a frame ID or destination address). Everything else, including its
+    escaped form, is reused as it is; the checksum is corrected for
+    the bytes which have changed, and only those bytes are escaped.
+    """
+
+    # Each checksum byte, 0xFF - (sum & 0xFF), as written without and
+    # with escaping
+    _CHECKSUMS = tuple(intToByte(0xFF - i) for i in range(256))
+    _ESCAPED_CHECKSUMS = tuple(APIFrame.escape(byte) for byte in _CHECKSUMS)
+
+    def __init__(self, data, fields, escaped=False):
+        """
+        data: the binary data of the frame, with a value for every field
+        fields: {field name: (offset, length)}, giving the position in
+                data of each field which may be replaced
+        escaped: whether the frame should be written in escaped form
+        """
+        data = bytes(data)
+        self.data = data
+        self.escaped = escaped
+        self._sum = _byte_sum(data)
+
+        # The frame is put together from parts: the bytes between the
+        # fields, which never change, and the fields themselves
+        self._positions = {}
+        parts = []
+        header = struct.pack("> H", len(data))
+        if escaped:
+            header = APIFrame.escape(header)
+        end = 0
+
+        for name, (offset, length) in sorted(fields.items(), 
+                                             key=lambda item: item[1]):
+            parts.append(self._escape(data[end:offset]))
+            self._positions[name] = (len(parts), length, 
+                                     _byte_sum(data[offset:offset + length]))
+            parts.append(self._escape(data[offset:offset + length]))
+            end = offset + length
+
+        parts.append(self._escape(data[end:]))
+        parts[0] = APIFrame.START_BYTE + header + parts[0]
+        # Followed by the checksum
+        parts.append(None)
+        self._parts = parts
+
+        if escaped:
+            self._checksums = self._ESCAPED_CHECKSUMS
+        else:
+            self._checksums = self._CHECKSUMS
+
+    def _escape(self, data):
+        data = bytes(data)
+        # Most fields have nothing to escape, which is quicker to find
+        # by deleting the special bytes than by escape()
+        if self.escaped and len(data.translate(None, _SPECIAL_BYTES)) != len(data):
+            return APIFrame.escape(data)
+        return data
+
+    def output(self, **fields):
+        """
+        output: field name=binary data ... -> valid API frame (binary data)
+
+        Produces the API frame, as APIFrame.output() would, with the
+        given fields replaced. Each must be one of those given when the
+        template was made, and the same length as before.
+        """
+        parts = list(self._parts)
+        total = self._sum
+
+        for name, value in fields.items():
+            try:
+                index, length, original_sum = self._positions[name]
+            except KeyError:
+                raise KeyError("The field '%s' may not be replaced in this template" 
+                               % name)
+
+            if len(value) != length:
+                raise ValueError(
+                    "The data provided for '%s' was not %d bytes long"
+                    % (name, length))
+
+            total += _byte_sum(value) - original_sum
+            parts[index] = self._escape(value)
+
+        parts[-1] = self._checksums[total & 0xFF]
+        return b''.join(parts)
+
+class APIFrameDecoder(object):
+    """
+    Incrementally decodes API frames from a stream of raw bytes.
+
+    Data read from a serial port may be passed to feed() in chunks of
+    any size. Every complete frame found whose checksum is valid is
+    returned as an APIFrame; a partially received frame is kept until
+    the rest of it arrives in a later chunk.
+
+    Frames which claim a length of zero or more than max_length bytes
+    are rejected as soon as their length is known. When a frame is
+    rejected, the bytes following its start byte are searched again,
+    so that a valid frame beginning inside a corrupt one is not lost.
+
+    The following counters are kept:
+        bytes_discarded: bytes which were not part of a valid frame
+                         (counted after unescaping in escaped mode)
+        checksum_errors: frames rejected due to a bad checksum
+        length_errors:   frames rejected due to an impossible length
+        frames_abandoned: partially received frames given up on by
+                         abandon()
+    """
+
+    # No XBee module sends a frame anywhere near this long (the largest
+    # RF payload of any series is 256 bytes, plus at most a few dozen
+    # bytes of addressing), so longer lengths are soon known to be 
+    # corrupt rather than waited upon
+    MAX_DATA_LENGTH = 512
+
+    def __init__(self, escaped=False, max_length=MAX_DATA_LENGTH):
+        self.escaped = escaped
+        self.max_length = max_length
+        self.bytes_discarded = 0
+        self.checksum_errors = 0
+        self.length_errors = 0
+        self.frames_abandoned = 0
+        self._buffer = bytearray()
+        self._in_frame = False
+        self._unescape_next_byte = False
+
+    def feed(self, data):
+        """
+        feed: binary data -> [APIFrame ...]
+
+        Adds the given chunk of raw bytes to the decoder and returns
+        a list of all of the valid frames which could be completed
+        with it, in the order in which they were received.
+        """
+        if self.escaped:
+            return self._feed_escaped(data)
+        return self._feed_unescaped(data)
+
+    @property
+    def pending(self):
+        """
+        The number of bytes held of a partially received frame
+        """
+        if self.escaped:
+            return 1 + len(self._buffer) if self._in_frame else 0
+        return len(self._buffer)
+
+    def abandon(self):
+        """
+        abandon: None -> [APIFrame ...]
+
+        Gives up on the partially received frame, if there is one, as
+        though its start byte had been corrupt; this is for when the
+        rest of it is not going to arrive. As when a frame is rejected,
+        the bytes following its start byte are searched again, and any
+        frames found among them are returned; whatever remains is also
+        given up on, since none of it is any more recent.
+        """
+        frames = []
+
+        while self.pending:
+            self.frames_abandoned += 1
+
+            if self.escaped:
+                # A start byte can't appear within the frame
+                self.bytes_discarded += self.pending
+                del self._buffer[:]
+                self._in_frame = False
+                self._unescape_next_byte = False
+            else:
+                rest = bytes(self._buffer[1:])
+                self.bytes_discarded += 1
+                del self._buffer[:]
+                frames.extend(self._feed_unescaped(rest))
+
+        return frames
+
+    def _valid_length(self, data_len):
+        """
+        Determines whether a frame could have the given length,
+        counting those which could not
+        """
+        if 0 < data_len <= self.max_length:
+            return True
+
+        self.length_errors += 1
+        return False
+
+    def _feed_unescaped(self, data):
+        """
+        Without escaping, a start byte may also appear within a frame,
+        so the buffer holds raw bytes starting at the next candidate
+        start byte.
+        """
+        buf = self._buffer
+        buf.extend(data)
+        frames = []
+        index = 0
+
+        while True:
+            start = buf.find(APIFrame.START_BYTE, index)
+            if start < 0:
+                # Nothing worth keeping
+                start = len(buf)
+
+            self.bytes_discarded += start - index
+            index = start
+
+            # Start byte and two length bytes
+            if len(buf) - index < 3:
+                break
+
+            data_len = struct.unpack_from("> H", buf, index + 1)[0]
+
+            if self._valid_length(data_len):
+                frame_end = index + 4 + data_len
+
+                if frame_end > len(buf):
+                    break
+
+                frame = APIFrame(bytes(buf[index + 3:frame_end - 1]), self.escaped)
+                if frame.verify(buf[frame_end - 1]):
+                    frames.append(frame)
+                    index = frame_end
+                    continue
+
+                self.checksum_errors += 1
+
+            # Not a real start byte; search again from the next byte
+            self.bytes_discarded += 1
+            index += 1
+
+        del buf[:index]
+        return frames
+
+    def _feed_escaped(self, data):
+        """
+        With escaping, a start byte can only begin a frame, so the
+        stream is split on start bytes and the buffer holds the
+        unescaped contents of the frame currently being received.
+        """
+        frames = []
+        buf = self._buffer
+
+        for index, part in enumerate(bytes(data).split(APIFrame.START_BYTE)):
+            if index > 0:
+                # Any incomplete frame in progress is abandoned
+                if self._in_frame:
+                    self.bytes_discarded += 1 + len(buf)
+                del buf[:]
+                self._in_frame = True
+                self._unescape_next_byte = False
+            elif not self._in_frame:
+                self.bytes_discarded += len(part)
+                continue
+
+            self._unescape_into(part)
+
+            # Two length bytes
+            if len(buf) < 2:
+                continue
+
+            data_len = struct.unpack_from("> H", buf)[0]
+
+            if self._valid_length(data_len):
+                frame_end = 3 + data_len
+
+                if frame_end > len(buf):
+                    continue
+
+                frame = APIFrame(bytes(buf[2:frame_end - 1]), self.escaped)
+                if frame.verify(buf[frame_end - 1]):
+                    frames.append(frame)
+                    self.bytes_discarded += len(buf) - frame_end
+                else:
+                    self.checksum_errors += 1
+                    self.bytes_discarded += 1 + len(buf)
+            else:
+                self.bytes_discarded += 1 + len(buf)
+
+            # Ignore everything up to the next start byte
+            del buf[:]
+            self._in_frame = False
+            self._unescape_next_byte = False
+
+        return frames
+
+    def _unescape_into(self, part):
+        """
+        Unescapes the given escaped bytes onto the end of the buffer.
+        An escape byte at the end of the part applies to the first
+        byte of the next part.
+        """
+        if self._unescape_next_byte and part:
+            self._buffer.append(byteToInt(part[0:1]) ^ 0x20)
+            self._unescape_next_byte = False
+            part = part[1:]
+
+        if part.endswith(APIFrame.ESCAPE_BYTE):
+            self._unescape_next_byte = True
+            part = part[:-1]
+
+        self._buffer.extend(APIFrame.unescape(part))
@@ -0,0 +1 @@
+from xbee.helpers.multiplex.multiplex import Multiplexer
@@ -0,0 +1,221 @@
+"""
+multiplex.py
+
+Reads from many XBee devices in a single thread, using the selectors
+module to wait on all of their serial ports at once. Requires Python 3.4
+or later, and serial ports which provide fileno() (as PySerial's do on
+POSIX systems).
+"""
+import logging, os, threading, time
+
+try:
+    import selectors
+except ImportError:
+    # Before Python 3.4
+    selectors = None
+
+log = logging.getLogger(__name__)
+
+class Multiplexer(object):
+    """
+    Watches the serial ports of many XBee objects (XBee, ZigBee or
+    XBeePro900 instances created without a callback) from one thread,
+    and calls a callback for each frame which arrives on each of them.
+
+    Frames are parsed by their own XBee object, as wait_read_frame()
+    would return them, and responses to requests made with request()
+    complete their Futures as usual. Requests which time out fail, and
+    partly received frames are abandoned after the inter_byte_timeout
+    of their XBee object, while the multiplexer is polling.
+
+    Usage:
+        mux = Multiplexer()
+        mux.add(ZigBee(serial_1), handle_frame)
+        mux.add(ZigBee(serial_2), handle_other_frame)
+        mux.start()
+        ...
+        mux.stop()
+
+    Devices may be added and removed at any time, from any thread.
+    A callback which raises an exception stops the multiplexer, as it
+    would stop the background thread of an XBee object. A frame which
+    cannot be parsed, however, is logged and skipped, so that one
+    device cannot stop the others.
+
+    Attributes:
+        parse_errors: number of frames which could not be parsed.
+        last_error: the last exception raised in parsing one, or None.
+    """
+
+    def __init__(self):
+        if selectors is None:
+            raise NotImplementedError("Multiplexer requires Python 3.4 or later")
+
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._changes = []
+        self._devices = {}
+        self._thread = None
+        self._running = False
+        self.parse_errors = 0
+        self.last_error = None
+
+        # Written to in order to wake the thread from select()
+        self._wake_read, self._wake_write = os.pipe()
+        self._selector.register(self._wake_read, selectors.EVENT_READ)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def add(self, xbee, callback):
+        """
+        add: XBeeBase, function -> None
+
+        Starts watching the serial port of the given XBee object, and
+        calling the given function with each frame which arrives on it.
+        """
+        if xbee.is_alive():
+            raise ValueError("The XBee object already has a thread of its own; create it without a callback")
+        if xbee._multiplexer is not None:
+            raise ValueError("The XBee object is already watched by a Multiplexer")
+
+        xbee._multiplexer = self
+        self._change(lambda: self._register(xbee, callback))
+
+    def remove(self, xbee):
+        """
+        remove: XBeeBase -> None
+
+        Stops watching the serial port of the given XBee object.
+        """
+        if xbee._multiplexer is self:
+            xbee._multiplexer = None
+        self._change(lambda: self._unregister(xbee))
+
+    def _change(self, change):
+        with self._lock:
+            self._changes.append(change)
+        self._wake()
+
+    def _register(self, xbee, callback):
+        self._selector.register(xbee.serial, selectors.EVENT_READ,
+                                (xbee, callback))
+        self._devices[xbee] = callback
+
+    def _unregister(self, xbee):
+        if self._devices.pop(xbee, None) is not None:
+            self._selector.unregister(xbee.serial)
+
+    def _wake(self):
+        os.write(self._wake_write, b'\x00')
+
+    def poll(self, timeout=None):
+        """
+        poll: float -> None
+
+        Waits at most timeout seconds (or indefinitely) for data to
+        arrive on any port, then reads it and calls the callback with
+        each frame completed. The wait ends early when a pending request
+        of any device expires, or a partly received frame is due to be
+        abandoned. This is called repeatedly by the thread started by
+        start(), but may be called directly instead.
+        """
+        with self._lock:
+            changes, self._changes = self._changes, []
+        for change in changes:
+            change()
+
+        deadline = self._next_deadline()
+        if deadline is not None:
+            wait = max(deadline - time.time(), 0)
+            if timeout is None or wait < timeout:
+                timeout = wait
+
+        for key, events in self._selector.select(timeout):
+            if key.fileobj == self._wake_read:
+                os.read(self._wake_read, 512)
+            else:
+                self._read(*key.data)
+
+        for xbee, callback in list(self._devices.items()):
+            if xbee._requests:
+                xbee._requests.expire()
+            xbee._abandon_stale_frame()
+            self._deliver(xbee, callback)
+
+    def _next_deadline(self):
+        deadlines = [deadline for deadline in 
+                     (xbee._next_deadline() for xbee in self._devices)
+                     if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def _read(self, xbee, callback):
+        serial = xbee.serial
+        data = serial.read(serial.inWaiting() or 1)
+
+        # A port which is ready, but has nothing to read, has closed
+        if not data:
+            self._unregister(xbee)
+            return
+
+        xbee._receive(data)
+        self._deliver(xbee, callback)
+
+    def _deliver(self, xbee, callback):
+        frames = xbee._frames
+        while frames:
+            frame = frames.popleft()
+            try:
+                info = xbee._parse_frame(frame)
+            except Exception as error:
+                log.exception("Could not parse frame %r from %r",
+                              frame.data, xbee.serial)
+                self.parse_errors += 1
+                self.last_error = error
+                continue
+
+            if info is not None:
+                callback(info)
+
+    def start(self):
+        """
+        start: None -> None
+
+        Starts a thread which calls poll() until stop() is called.
+        """
+        self._running = True
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while self._running:
+                self.poll()
+        finally:
+            self._running = False
+
+    def stop(self):
+        """
+        stop: None -> None
+
+        Stops the thread started by start(), without waiting for any
+        port, and waits for it to finish.
+        """
+        self._running = False
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """
+        close: None -> None
+
+        Stops the thread, if it is running, and releases the resources
+        used to watch the ports. The ports themselves are not closed.
+        """
+        self.stop()
+        self._selector.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
@@ -0,0 +1,199 @@
+"""
+test_multiplex.py
+
+Tests the Multiplexer module, with pipes standing in for serial ports.
+"""
+import threading, time, unittest
+from xbee.frame import APIFrame
+from xbee.ieee import XBee
+from xbee.zigbee import ZigBee
+from xbee.tests.Fake import FakePipeDevice
+from xbee.helpers.multiplex import Multiplexer
+from xbee.helpers.multiplex.multiplex import selectors
+
+try:
+    from concurrent.futures import TimeoutError
+except ImportError:
+    # Python 2, without the futures package installed
+    TimeoutError = None
+
+@unittest.skipIf(selectors is None, "the multiplexer requires Python 3.4")
+class TestMultiplexer(unittest.TestCase):
+    """
+    Tests xbee.helpers.multiplex for expected behavior
+    """
+
+    def setUp(self):
+        self.mux = Multiplexer()
+        self.devices = [FakePipeDevice() for i in range(3)]
+        self.received = []
+
+    def tearDown(self):
+        self.mux.close()
+        for device in self.devices:
+            device.close()
+
+    def callback(self, index):
+        return lambda frame: self.received.append((index, frame))
+
+    def test_poll(self):
+        """
+        poll should read from every ready port and call each device's
+        callback with its own frames
+        """
+        for index, device in enumerate(self.devices):
+            self.mux.add(ZigBee(device), self.callback(index))
+
+        self.devices[0].feed(APIFrame(b'\x8a\x00').output())
+        self.devices[2].feed(APIFrame(b'\x8a\x02').output() * 2)
+        self.mux.poll(1)
+
+        self.assertEqual(sorted((index, frame['status']) 
+                                for index, frame in self.received),
+                         [(0, b'\x00'), (2, b'\x02'), (2, b'\x02')])
+
+    def test_partial_frames(self):
+        """
+        a frame arriving in pieces should be reassembled
+        """
+        self.mux.add(XBee(self.devices[0], escaped=True), self.callback(0))
+        frame = APIFrame(b'\x8a\x11', escaped=True).output()
+
+        for i in range(len(frame)):
+            self.devices[0].feed(frame[i:i + 1])
+            self.mux.poll(1)
+
+        self.assertEqual([frame['status'] for index, frame in self.received],
+                         [b'\x11'])
+
+    def test_thread(self):
+        """
+        a single thread should serve every device until stopped
+        """
+        threads = threading.active_count()
+        for index, device in enumerate(self.devices):
+            self.mux.add(ZigBee(device), self.callback(index))
+        self.mux.start()
+
+        for device in self.devices:
+            device.feed(APIFrame(b'\x8a\x00').output())
+        deadline = time.time() + 5
+        while len(self.received) < 3 and time.time() < deadline:
+            time.sleep(.01)
+
+        self.assertEqual(len(self.received), 3)
+        self.assertEqual(threading.active_count(), threads + 1)
+        self.mux.stop()
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_remove(self):
+        """
+        a removed device should no longer be read from
+        """
+        xbee = ZigBee(self.devices[0])
+        self.mux.add(xbee, self.callback(0))
+        self.mux.poll(0)
+        self.mux.remove(xbee)
+
+        self.devices[0].feed(APIFrame(b'\x8a\x00').output())
+        self.mux.poll(.05)
+
+        self.assertEqual(self.received, [])
+        self.assertEqual(len(self.mux), 0)
+
+    def test_request(self):
+        """
+        a response to a request should complete its Future, rather
+        than being passed to the callback
+        """
+        xbee = ZigBee(self.devices[0])
+        xbee._write = lambda data: None
+        self.mux.add(xbee, self.callback(0))
+
+        future = xbee.request('at', command=b'MY')
+        self.devices[0].feed(APIFrame(b'\x88\x02MY\x00\x12\x34').output())
+        self.mux.poll(1)
+
+        self.assertEqual(future.result(0)['parameter'], b'\x12\x34')
+        self.assertEqual(self.received, [])
+
+    def test_request_timeout(self):
+        """
+        a request which times out should fail while the thread waits
+        for data, without any arriving
+        """
+        xbee = ZigBee(self.devices[0])
+        xbee._write = lambda data: None
+        self.mux.add(xbee, self.callback(0))
+        self.mux.start()
+
+        future = xbee.request('at', timeout=.1, command=b'MY')
+        start = time.time()
+        self.assertIsInstance(future.exception(2), TimeoutError)
+        self.assertLess(time.time() - start, 1)
+
+    def test_inter_byte_timeout(self):
+        """
+        a partial frame should be abandoned once no more of it has
+        arrived for inter_byte_timeout seconds
+        """
+        xbee = ZigBee(self.devices[0], inter_byte_timeout=.05)
+        self.mux.add(xbee, self.callback(0))
+
+        # The rest of this frame never arrives
+        self.devices[0].feed(b'\x7E\x00\x20\x8a')
+        self.mux.poll(1)
+        start = time.time()
+        self.mux.poll(1)
+
+        self.assertLess(time.time() - start, .5)
+        self.assertEqual(xbee.decoder.frames_abandoned, 1)
+
+    def test_parse_error(self):
+        """
+        a frame which cannot be parsed should be logged and skipped,
+        without stopping the frames of other devices
+        """
+        for index, device in enumerate(self.devices[:2]):
+            self.mux.add(ZigBee(device), self.callback(index))
+
+        # Too short to be a tx_status frame
+        self.devices[0].feed(APIFrame(b'\x8b\x01').output() +
+                             APIFrame(b'\x8a\x00').output())
+        self.devices[1].feed(APIFrame(b'\x8a\x01').output())
+        with self.assertLogs('xbee.helpers.multiplex', level='ERROR'):
+            self.mux.poll(1)
+
+        self.assertEqual(sorted((index, frame['status']) 
+                                for index, frame in self.received),
+                         [(0, b'\x00'), (1, b'\x01')])
+        self.assertEqual(self.mux.parse_errors, 1)
+        self.assertIsInstance(self.mux.last_error, ValueError)
+
+    def test_device_with_thread(self):
+        """
+        a device which has a thread of its own should be rejected
+        """
+        xbee = ZigBee(self.devices[0], callback=lambda frame: None,
+                      reader='select')
+        try:
+            self.assertRaises(ValueError, self.mux.add, xbee, 
+                              self.callback(0))
+        finally:
+            xbee.halt()
+
+    def test_device_in_two_multiplexers(self):
+        """
+        a device already watched by a Multiplexer should be rejected
+        """
+        xbee = ZigBee(self.devices[0])
+        self.mux.add(xbee, self.callback(0))
+
+        other = Multiplexer()
+        try:
+            self.assertRaises(ValueError, other.add, xbee, self.callback(0))
+        finally:
+            other.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1 @@
+from xbee.helpers.pipeline.pipeline import Pipeline
@@ -0,0 +1,164 @@
+"""
+pipeline.py
+
+Provides the Pipeline class, which sends many commands (typically AT
+and remote AT commands) to an XBee device without waiting for each
+response before sending the next.
+"""
+import time
+from collections import deque
+try:
+    from concurrent.futures import wait, FIRST_COMPLETED
+except ImportError:
+    # Python 2, without the futures package installed; every request
+    # then fails with NotImplementedError, so nothing is waited for
+    wait = FIRST_COMPLETED = None
+from xbee.pending import FrameIdExhaustedException
+
+class Pipeline(object):
+    """
+    Sends commands through XBeeBase.request(), keeping up to window
+    commands awaiting a response at once, and at most per_destination
+    of those for any one destination. By default, each destination
+    handles one command at a time, so commands for a single device
+    (such as a setting followed by 'WR') are carried out in order.
+
+    Responses are collected by the XBee's background thread if it has
+    one, or by the xbee.helpers.multiplex.Multiplexer watching it if 
+    there is one, or by calling its poll() method otherwise. (Nothing
+    else may read from the XBee while a pipeline polls it.)
+
+    After each run, the stats attribute describes the throughput and
+    latency achieved.
+    """
+
+    def __init__(self, xbee, window=16, per_destination=1, timeout=5):
+        if window < 1 or per_destination < 1:
+            raise ValueError("window and per_destination must be at least 1")
+
+        self.xbee = xbee
+        self.window = window
+        self.per_destination = per_destination
+        self.timeout = timeout
+        self.stats = {}
+
+    @staticmethod
+    def destination(fields):
+        """
+        destination: field dictionary -> hashable
+
+        Identifies the device to which a command with the given fields
+        will be sent; (None, None) for the local device.
+        """
+        return (fields.get('dest_addr_long'), fields.get('dest_addr'))
+
+    def run(self, commands):
+        """
+        run: [(string, field dictionary) ...] -> [result ...]
+
+        run sends each (command name, fields) pair given and waits for
+        every response. The results are returned in the order of the
+        commands: the response's info dictionary, or the exception 
+        raised by the request (such as a TimeoutError).
+        """
+        commands = list(commands)
+        results = [None] * len(commands)
+        sent_at = [None] * len(commands)
+        done_at = [None] * len(commands)
+
+        waiting = deque(range(len(commands)))
+        in_flight = {}
+        per_destination = {}
+        start = time.time()
+
+        while waiting or in_flight:
+            # Send every waiting command which the windows allow
+            skipped = deque()
+
+            while waiting and len(in_flight) < self.window:
+                index = waiting.popleft()
+                cmd, fields = commands[index]
+                destination = self.destination(fields)
+
+                if per_destination.get(destination, 0) >= self.per_destination:
+                    skipped.append(index)
+                    continue
+
+                try:
+                    future = self.xbee.request(cmd, timeout=self.timeout, **fields)
+                except FrameIdExhaustedException:
+                    # Wait for another request to finish
+                    skipped.append(index)
+                    break
+                except Exception as exc:
+                    results[index] = exc
+                    continue
+
+                sent_at[index] = time.time()
+                future.add_done_callback(
+                    lambda future, index=index: done_at.__setitem__(index, time.time()))
+                in_flight[future] = (index, destination)
+                per_destination[destination] = per_destination.get(destination, 0) + 1
+
+            skipped.extend(waiting)
+            waiting = skipped
+
+            if not in_flight:
+                # Every frame ID is held by some other request
+                if waiting:
+                    self._collect()
+                continue
+
+            for future in self._collect(in_flight):
+                index, destination = in_flight.pop(future)
+                per_destination[destination] -= 1
+
+                try:
+                    results[index] = future.result()
+                except Exception as exc:
+                    results[index] = exc
+
+        self._update_stats(time.time() - start, sent_at, done_at, results)
+        return results
+
+    def _collect(self, futures=()):
+        """
+        Waits for responses to arrive, and returns those of the given
+        futures which are then done. When another thread reads from the
+        XBee, the wait ends when the first request times out, and any
+        request whose timeout has passed is failed here, in case that
+        thread has not done so.
+        """
+        if not (self.xbee.is_alive() or self.xbee._multiplexer is not None):
+            self.xbee.poll()
+        elif futures:
+            timeout = None
+            deadline = self.xbee._next_deadline()
+            if deadline is not None:
+                timeout = max(deadline - time.time(), 0)
+
+            done = wait(futures, timeout, return_when=FIRST_COMPLETED)[0]
+            if done:
+                return done
+            self.xbee._requests.expire()
+        else:
+            time.sleep(.01)
+
+        return [future for future in futures if future.done()]
+
+    def _update_stats(self, elapsed, sent_at, done_at, results):
+        """
+        Summarises the last run in the stats attribute
+        """
+        latencies = sorted(done - sent for sent, done in zip(sent_at, done_at)
+                           if sent is not None and done is not None)
+
+        self.stats = {
+            'commands': len(results),
+            'failures': len([r for r in results if isinstance(r, Exception)]),
+            'elapsed': elapsed,
+            'throughput': len(results) / elapsed if elapsed else 0.0,
+            'latency_mean': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_p50': latencies[len(latencies) // 2] if latencies else 0.0,
+            'latency_max': latencies[-1] if latencies else 0.0,
+        }
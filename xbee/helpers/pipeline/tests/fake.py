@@ -0,0 +1,53 @@
+"""
+fake.py
+
+Provides fake objects for testing the pipeline package.
+"""
+from xbee.frame import APIFrame, APIFrameDecoder
+
+class FakeRespondingDevice(object):
+    """
+    Represents a serial port connected to an XBee device which answers
+    each AT and remote AT command it is sent. The responses to all of
+    the commands sent since the last read are returned in reverse
+    order. Commands whose name is in silent_commands are not answered.
+    """
+    def __init__(self, silent_commands=()):
+        self.silent_commands = silent_commands
+        self.decoder = APIFrameDecoder()
+        self.responses = []
+        self.data = b''
+        self.commands = []
+        self.writes_since_read = 0
+        self.max_writes_between_reads = 0
+
+    def write(self, data):
+        for frame in self.decoder.feed(data):
+            self.respond(frame.data)
+
+        self.writes_since_read += 1
+        self.max_writes_between_reads = max(self.max_writes_between_reads,
+                                            self.writes_since_read)
+
+    def respond(self, data):
+        if data[0:1] == b'\x08':
+            frame_id, command = data[1:2], data[2:4]
+            response = b'\x88' + frame_id + command + b'\x00'
+        else:
+            frame_id, command = data[1:2], data[13:15]
+            response = b'\x97' + frame_id + data[2:12] + command + b'\x00'
+
+        self.commands.append(command)
+        if command not in self.silent_commands:
+            self.responses.append(APIFrame(response).output())
+
+    def inWaiting(self):
+        if self.responses:
+            self.data += b''.join(reversed(self.responses))
+            self.responses = []
+        return len(self.data)
+
+    def read(self, length=1):
+        self.writes_since_read = 0
+        data, self.data = self.data[:length], self.data[length:]
+        return data
@@ -0,0 +1,116 @@
+"""
+test_pipeline.py
+
+Tests the Pipeline module.
+"""
+import struct, unittest
+try:
+    from concurrent.futures import TimeoutError
+except ImportError:
+    # Python 2, without the futures package installed
+    TimeoutError = None
+from xbee.pending import Future
+from xbee.zigbee import ZigBee
+from xbee.helpers.multiplex import Multiplexer
+from xbee.helpers.multiplex.multiplex import selectors
+from xbee.helpers.pipeline import Pipeline
+from xbee.helpers.pipeline.tests.fake import FakeRespondingDevice
+
+def remote_at(node, command):
+    return ('remote_at', {'dest_addr_long': struct.pack('>Q', node),
+                          'command': command})
+
+@unittest.skipIf(Future is None, "requests require concurrent.futures")
+class TestPipeline(unittest.TestCase):
+    """
+    Tests xbee.helpers.pipeline for expected behavior
+    """
+
+    def setUp(self):
+        self.device = FakeRespondingDevice(silent_commands=(b'XX',))
+        self.xbee = ZigBee(self.device)
+
+    def test_results_in_order(self):
+        """
+        results should be returned in the order of the commands, even
+        when responses arrive out of order
+        """
+        commands = [remote_at(node, b'D%d' % (node % 10)) for node in range(20)]
+        results = Pipeline(self.xbee, window=8).run(commands)
+
+        self.assertEqual([result['command'] for result in results],
+                         [fields['command'] for cmd, fields in commands])
+        self.assertEqual([result['source_addr_long'] for result in results],
+                         [fields['dest_addr_long'] for cmd, fields in commands])
+
+    def test_window(self):
+        """
+        no more than window commands should await a response at once
+        """
+        commands = [remote_at(node, b'MY') for node in range(20)]
+        pipeline = Pipeline(self.xbee, window=4)
+        pipeline.run(commands)
+
+        self.assertEqual(self.device.max_writes_between_reads, 4)
+        self.assertEqual(pipeline.stats['commands'], 20)
+        self.assertEqual(pipeline.stats['failures'], 0)
+
+    def test_per_destination(self):
+        """
+        commands for one destination should be sent one at a time, in
+        order
+        """
+        commands = [remote_at(1, command) for command in (b'D1', b'D2', b'WR')]
+        commands.append(('at', {'command': b'MY'}))
+        Pipeline(self.xbee, window=8).run(commands)
+
+        self.assertEqual(self.device.commands, [b'D1', b'MY', b'D2', b'WR'])
+
+    def test_timeout(self):
+        """
+        a command which is never answered should result in a
+        TimeoutError without holding up the others
+        """
+        commands = [remote_at(1, b'XX'), remote_at(2, b'MY')]
+        results = Pipeline(self.xbee, timeout=.05).run(commands)
+
+        self.assertTrue(isinstance(results[0], TimeoutError))
+        self.assertEqual(results[1]['command'], b'MY')
+
+    def test_timeout_without_expiry(self):
+        """
+        a command should time out even if the thread reading from the 
+        XBee never expires its request
+        """
+        self.xbee.is_alive = lambda: True
+        results = Pipeline(self.xbee, timeout=.05).run([remote_at(1, b'XX')])
+
+        self.assertTrue(isinstance(results[0], TimeoutError))
+        self.assertEqual(len(self.xbee._requests), 0)
+
+    def test_invalid_command(self):
+        """
+        a command which cannot be sent should result in its exception
+        """
+        results = Pipeline(self.xbee).run([('at', {})])
+
+        self.assertTrue(isinstance(results[0], KeyError))
+
+    @unittest.skipIf(selectors is None, "the multiplexer requires Python 3.4")
+    def test_multiplexed(self):
+        """
+        a device watched by a Multiplexer should be left for it to read
+        """
+        def poll():
+            self.fail("The pipeline read from a multiplexed device")
+
+        mux = Multiplexer()
+        try:
+            mux.add(self.xbee, lambda frame: None)
+            self.xbee.poll = poll
+            self.assertEqual(Pipeline(self.xbee)._collect(), [])
+
+            mux.remove(self.xbee)
+            self.assertEqual(self.xbee._multiplexer, None)
+        finally:
+            mux.close()
@@ -104,7 +104,7 @@ class XBee(XBeeBase):
                              {'name':'options',         'len':1},
                              {'name':'samples',         'len':None}],
                          'parsing': [('samples', 
-									  lambda xbee,original: xbee._parse_samples(original['samples'])
+									  lambda xbee,original: xbee._parse_samples(original['samples'], original)
 									 )]},
                      b"\x83":
                         {'name':'rx_io_data',
@@ -114,7 +114,7 @@ class XBee(XBeeBase):
                              {'name':'options',     'len':1},
                              {'name':'samples',     'len':None}],
                          'parsing': [('samples',
-									  lambda xbee,original: xbee._parse_samples(original['samples'])
+									  lambda xbee,original: xbee._parse_samples(original['samples'], original)
 									 )]},
                      b"\x89":
                         {'name':'tx_status',
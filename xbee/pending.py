@@ -0,0 +1,198 @@
+"""
+pending.py
+
+Keeps track of commands which have been sent to an XBee device and are
+awaiting a response. Each is given its own frame ID, so that responses
+may be matched to their commands as they arrive, in any order.
+"""
+import threading, time
+from collections import deque
+
+try:
+    from concurrent.futures import Future, TimeoutError
+except ImportError:
+    # Python 2, without the futures package installed
+    Future = None
+
+class FrameIdExhaustedException(Exception):
+    pass
+
+class PendingRequests(object):
+    """
+    Allocates frame IDs from the pool 2-255 (see FIRST_FRAME_ID) and
+    holds a Future for each request until its response arrives or its
+    timeout expires; its frame ID is then returned to the pool.
+
+    Frame IDs are reused in the order in which they were released, so
+    that a late response is unlikely to be mistaken for the response
+    to a newer request.
+    """
+
+    # 0 requests no response, and 1 is the default frame ID of several
+    # commands, which may be sent without a request at any time
+    FIRST_FRAME_ID = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._free = deque(range(self.FIRST_FRAME_ID, 256))
+        # frame ID -> (future, accepted response names, deadline)
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, frame_id):
+        return frame_id in self._pending
+
+    def allocate(self, response_names, timeout=None):
+        """
+        allocate: (string ...), float -> (int, Future)
+
+        Allocates a frame ID for a request which will be answered by
+        a response frame with one of the given names. If timeout is
+        given, the Future fails with a TimeoutError once it has passed.
+
+        Raises FrameIdExhaustedException if all 254 frame IDs are
+        already in use.
+        """
+        return self.allocate_many(response_names, 1, timeout)[0]
+
+    def allocate_many(self, response_names, count, timeout=None,
+                      partial=False):
+        """
+        allocate_many: (string ...), int, float, boolean 
+                       -> [(int, Future) ...]
+
+        Allocates the given number of frame IDs at once, as allocate()
+        does for one.
+
+        Raises FrameIdExhaustedException, without allocating any, if 
+        fewer than that many frame IDs are free, unless partial is
+        true; as many as are free (perhaps none) are then allocated.
+
+        Raises NotImplementedError if concurrent.futures is unavailable
+        (on Python 2, it is provided by the futures package).
+        """
+        if Future is None:
+            raise NotImplementedError(
+                "Requests require concurrent.futures; install the futures package")
+
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        self.expire()
+
+        with self._lock:
+            if partial:
+                count = min(count, len(self._free))
+            elif len(self._free) < count:
+                if not self._free:
+                    raise FrameIdExhaustedException(
+                        "All frame IDs are in use by requests awaiting a response")
+                raise FrameIdExhaustedException(
+                    "Only %d frame IDs are free, but %d were needed" 
+                    % (len(self._free), count))
+
+            allocated = []
+            for i in range(count):
+                frame_id = self._free.popleft()
+                future = Future()
+                self._pending[frame_id] = (future, response_names, deadline)
+                allocated.append((frame_id, future))
+
+        return allocated
+
+    def release(self, frame_id):
+        """
+        release: int -> Future or None
+
+        Returns the given frame ID to the pool, along with the Future
+        of the request which was using it.
+        """
+        with self._lock:
+            request = self._pending.pop(frame_id, None)
+            if request is None:
+                return None
+            self._free.append(frame_id)
+
+        return request[0]
+
+    def accepts(self, frame_id, response_name):
+        """
+        accepts: int, string -> boolean
+
+        Determines whether the named response frame with the given frame
+        ID answers a pending request.
+        """
+        request = self._pending.get(frame_id)
+        return request is not None and response_name in request[1]
+
+    def complete(self, frame_id, response):
+        """
+        complete: int, frame info dictionary -> boolean
+
+        Completes the request with the given frame ID using the given
+        parsed response frame, if it answers that request.
+        """
+        if not self.accepts(frame_id, response['id']):
+            return False
+
+        future = self.release(frame_id)
+        if future is None:
+            return False
+
+        if future.set_running_or_notify_cancel():
+            future.set_result(response)
+        return True
+
+    def next_deadline(self):
+        """
+        next_deadline: None -> float or None
+
+        Returns the time at which the first pending request with a
+        timeout will expire, or None if there is no such request.
+        """
+        with self._lock:
+            deadlines = [deadline for (future, names, deadline)
+                         in self._pending.values() if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def expire(self):
+        """
+        expire: None -> None
+
+        Fails every request whose timeout has passed and returns its
+        frame ID to the pool.
+        """
+        now = time.time()
+        expired = []
+
+        with self._lock:
+            for frame_id, (future, names, deadline) in list(self._pending.items()):
+                if deadline is not None and deadline <= now:
+                    del self._pending[frame_id]
+                    self._free.append(frame_id)
+                    expired.append((frame_id, future))
+
+        for frame_id, future in expired:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(TimeoutError(
+                    "No response was received for frame ID %d" % frame_id))
+
+    def cancel_all(self):
+        """
+        cancel_all: None -> None
+
+        Cancels every pending request, so that none is left waiting for
+        a response which will never be read, and returns every frame ID
+        to the pool.
+        """
+        with self._lock:
+            futures = [future for (future, names, deadline) 
+                       in self._pending.values()]
+            self._free.extend(self._pending)
+            self._pending.clear()
+
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,222 @@
+"""
+records.py
+
+Provides alternatives to a dictionary per received frame, which are
+otherwise used just as the dictionaries are (frame['rf_data']):
+
+FrameRecord: a compact, read-only record. A record class with a slot
+for each field is made for each api_responses specification; fields
+may also be read as attributes (frame.rf_data).
+
+LazyFrame: a read-only view of the frame's binary data, which splits
+out each field, and applies any parsing rules, only when it is used.
+"""
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+class _MappingBase(object):
+    """
+    Provides the methods of Mapping, which is registered as its ABC,
+    without inheriting from it; before Python 3, Mapping has no 
+    __slots__, so that every subclass instance would have a __dict__.
+    """
+    __slots__ = ()
+    __hash__ = None
+
+for _name in ('__contains__', 'keys', 'items', 'values', 'get', 
+              '__eq__', '__ne__', 'iterkeys', 'itervalues', 'iteritems'):
+    if _name in Mapping.__dict__:
+        setattr(_MappingBase, _name, Mapping.__dict__[_name])
+del _name
+
+Mapping.register(_MappingBase)
+
+class FrameRecord(_MappingBase):
+    """
+    Abstract base class of the record classes made by record_class().
+
+    Fields which were absent from the frame are left unset, and are
+    not among the record's keys.
+    """
+    __slots__ = ()
+
+    # Set on each record class
+    id = None
+    _fields = ()
+    _field_set = frozenset()
+
+    def __init__(self, info):
+        for name, value in info.items():
+            if name != 'id':
+                setattr(self, name, value)
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield 'id'
+        for name in self._fields:
+            if hasattr(self, name):
+                yield name
+
+    def __len__(self):
+        return sum(1 for name in self)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self))
+
+    def __reduce__(self):
+        # Record classes are made at run time, and so can't be found by
+        # pickle; records are unpickled as dictionaries instead
+        return (dict, (dict(self),))
+
+def record_class(packet):
+    """
+    record_class: response specification -> FrameRecord subclass
+
+    Makes a record class for frames of the given api_responses
+    specification, with a slot for each of its fields.
+    """
+    fields = tuple(field['name'] for field in packet['structure'])
+    class_name = ''.join(word.capitalize()
+                         for word in packet['name'].split('_')) + 'Record'
+
+    # As with namedtuple, the constructor is generated for the fields,
+    # which is much faster than setting each through setattr(); the
+    # slots have checked that every name is an identifier
+    source = 'def __init__(self, info):\n'
+    for name in fields:
+        source += '    if %r in info: self.%s = info[%r]\n' % (name, name, name)
+    if not fields:
+        source += '    pass\n'
+
+    namespace = {}
+    cls = type(class_name, (FrameRecord,),
+               {'__slots__': fields,
+                'id': packet['name'],
+                '_fields': fields,
+                '_field_set': frozenset(('id',) + fields)})
+    exec(source, namespace)
+    cls.__init__ = namespace['__init__']
+    return cls
+
+class LazyFrame(_MappingBase):
+    """
+    A read-only view of a received frame, which holds its binary data
+    and works out each field the first time it is read.
+
+    A field whose position is fixed by the specification is sliced out
+    by itself; any other is found by splitting the whole frame, once.
+    The parsing rules of the specification are only applied when a
+    field they replace is first read. A frame which is too short or
+    too long for its specification is rejected with a ValueError when
+    the view is made; any other error in the frame is raised when a 
+    field which depends on it is read.
+    """
+    __slots__ = ('_xbee', '_packet', '_decode', '_data', '_raw', '_parsed',
+                 '_sliced')
+
+    def __init__(self, xbee, packet, decode, data):
+        """
+        xbee: the XBeeBase whose parsing rules should be applied
+        packet: the api_responses specification of the frame
+        decode: the compiled form of that specification
+        data: the binary data of the frame
+        """
+        self._xbee = xbee
+        self._packet = packet
+        self._decode = decode
+        self._data = data
+        self._raw = None
+        self._parsed = None
+        # Fields sliced out by themselves, once read
+        self._sliced = None
+
+        # The positions of the fixed fields are only right for a frame
+        # of a length its specification allows
+        if len(data) < decode.min_length:
+            raise ValueError("Response packet was shorter than expected")
+        if decode.max_length is not None and len(data) > decode.max_length:
+            raise ValueError(
+                "Response packet was longer than expected; expected: %d, got: %d bytes"
+                % (decode.max_length, len(data)))
+
+    @property
+    def data(self):
+        """
+        The binary data of the frame, for forwarding it as it is
+        """
+        return self._data
+
+    def _split(self):
+        # Every field of the frame, without parsing rules applied
+        if self._raw is None:
+            self._raw = self._decode(self._data)
+        return self._raw
+
+    def _parse(self):
+        # The fields replaced by parsing rules, as _split_response()
+        # applies them
+        if self._parsed is None:
+            info = dict(self._split())
+            parsed = {}
+
+            for name, rule in self._packet.get('parsing', ()):
+                if name in info:
+                    info[name] = parsed[name] = rule(self._xbee, info)
+
+            self._parsed = parsed
+        return self._parsed
+
+    def _rules_apply_to(self, key):
+        for name, rule in self._packet.get('parsing', ()):
+            if name == key:
+                return True
+        return False
+
+    def __getitem__(self, key):
+        if key == 'id':
+            return self._packet['name']
+
+        if self._rules_apply_to(key):
+            parsed = self._parse()
+            if key in parsed:
+                return parsed[key]
+
+        if self._raw is None:
+            sliced = self._sliced
+            if sliced is not None and key in sliced:
+                return sliced[key]
+
+            try:
+                start, end = self._decode.offsets[key]
+            except KeyError:
+                pass
+            else:
+                # A final field is left out if it is empty
+                if end is not None or start < len(self._data):
+                    if sliced is None:
+                        sliced = self._sliced = {}
+                    value = sliced[key] = self._data[start:end]
+                    return value
+
+        return self._split()[key]
+
+    def __iter__(self):
+        return iter(self._split())
+
+    def __len__(self):
+        return len(self._split())
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self))
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
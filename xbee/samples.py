@@ -0,0 +1,301 @@
+"""
+samples.py
+
+Describes the header of the IO sample data sent by each series of XBee
+module. Each combination of digital and analog channel masks is laid
+out once, when it is first seen, and then looked up by its masks.
+
+Also provides SampleColumns, which collects samples into arrays.
+"""
+import struct, threading, time
+from array import array
+from itertools import repeat
+from xbee.python2to3 import byteToInt
+
+try:
+    from sys import intern
+except ImportError:
+    # A builtin before Python 3
+    pass
+
+# An unsigned typecode wide enough for a 64-bit address; 'Q' is missing 
+# before Python 3.3, where 'L' is 64 bits wide on 64-bit POSIX systems
+try:
+    SOURCE_TYPECODE = array('Q').typecode
+except ValueError:
+    SOURCE_TYPECODE = 'L'
+
+class SampleLayout(object):
+    """
+    Describes the samples which follow an IO data header with a given
+    pair of channel masks.
+
+    Attributes:
+        dio_mask:  mask of the enabled digital channels
+        aio_mask:  mask of the enabled analog channels
+        dio_chans: tuple of the enabled digital channels, in order
+        aio_chans: tuple of the enabled analog channels, in order
+        dio_keys:  tuple of the sample keys of dio_chans ('dio-0', ...)
+        aio_keys:  tuple of the sample keys of aio_chans ('adc-0', ...)
+        sample_size: length in bytes of each sample
+    """
+    __slots__ = ('dio_mask', 'aio_mask', 'dio_chans', 'aio_chans',
+                 'dio_keys', 'aio_keys', 'sample_size', '_dio_items', '_unpackers')
+
+    def __init__(self, dio_mask, aio_mask, dio_channels, aio_channels):
+        self.dio_mask = dio_mask
+        self.aio_mask = aio_mask
+        self.dio_chans = tuple(i for i in range(dio_channels) if dio_mask & (1 << i))
+        self.aio_chans = tuple(i for i in range(aio_channels) if aio_mask & (1 << i))
+        self.dio_keys = tuple(intern('dio-{0}'.format(i)) for i in self.dio_chans)
+        self.aio_keys = tuple(intern('adc-{0}'.format(i)) for i in self.aio_chans)
+
+        # One word holds every digital channel; each analog channel
+        # has a word of its own
+        self.sample_size = 2 * (len(self.aio_chans) + (1 if self.dio_chans else 0))
+
+        self._dio_items = tuple(zip(self.dio_keys, self.dio_chans))
+
+        # sample count -> function unpacking that many samples' words
+        self._unpackers = {}
+
+    def unpack(self, io_bytes, offset, sample_count):
+        """
+        unpack: binary data in XBee IO data format, int, int ->
+                        [ {"dio-0":True,
+                           "dio-1":False,
+                           "adc-0":100"}, ...]
+
+        Reads the given number of samples from the binary data, 
+        starting at the given offset (just after the header). Any data
+        following them is ignored.
+
+        Raises IndexError if there is not enough data for every sample.
+        """
+        if not self.sample_size:
+            return [{} for i in range(sample_count)]
+
+        words = self.unpack_words(io_bytes, offset, sample_count)
+        dio_items = self._dio_items
+        aio_keys = self.aio_keys
+        word_count = len(aio_keys)
+        samples = []
+
+        index = 0
+        while index < len(words):
+            sample = {}
+
+            if dio_items:
+                digital = words[index]
+                index += 1
+                for key, chan in dio_items:
+                    sample[key] = (digital >> chan) & 1 == 1
+
+            # only first 10 bits of each analog word are significant
+            for key, analog in zip(aio_keys, words[index:index + word_count]):
+                sample[key] = analog & 0x03FF
+            index += word_count
+
+            samples.append(sample)
+
+        return samples
+
+    def unpack_words(self, io_bytes, offset, sample_count):
+        """
+        unpack_words: binary data in XBee IO data format, int, int ->
+                        (int ...)
+
+        Reads the 16-bit words of the given number of samples from the
+        binary data, starting at the given offset.
+
+        Raises IndexError if there is not enough data for every sample.
+        """
+        if len(io_bytes) - offset < self.sample_size * sample_count:
+            raise IndexError("IO data is too short for %d samples of %d bytes"
+                             % (sample_count, self.sample_size))
+
+        try:
+            unpack_from = self._unpackers[sample_count]
+        except KeyError:
+            unpack_from = struct.Struct(
+                '>%dH' % (self.sample_size // 2 * sample_count)).unpack_from
+            self._unpackers[sample_count] = unpack_from
+
+        return unpack_from(io_bytes, offset)
+
+class SampleFormat(object):
+    """
+    Reads the IO data header of an XBee 802.15.4 module: a sample
+    count, then 7 bits of analog channel mask and 9 bits of digital
+    channel mask.
+
+    Subclasses describe the headers of other series by overriding
+    header_size, dio_channels and aio_channels, and read_masks().
+    """
+    header_size = 3
+    dio_channels = 9
+    aio_channels = 7
+
+    def __init__(self):
+        self._layouts = {}
+        # mask bytes of a header -> SampleLayout
+        self._headers = {}
+
+    def read_masks(self, io_bytes):
+        """
+        read_masks: binary data in XBee IO data format -> (int, int)
+
+        Returns the digital and analog channel masks of the header.
+        """
+        high = byteToInt(io_bytes[1])
+
+        # part of byte 1 and byte 2 are the DIO mask ( 9 bits )
+        # upper 7 bits of byte 1 is the AIO mask
+        return ((high << 8 | byteToInt(io_bytes[2])) & 0x01FF,
+                (high & 0xFE) >> 1)
+
+    def layout(self, dio_mask, aio_mask):
+        """
+        layout: int, int -> SampleLayout
+
+        Returns the layout of samples with the given channel masks.
+        """
+        try:
+            return self._layouts[(dio_mask, aio_mask)]
+        except KeyError:
+            layout = SampleLayout(dio_mask, aio_mask,
+                                  self.dio_channels, self.aio_channels)
+            return self._layouts.setdefault((dio_mask, aio_mask), layout)
+
+    def read_header(self, io_bytes):
+        """
+        read_header: binary data in XBee IO data format ->
+                        (int, SampleLayout)
+
+        Returns the number of samples which follow the header and
+        their layout.
+        """
+        masks = io_bytes[1:self.header_size]
+        try:
+            return byteToInt(io_bytes[0]), self._headers[masks]
+        except (KeyError, TypeError):
+            # Not yet seen, or given as a bytearray
+            if len(masks) < self.header_size - 1:
+                raise IndexError("IO data header is too short")
+            layout = self.layout(*self.read_masks(io_bytes))
+            self._headers[bytes(masks)] = layout
+            return byteToInt(io_bytes[0]), layout
+
+class ZigBeeSampleFormat(SampleFormat):
+    """
+    Reads the IO data header of an XBee ZB module: a sample count,
+    then 16 bits of digital channel mask and 8 bits of analog channel
+    mask.
+    """
+    header_size = 4
+    dio_channels = 13
+    aio_channels = 8
+
+    def read_masks(self, io_bytes):
+        # bytes 1 and 2 are the DIO mask; bits 9 and 8 aren't used
+        # byte 3 is the AIO mask
+        return ((byteToInt(io_bytes[1]) << 8 | byteToInt(io_bytes[2])) & 0x0E7F,
+                byteToInt(io_bytes[3]))
+
+class SampleColumns(object):
+    """
+    Collects IO samples into compact columns, rather than a dictionary
+    per sample, for consumers which treat them as time series. Pass an
+    instance to XBeeBase as sample_columns; each IO sample received is
+    then appended to it as a row, and the 'samples' field of its frame
+    holds only the number of rows appended.
+
+    Columns (all arrays of equal length):
+        time:     'd', time.time() when the frame was parsed
+        source:   SOURCE_TYPECODE ('Q'), 64-bit source address of the frame or, failing
+                  that, its 16-bit source address (0 if it has neither)
+        dio_mask: 'H', mask of the digital channels which were sampled
+        dio:      'H', digital values, one bit per channel
+        adc-0 ... adc-7:
+                  'H', analog values, or MISSING where that channel
+                  was not sampled
+    """
+    MISSING = 0xFFFF
+    ADC_CHANNELS = 8
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = self._new_columns()
+
+    def _new_columns(self):
+        columns = {'time': array('d'), 
+                   'source': array(SOURCE_TYPECODE),
+                   'dio_mask': array('H'),
+                   'dio': array('H')}
+        for chan in range(self.ADC_CHANNELS):
+            columns['adc-{0}'.format(chan)] = array('H')
+        return columns
+
+    def __len__(self):
+        return len(self._columns['time'])
+
+    def extend(self, layout, io_bytes, offset, sample_count, source=0, 
+               timestamp=None):
+        """
+        extend: SampleLayout, binary data in XBee IO data format, int,
+                int, int, float -> int
+
+        Appends the given number of samples, read from the binary data
+        starting at the given offset, as rows. Returns the number of
+        rows appended.
+        """
+        words = layout.unpack_words(io_bytes, offset, sample_count)
+        step = layout.sample_size // 2
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock:
+            columns = self._columns
+            columns['time'].extend(repeat(timestamp, sample_count))
+            columns['source'].extend(repeat(source, sample_count))
+            columns['dio_mask'].extend(repeat(layout.dio_mask, sample_count))
+
+            if layout.dio_chans:
+                dio_mask = layout.dio_mask
+                columns['dio'].extend(word & dio_mask for word in words[0::step])
+                index = 1
+            else:
+                columns['dio'].extend(repeat(0, sample_count))
+                index = 0
+
+            for chan in range(self.ADC_CHANNELS):
+                column = columns['adc-{0}'.format(chan)]
+
+                if chan in layout.aio_chans:
+                    # only first 10 bits are significant
+                    column.extend(word & 0x03FF for word in words[index::step])
+                    index += 1
+                else:
+                    column.extend(repeat(self.MISSING, sample_count))
+
+        return sample_count
+
+    def take(self, max_rows=None):
+        """
+        take: int -> {column name: array, ...}
+
+        Removes up to max_rows rows (or all of them) from the front of
+        the columns and returns them, as a dictionary of arrays keyed
+        by column name.
+        """
+        with self._lock:
+            if max_rows is None or max_rows >= len(self):
+                batch = self._columns
+                self._columns = self._new_columns()
+                return batch
+
+            batch = {}
+            for name, column in self._columns.items():
+                batch[name] = column[:max_rows]
+                del column[:max_rows]
+            return batch
@@ -7,7 +7,7 @@ pmalmsten@gmail.com
 
 Provides fake device objects for other unit tests.
 """
-import sys
+import os, select, struct, sys
 
 class FakeDevice(object):
     """
@@ -54,3 +54,73 @@ class FakeReadDevice(object):
         Returns the number of bytes available to be read
         """
         return len(self.data) - self.read_index
+
+class FakePipeDevice(object):
+    """
+    Represents a fake serial port backed by an OS pipe, so that it
+    may be waited upon with select() like the real thing. Data written
+    with feed() can then be read from the port.
+    """
+    
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._read_fd, self._write_fd = os.pipe()
+        # Written to by cancel_read(), as by PySerial
+        self._cancel_read_fd, self._cancel_write_fd = os.pipe()
+        
+    def feed(self, data):
+        """
+        Makes the given data available to be read from the port
+        """
+        os.write(self._write_fd, data)
+        
+    def fileno(self):
+        return self._read_fd
+        
+    def inWaiting(self):
+        """
+        Returns the number of bytes available to be read
+        """
+        # POSIX only, as are pipes which may be passed to select()
+        import fcntl, termios
+        buf = fcntl.ioctl(self._read_fd, termios.FIONREAD, b'\x00' * 4)
+        return struct.unpack('I', buf)[0]
+        
+    def read(self, length=1):
+        """
+        Reads up to the indicated number of bytes, waiting for at most
+        timeout seconds for the first one to arrive
+        """
+        if not self._wait():
+            return b''
+        return os.read(self._read_fd, length)
+        
+    def readinto(self, buf):
+        """
+        Reads into the given buffer, as read() would
+        """
+        if not self._wait():
+            return 0
+        data = os.read(self._read_fd, len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+    def _wait(self):
+        ready = select.select([self._read_fd, self._cancel_read_fd], [], [], 
+                              self.timeout)[0]
+        if self._cancel_read_fd in ready:
+            os.read(self._cancel_read_fd, 1024)
+            return False
+        return bool(ready)
+
+    def cancel_read(self):
+        """
+        Ends a read in progress (or the next one) at once
+        """
+        os.write(self._cancel_write_fd, b'\x00')
+        
+    def close(self):
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+        os.close(self._cancel_read_fd)
+        os.close(self._cancel_write_fd)
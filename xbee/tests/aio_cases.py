@@ -0,0 +1,122 @@
+"""
+aio_cases.py
+
+Tests the asyncio protocols for XBee devices over a socket pair. These
+use async syntax, and so are imported by test_aio only where it is 
+available.
+"""
+import asyncio, socket, unittest
+from xbee.aio import AsyncXBee, AsyncZigBee
+
+class AsyncTestCase(unittest.TestCase):
+    """
+    Connects a protocol to one end of a socket pair; the test plays
+    the part of the XBee device at the other end
+    """
+    protocol_class = AsyncXBee
+
+    def run_test(self, test):
+        loop = asyncio.new_event_loop()
+
+        async def connect_and_run():
+            device_sock, host_sock = socket.socketpair()
+            device_sock.setblocking(False)
+
+            transport, xbee = await loop.create_connection(
+                self.protocol_class, sock=host_sock)
+            try:
+                await test(loop, device_sock, xbee)
+            finally:
+                transport.close()
+                device_sock.close()
+
+        async def run_with_timeout():
+            await asyncio.wait_for(connect_and_run(), 5)
+
+        # run_until_complete() rather than asyncio.run(), which needs 
+        # Python 3.7
+        try:
+            loop.run_until_complete(run_with_timeout())
+        finally:
+            loop.close()
+
+class TestAsyncRead(AsyncTestCase):
+    """
+    Frames arriving from the device should be parsed and made
+    available to readers
+    """
+
+    def test_read_frame(self):
+        """
+        read_frame should return a parsed frame
+        """
+        async def test(loop, device, xbee):
+            await loop.sock_sendall(device, b'\x7E\x00\x05\x88DMY\x01\x8c')
+
+            info = await xbee.read_frame()
+            self.assertEqual(info, {'id':'at_response',
+                                    'frame_id':b'D',
+                                    'command':b'MY',
+                                    'status':b'\x01'})
+
+        self.run_test(test)
+
+    def test_frames_until_closed(self):
+        """
+        frames() should yield every frame, then stop when the
+        connection is closed
+        """
+        async def test(loop, device, xbee):
+            await loop.sock_sendall(
+                device,
+                b'\x7E\x00\x02\x8a\x01\x74' + b'\x7E\x00\x02\x8a\x02\x73')
+            device.close()
+
+            statuses = [frame['status'] async for frame in xbee.frames()]
+            self.assertEqual(statuses, [b'\x01', b'\x02'])
+
+        self.run_test(test)
+
+    def test_unrecognized_frame(self):
+        """
+        a frame which cannot be parsed should raise an exception when
+        it is read
+        """
+        async def test(loop, device, xbee):
+            await loop.sock_sendall(device, b'\x7E\x00\x01\x00\xFF')
+
+            with self.assertRaises(KeyError):
+                await xbee.read_frame()
+
+        self.run_test(test)
+
+class TestAsyncSend(AsyncTestCase):
+    """
+    Commands should be written to the device as API frames
+    """
+    protocol_class = AsyncZigBee
+
+    def test_send(self):
+        """
+        send should write a full API frame
+        """
+        async def test(loop, device, xbee):
+            await xbee.send('at', frame_id=b'A', command=b'MY')
+
+            data = await loop.sock_recv(device, 100)
+            self.assertEqual(data, b'\x7E\x00\x04\x08AMY\x10')
+
+        self.run_test(test)
+
+    def test_send_shorthand(self):
+        """
+        a coroutine method should exist for each command
+        """
+        async def test(loop, device, xbee):
+            await xbee.at(frame_id=b'A', command=b'MY')
+
+            data = await loop.sock_recv(device, 100)
+            self.assertEqual(data, b'\x7E\x00\x04\x08AMY\x10')
+
+        self.assertTrue(hasattr(AsyncZigBee, 'tx_explicit'))
+        self.run_test(test)
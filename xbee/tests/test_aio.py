@@ -0,0 +1,19 @@
+#! /usr/bin/python
+"""
+test_aio.py
+
+Tests the asyncio protocols for XBee devices (see aio_cases), where
+Python is new enough to provide them.
+"""
+import sys, unittest
+
+if sys.version_info >= (3, 6):
+    from xbee.tests.aio_cases import TestAsyncRead, TestAsyncSend
+else:
+    @unittest.skip("xbee.aio requires Python 3.6 or later")
+    class TestAsync(unittest.TestCase):
+        def test_async(self):
+            pass
+
+if __name__ == '__main__':
+    unittest.main()
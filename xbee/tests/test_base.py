@@ -7,9 +7,41 @@ pmalmsten@gmail.com
 
 Tests the XBeeBase superclass module for XBee API conformance.
 """
-import unittest
+import sys, threading, time, unittest
+from contextlib import contextmanager
 from xbee.base import XBeeBase
-from xbee.tests.Fake import FakeDevice, FakeReadDevice
+from xbee.frame import APIFrame
+from xbee.zigbee import ZigBee
+from xbee.tests.Fake import FakeDevice, FakeReadDevice, FakePipeDevice
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+@contextmanager
+def thread_errors():
+    """
+    Collects the exceptions which end any thread, as strings, instead
+    of letting them be reported
+    """
+    errors = []
+
+    if hasattr(threading, 'excepthook'):
+        excepthook = threading.excepthook
+        threading.excepthook = lambda args: errors.append(str(args.exc_value))
+        try:
+            yield errors
+        finally:
+            threading.excepthook = excepthook
+    else:
+        # Before Python 3.8, the thread prints its traceback
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            yield errors
+        finally:
+            errors.append(sys.stderr.getvalue())
+            sys.stderr = stderr
 
 class TestWriteToDevice(unittest.TestCase):
     """
@@ -96,6 +128,77 @@ class TestReadFromDevice(unittest.TestCase):
         
         frame = xbee._wait_for_frame()
         self.assertEqual(frame.data, b'\x7E\x7D\x11\x13')
+
+    def test_read_many_frames(self):
+        """
+        _wait_for_frame should return each frame available from
+        a single read of the serial port in turn
+        """
+        device = FakeReadDevice(
+            b'\x7E\x00\x01\x00\xFF' + b'\x7E\x00\x01\x05\xFA')
+        xbee = XBeeBase(device)
+
+        self.assertEqual(xbee._wait_for_frame().data, b'\x00')
+        self.assertEqual(device.inWaiting(), 0)
+        self.assertEqual(xbee._wait_for_frame().data, b'\x05')
+
+    def test_max_length(self):
+        """
+        a frame longer than max_length should be rejected
+        """
+        device = FakeReadDevice(
+            b'\x7E\x00\x02\x00\x00\xFF' + b'\x7E\x00\x01\x05\xFA')
+        xbee = XBeeBase(device, max_length=1)
+
+        self.assertEqual(xbee._wait_for_frame().data, b'\x05')
+        self.assertEqual(xbee.decoder.length_errors, 1)
+        
+class TestReaders(unittest.TestCase):
+    """
+    Each reader mode should read every byte available from the serial
+    port at once
+    """
+
+    def setUp(self):
+        self.device = FakePipeDevice(timeout=.1)
+
+    def tearDown(self):
+        self.device.close()
+
+    def read_frames(self, reader):
+        self.device.feed(b'\x7E\x00\x01\x00\xFF' + b'\x7E\x00\x01\x05\xFA')
+        xbee = XBeeBase(self.device, reader=reader)
+
+        self.assertEqual(xbee._wait_for_frame().data, b'\x00')
+        self.assertEqual(self.device.inWaiting(), 0)
+        self.assertEqual(xbee._wait_for_frame().data, b'\x05')
+
+    def test_select(self):
+        """
+        the select reader should read all available frames
+        """
+        self.read_frames('select')
+
+    def test_blocking(self):
+        """
+        the blocking reader should read all available frames
+        """
+        self.read_frames('blocking')
+
+    def test_nothing_available(self):
+        """
+        a read with no data available should return nothing after
+        waiting
+        """
+        for reader in XBeeBase.READERS:
+            xbee = XBeeBase(self.device, reader=reader, read_timeout=.01)
+            self.assertFalse(xbee._read())
+
+    def test_invalid_reader(self):
+        """
+        an unknown reader mode should be rejected
+        """
+        self.assertRaises(ValueError, XBeeBase, self.device, reader='spin')
         
 class TestNotImplementedFeatures(unittest.TestCase):
     """
@@ -163,6 +266,173 @@ class TestAsyncCallback(unittest.TestCase):
         """
         self.xbee = XBeeBase(self.serial, callback=self.callback)
         
+class TestBatchCallback(unittest.TestCase):
+    """
+    With a batch_callback, the background thread should pass frames
+    to it in lists
+    """
+
+    def setUp(self):
+        self.batches = []
+        self.xbee = None
+        data = b''.join(APIFrame(b'\x8a' + bytearray([i])).output() 
+                        for i in range(5))
+        self.serial = FakeReadDevice(data, silent_on_empty=True)
+
+    def tearDown(self):
+        if self.xbee is not None:
+            self.xbee.halt()
+
+    def wait_for_frames(self, count):
+        while sum(len(batch) for batch in self.batches) < count:
+            time.sleep(.01)
+
+    def test_frames_read_together(self):
+        """
+        frames read at once should be passed in a single batch
+        """
+        self.xbee = ZigBee(self.serial, batch_callback=self.batches.append)
+        self.wait_for_frames(5)
+
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual([frame['status'] for frame in self.batches[0]],
+                         [bytearray([i]) for i in range(5)])
+
+    def test_max_batch(self):
+        """
+        no batch should hold more than max_batch frames
+        """
+        self.xbee = ZigBee(self.serial, batch_callback=self.batches.append,
+                           max_batch=2)
+        self.wait_for_frames(5)
+
+        self.assertEqual([len(batch) for batch in self.batches], [2, 2, 1])
+
+    def test_max_linger(self):
+        """
+        frames arriving within max_linger of the first should be passed
+        in the same batch
+        """
+        device = FakePipeDevice()
+        self.addCleanup(device.close)
+        frame = APIFrame(b'\x8a\x00').output()
+        device.feed(frame)
+
+        self.xbee = ZigBee(device, batch_callback=self.batches.append,
+                           reader='select', read_timeout=.01, 
+                           max_batch=3, max_linger=5)
+        time.sleep(.05)
+        device.feed(frame * 2)
+        self.wait_for_frames(3)
+
+        self.assertEqual([len(batch) for batch in self.batches], [3])
+
+    def test_linger_reads_in_turn(self):
+        """
+        while lingering, the background thread should not read from the
+        port at the same time as another thread waiting for frames
+        """
+        device = FakePipeDevice()
+        self.addCleanup(device.close)
+        device.feed(APIFrame(b'\x8a\x00').output())
+
+        self.xbee = ZigBee(device, batch_callback=self.batches.append,
+                           reader='select', read_timeout=.01, max_linger=.3)
+        readers = []
+        most_readers = []
+        read_frames = self.xbee._read_frames
+
+        def counting_read_frames():
+            readers.append(threading.current_thread())
+            most_readers.append(len(readers))
+            try:
+                read_frames()
+            finally:
+                readers.remove(threading.current_thread())
+        self.xbee._read_frames = counting_read_frames
+
+        self.xbee.wait_for(lambda frame: False, timeout=.3)
+        self.wait_for_frames(1)
+        self.assertEqual(max(most_readers), 1)
+
+    def test_with_callback(self):
+        """
+        batch_callback may not be given along with callback
+        """
+        self.assertRaises(ValueError, ZigBee, self.serial, 
+                          callback=lambda frame: None,
+                          batch_callback=self.batches.append)
+
+class TestHalt(unittest.TestCase):
+    """
+    halt() should wake the background thread at once, whichever reader
+    is used
+    """
+
+    def setUp(self):
+        self.serial = FakePipeDevice()
+
+    def tearDown(self):
+        self.serial.close()
+
+    def assert_halts_promptly(self, xbee):
+        # Let the thread start waiting
+        time.sleep(.05)
+        start = time.time()
+        xbee.halt()
+        self.assertTrue(time.time() - start < 1)
+        self.assertFalse(xbee.is_alive())
+
+    def test_select(self):
+        """
+        a thread waiting in select() should be woken by halt()
+        """
+        xbee = ZigBee(self.serial, callback=lambda frame: None,
+                      reader='select', read_timeout=30)
+        self.assert_halts_promptly(xbee)
+
+    def test_blocking(self):
+        """
+        a thread waiting in read() should be woken by halt() with the
+        port's cancel_read()
+        """
+        xbee = ZigBee(self.serial, callback=lambda frame: None,
+                      reader='blocking')
+        self.assert_halts_promptly(xbee)
+
+    def test_read_error(self):
+        """
+        halt() should return even if the thread has died of an error
+        in reading from the port
+        """
+        def fail():
+            raise IOError("The port has gone away")
+        self.serial.inWaiting = fail
+
+        with thread_errors() as errors:
+            xbee = ZigBee(self.serial, callback=lambda frame: None)
+            self.assert_halts_promptly(xbee)
+
+        self.assertTrue(any("The port has gone away" in error 
+                            for error in errors))
+
+    def test_inter_byte_timeout(self):
+        """
+        a partial frame should be abandoned once no more of it has
+        arrived for inter_byte_timeout seconds
+        """
+        xbee = ZigBee(self.serial, reader='select', read_timeout=.01,
+                      inter_byte_timeout=.05)
+
+        # The rest of this frame never arrives
+        self.serial.feed(b'\x7E\x00\x20\x8a')
+        self.assertEqual(xbee.wait_read_frame(timeout=.2), None)
+        self.assertEqual(xbee.decoder.frames_abandoned, 1)
+
+        self.serial.feed(APIFrame(b'\x8a\x01').output())
+        self.assertEqual(xbee.wait_read_frame(timeout=1),
+                         {'id': 'status', 'status': b'\x01'})
+
 class TestInitialization(unittest.TestCase):
     """
     Ensures that XBeeBase objects are properly constructed
@@ -8,7 +8,7 @@ pmalmsten@gmail.com
 Tests frame module for proper behavior
 """
 import unittest
-from xbee.frame import APIFrame
+from xbee.frame import APIFrame, APIFrameDecoder, FrameTemplate
 from xbee.python2to3 import byteToInt, intToByte
 
 class TestAPIFrameGeneration(unittest.TestCase):
@@ -26,6 +26,65 @@ class TestAPIFrameGeneration(unittest.TestCase):
         
         frame = APIFrame(data).output()
         self.assertEqual(frame, expected_frame)
+
+    def test_checksum_of_buffer_types(self):
+        """
+        the checksum must be the same for bytes, bytearray and
+        memoryview data
+        """
+        data = b'\x00\x01\x02'
+
+        for frame_data in (data, bytearray(data), memoryview(data)):
+            self.assertEqual(APIFrame(frame_data).checksum(), b'\xFC')
+
+    def test_encode_into(self):
+        """
+        encode_into must write a frame at the given offset of a
+        reusable buffer, extending it as required
+        """
+        buffer = bytearray(b'\xAA' * 4)
+
+        end = APIFrame(b'\x00').encode_into(buffer, 2)
+        self.assertEqual(end, 7)
+        self.assertEqual(buffer, b'\xAA\xAA\x7E\x00\x01\x00\xFF')
+
+        end = APIFrame(b'\x00\x01\x02').encode_into(buffer, end)
+        self.assertEqual(end, 14)
+        self.assertEqual(buffer[7:], b'\x7E\x00\x03\x00\x01\x02\xFC')
+
+        # Reuse the buffer from the start
+        end = APIFrame(b'\x05').encode_into(buffer)
+        self.assertEqual(buffer[:end], b'\x7E\x00\x01\x05\xFA')
+
+    def test_encode_into_escaped(self):
+        """
+        encode_into must escape the frame in escaped mode
+        """
+        buffer = bytearray()
+
+        end = APIFrame(b'\x7E\x01\x7D\x11\x13', escaped=True).encode_into(buffer)
+        self.assertEqual(
+            buffer[:end], 
+            b'\x7E\x00\x05\x7D\x5E\x01\x7D\x5D\x7D\x31\x7D\x33\xDF')
+
+    def test_encode_into_escaped_offset(self):
+        """
+        encode_into must escape the length and checksum, and write an
+        escaped frame at the given offset of a reusable buffer
+        """
+        buffer = bytearray(b'\xAA' * 16)
+        data = b'\x00' * 13 + b'\x01\x02\x7D\x6C'
+
+        end = APIFrame(data, escaped=True).encode_into(buffer, 2)
+        self.assertEqual(
+            buffer[:end],
+            b'\xAA\xAA\x7E\x00\x7D\x31' + b'\x00' * 13 + 
+            b'\x01\x02\x7D\x5D\x6C\x7D\x33')
+        self.assertEqual(buffer[2:end], APIFrame(data, escaped=True).output())
+
+        # Reuse the buffer from the start
+        end = APIFrame(b'\x13', escaped=True).encode_into(buffer)
+        self.assertEqual(buffer[:end], b'\x7E\x00\x01\x7D\x33\xEC')
         
 class TestAPIFrameParsing(unittest.TestCase):
     """
@@ -90,3 +149,231 @@ class TestEscapedOutput(unittest.TestCase):
         test_data = APIFrame.START_BYTE
         new_data = APIFrame.escape(test_data)
         self.assertEqual(new_data, APIFrame.ESCAPE_BYTE + b'\x5e')
+
+    def test_escape_all_special_bytes(self):
+        """
+        APIFrame.escape() must escape every special byte, including
+        runs of escape bytes
+        """
+        test_data = b'\x00\x7E\x7D\x7D\x11\x01\x13'
+        new_data = APIFrame.escape(test_data)
+        self.assertEqual(
+            new_data,
+            b'\x00\x7D\x5E\x7D\x5D\x7D\x5D\x7D\x31\x01\x7D\x33')
+
+    def test_unescape_method(self):
+        """
+        APIFrame.unescape() must reverse APIFrame.escape()
+        """
+        test_data = bytes(bytearray(range(256))) * 2
+        new_data = APIFrame.unescape(APIFrame.escape(test_data))
+        self.assertEqual(new_data, test_data)
+
+class TestFrameTemplate(unittest.TestCase):
+    """
+    Copies of a FrameTemplate must be the frames APIFrame would produce
+    """
+
+    def setUp(self):
+        # id, frame_id, two-byte address, then data
+        self.data = b'\x17\x00\x12\x34' + b'\x7E\x7Ddata'
+        self.fields = {'frame_id': (1, 1), 'dest_addr': (2, 2)}
+
+    def test_unchanged(self):
+        """
+        without replacements, the template's own frame should be produced
+        """
+        for escaped in (False, True):
+            template = FrameTemplate(self.data, self.fields, escaped)
+            self.assertEqual(template.output(),
+                             APIFrame(self.data, escaped).output())
+
+    def test_replaced_fields(self):
+        """
+        replaced fields must be written, with the checksum corrected and
+        escaped where necessary
+        """
+        for escaped in (False, True):
+            template = FrameTemplate(self.data, self.fields, escaped)
+
+            # Every checksum, and escape bytes in each field, are covered
+            for i in range(256):
+                frame_id = intToByte(i)
+                addr = b'\x7D' + intToByte(255 - i)
+                expected = self.data[0:1] + frame_id + addr + self.data[4:]
+
+                self.assertEqual(
+                    template.output(frame_id=frame_id, dest_addr=addr),
+                    APIFrame(expected, escaped).output())
+
+    def test_invalid_fields(self):
+        """
+        unknown fields, and those of the wrong length, must be rejected
+        """
+        template = FrameTemplate(self.data, self.fields)
+        self.assertRaises(KeyError, template.output, data=b'other')
+        self.assertRaises(ValueError, template.output, dest_addr=b'\x00')
+
+class TestAPIFrameDecoder(unittest.TestCase):
+    """
+    APIFrameDecoder must extract valid frames from chunks of raw data
+    of any size
+    """
+
+    def test_single_frame(self):
+        """
+        a complete frame in a single chunk is decoded
+        """
+        decoder = APIFrameDecoder()
+        frames = decoder.feed(b'\x7E\x00\x01\x00\xFF')
+
+        self.assertEqual([frame.data for frame in frames], [b'\x00'])
+
+    def test_many_frames_in_chunk(self):
+        """
+        all frames contained in a single chunk are decoded, in order
+        """
+        decoder = APIFrameDecoder()
+        frames = decoder.feed(
+            b'\x7E\x00\x01\x00\xFF' + b'\x7E\x00\x03\x00\x01\x02\xFC')
+
+        self.assertEqual([frame.data for frame in frames],
+                         [b'\x00', b'\x00\x01\x02'])
+
+    def test_frame_split_across_chunks(self):
+        """
+        a frame may be delivered one byte at a time
+        """
+        decoder = APIFrameDecoder()
+        frame = b'\x7E\x00\x03\x00\x01\x02\xFC'
+
+        for index in range(len(frame) - 1):
+            self.assertEqual(decoder.feed(frame[index:index + 1]), [])
+
+        frames = decoder.feed(frame[-1:])
+        self.assertEqual([frame.data for frame in frames], [b'\x00\x01\x02'])
+
+    def test_leading_garbage_and_bad_checksum(self):
+        """
+        data before a start byte and frames with a bad checksum are
+        discarded
+        """
+        decoder = APIFrameDecoder()
+        frames = decoder.feed(
+            b'\x01\x02' + b'\x7E\x00\x01\x00\xFA' + b'\x7E\x00\x01\x05\xFA')
+
+        self.assertEqual([frame.data for frame in frames], [b'\x05'])
+
+    def test_escaped_frames(self):
+        """
+        escaped frames are unescaped, even when an escape byte ends
+        a chunk
+        """
+        decoder = APIFrameDecoder(escaped=True)
+        data = (b'\x7E\x00\x04\x7D\x5E\x7D\x5D\x7D\x31\x7D\x33\xE0' +
+                b'\x7E\x00\x01\x00\xFF')
+
+        self.assertEqual(decoder.feed(data[:4]), [])
+        frames = decoder.feed(data[4:])
+
+        self.assertEqual([frame.data for frame in frames],
+                         [b'\x7E\x7D\x11\x13', b'\x00'])
+
+    def test_escaped_truncated_frame(self):
+        """
+        in escaped mode, a start byte abandons an incomplete frame
+        """
+        decoder = APIFrameDecoder(escaped=True)
+        frames = decoder.feed(b'\x7E\x00\x05\x00' + b'\x7E\x00\x01\x00\xFF')
+
+        self.assertEqual([frame.data for frame in frames], [b'\x00'])
+
+    def test_frame_within_corrupt_frame(self):
+        """
+        a valid frame which starts inside a frame with a bad checksum
+        must be found by searching the rejected bytes again
+        """
+        decoder = APIFrameDecoder()
+        # The corrupt frame claims four bytes of data, the first of
+        # which begins a valid frame
+        frames = decoder.feed(
+            b'\x7E\x00\x04' + b'\x7E\x00\x01\x05\xFA')
+
+        self.assertEqual([frame.data for frame in frames], [b'\x05'])
+        self.assertEqual(decoder.checksum_errors, 1)
+        self.assertEqual(decoder.bytes_discarded, 3)
+
+    def test_impossible_length(self):
+        """
+        a frame claiming an impossible length must be rejected without
+        waiting for the rest of it to arrive
+        """
+        decoder = APIFrameDecoder(max_length=100)
+
+        frames = decoder.feed(b'\x7E\x00\x00' + b'\x7E\x80\x00' + 
+                              b'\x7E\x00\xFF' + b'\x7E\x00\x01\x00\xFF')
+
+        self.assertEqual([frame.data for frame in frames], [b'\x00'])
+        self.assertEqual(decoder.length_errors, 3)
+        self.assertEqual(decoder.bytes_discarded, 9)
+
+    def test_escaped_counters(self):
+        """
+        in escaped mode, bad frames and stray bytes must be counted
+        """
+        decoder = APIFrameDecoder(escaped=True)
+        frames = decoder.feed(
+            b'\x01\x02' + b'\x7E\x00\x01\x00\xFA' + b'\x7E\x00\x01\x00\xFF')
+
+        self.assertEqual([frame.data for frame in frames], [b'\x00'])
+        self.assertEqual(decoder.checksum_errors, 1)
+        self.assertEqual(decoder.bytes_discarded, 7)
+
+    def test_abandon_partial_frame(self):
+        """
+        abandon() must give up on a partial frame, but not on a valid
+        frame which starts inside it
+        """
+        decoder = APIFrameDecoder()
+        # Claims more data than will ever arrive
+        decoder.feed(b'\x7E\x00\x20' + b'\x7E\x00\x01\x05\xFA' + b'\x7E\x00')
+        self.assertEqual(decoder.pending, 10)
+
+        frames = decoder.abandon()
+
+        self.assertEqual([frame.data for frame in frames], [b'\x05'])
+        self.assertEqual(decoder.pending, 0)
+        self.assertEqual(decoder.frames_abandoned, 2)
+        self.assertEqual(decoder.bytes_discarded, 5)
+
+        frames = decoder.feed(b'\x7E\x00\x01\x00\xFF')
+        self.assertEqual([frame.data for frame in frames], [b'\x00'])
+
+    def test_escaped_abandon_partial_frame(self):
+        """
+        in escaped mode, abandon() must drop the frame in progress,
+        including a pending escape byte
+        """
+        decoder = APIFrameDecoder(escaped=True)
+        decoder.feed(b'\x7E\x00\x05\x7D')
+        self.assertEqual(decoder.pending, 3)
+
+        self.assertEqual(decoder.abandon(), [])
+        self.assertEqual(decoder.pending, 0)
+        self.assertEqual(decoder.bytes_discarded, 3)
+
+        frames = decoder.feed(b'\x00\x7E\x00\x01\x00\xFF')
+        self.assertEqual([frame.data for frame in frames], [b'\x00'])
+
+    def test_default_max_length(self):
+        """
+        by default, a corrupt length far beyond any real frame must not
+        hold up the valid frames which follow it
+        """
+        decoder = APIFrameDecoder()
+        frames = decoder.feed(b'\x7E\x70\x00' + 
+                              APIFrame(b'\x00').output() * 10)
+
+        self.assertEqual(len(frames), 10)
+        self.assertEqual(decoder.length_errors, 1)
+        self.assertEqual(decoder.pending, 0)
@@ -430,6 +430,30 @@ class TestParseIOData(InitXBee):
         
         self.assertEqual(results, expected_results)
 
+    def test_parse_samples_header_hook(self):
+        """
+        _parse_samples should read headers through an overridden
+        _parse_samples_header
+        """
+        class OneByteHeaderXBee(XBee):
+            # Just a sample count; DIO 0 and ADC 1 are always enabled
+            def _parse_samples_header(self, io_bytes):
+                return (byteToInt(io_bytes[0]), [0], [1], 0x01, 1)
+
+        xbee = OneByteHeaderXBee(None)
+        results = xbee._parse_samples(b'\x02' + b'\x00\x01\x00\x10' + 
+                                      b'\x00\x00\x03\xFF')
+
+        self.assertEqual(results, [{'dio-0':True, 'adc-1':16},
+                                   {'dio-0':False, 'adc-1':1023}])
+
+    def test_parse_samples_header(self):
+        """
+        _parse_samples_header should return lists of enabled channels
+        """
+        self.assertEqual(self.xbee._parse_samples_header(b'\x01\x02\xAA'),
+                         (1, [1, 3, 5, 7], [0], 0xAA, 3))
+
 class TestWriteToDevice(unittest.TestCase):
     """
     XBee class should properly write binary data in a valid API
@@ -477,7 +501,7 @@ class TestWriteToDevice(unittest.TestCase):
 class TestSendShorthand(unittest.TestCase):
     """
     Tests shorthand for sending commands to an XBee provided by
-    XBee.__getattr__
+    the methods generated for each command (or XBee.__getattr__)
     """
     
     def setUp(self):
@@ -525,6 +549,51 @@ class TestSendShorthand(unittest.TestCase):
         else:
             self.fail("Specified shorthand command should not exist")
 
+    def test_shorthand_unknown_field(self):
+        """
+        Shorthand methods should ignore fields which are not part of
+        their command, as send() does
+        """
+        self.xbee.at(frame_id=b'A', command=b'MY', dest_addr=b'\x00\x01')
+        self.assertEqual(self.ser.data, b'\x7E\x00\x04\x08AMY\x10')
+
+    def test_shorthand_positional_arguments(self):
+        """
+        Shorthand methods should not accept positional arguments
+        """
+        self.assertRaises(TypeError, self.xbee.at, b'\x09', b'A', b'MY')
+        self.assertEqual(self.ser.data, b'')
+
+    def test_shorthand_uses_send(self):
+        """
+        Shorthand methods should send through send(), so that a subclass
+        may override it
+        """
+        sent = []
+
+        class LoggingXBee(XBee):
+            def send(self, cmd, **kwargs):
+                sent.append((cmd, kwargs))
+                super(LoggingXBee, self).send(cmd, **kwargs)
+
+        LoggingXBee(self.ser).at(frame_id=b'A', command=b'MY')
+        self.assertEqual(sent, [('at', {'frame_id':b'A', 'command':b'MY'})])
+        self.assertEqual(self.ser.data, b'\x7E\x00\x04\x08AMY\x10')
+
+    def test_shorthand_of_removed_command(self):
+        """
+        A subclass should not have shorthand methods for the commands
+        which it removes
+        """
+        class NoTx(XBee):
+            api_commands = dict((name, spec) for name, spec in
+                                XBee.api_commands.items() if name != 'tx')
+
+        xbee = NoTx(self.ser)
+        self.assertFalse(hasattr(xbee, 'tx'))
+        xbee.at(frame_id=b'A', command=b'MY')
+        self.assertEqual(self.ser.data, b'\x7E\x00\x04\x08AMY\x10')
+
 class TestReadFromDevice(unittest.TestCase):
     """
     XBee class should properly read and parse binary data from a serial 
@@ -631,5 +700,48 @@ class TestReadFromDevice(unittest.TestCase):
             exc_type, exc_value, exc_traceback = sys.exc_info()
             self.fail("".join(traceback.format_exception(exc_type, exc_value, exc_traceback)))
 
+    def test_read_unknown_frame_raise(self):
+        """
+        by default, reading a frame with an unknown id should raise an
+        exception
+        """
+        device = FakeReadDevice(b'\x7E\x00\x01\x00\xFF')
+        xbee = XBee(device)
+
+        from xbee.base import CommandFrameException
+        self.assertRaises(CommandFrameException, xbee.wait_read_frame)
+
+    def test_read_unknown_frame_drop(self):
+        """
+        with unknown_frames='drop', frames with unknown ids should be
+        skipped and counted
+        """
+        device = FakeReadDevice(
+            b'\x7E\x00\x01\x00\xFF' + b'\x7E\x00\x01\xFE\x01'
+            + b'\x7E\x00\x05\x88DMY\x01\x8c')
+        xbee = XBee(device, unknown_frames='drop')
+
+        info = xbee.wait_read_frame()
+        self.assertEqual(info['id'], 'at_response')
+        self.assertEqual(xbee.unknown_frames_dropped, 2)
+
+    def test_read_unknown_frame_pass(self):
+        """
+        with unknown_frames='pass', frames with unknown ids should be
+        returned unparsed
+        """
+        device = FakeReadDevice(b'\x7E\x00\x02\xFE\x01\x00')
+        xbee = XBee(device, unknown_frames='pass')
+
+        info = xbee.wait_read_frame()
+        self.assertEqual(info, {'id':'unknown', 'data':b'\xFE\x01'})
+
+    def test_invalid_unknown_frames_policy(self):
+        """
+        an unsupported unknown_frames policy should be rejected
+        """
+        self.assertRaises(ValueError, XBee, FakeReadDevice(b''), 
+                          unknown_frames='ignore')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,124 @@
+#! /usr/bin/python
+"""
+test_pending.py
+
+Tests the allocation of frame IDs to requests awaiting a response.
+"""
+import time, unittest
+try:
+    from concurrent.futures import TimeoutError
+except ImportError:
+    # Python 2, without the futures package installed
+    TimeoutError = None
+from xbee.pending import Future, PendingRequests, FrameIdExhaustedException
+
+@unittest.skipIf(Future is None, "requests require concurrent.futures")
+class TestPendingRequests(unittest.TestCase):
+    """
+    PendingRequests should allocate unique frame IDs and complete
+    each request with its own response
+    """
+
+    def setUp(self):
+        self.requests = PendingRequests()
+
+    def test_unique_frame_ids(self):
+        """
+        every frame ID from 2 to 255 should be allocated once before
+        the pool is exhausted
+        """
+        frame_ids = set(self.requests.allocate(('tx_status',))[0]
+                        for i in range(254))
+
+        self.assertEqual(frame_ids, set(range(2, 256)))
+        self.assertRaises(FrameIdExhaustedException,
+                          self.requests.allocate, ('tx_status',))
+
+    def test_allocate_many(self):
+        """
+        many frame IDs should be allocated at once, or none if too few
+        are free
+        """
+        allocated = self.requests.allocate_many(('tx_status',), 200)
+        self.assertEqual([frame_id for frame_id, future in allocated],
+                         list(range(2, 202)))
+
+        self.assertRaises(FrameIdExhaustedException,
+                          self.requests.allocate_many, ('tx_status',), 55)
+        self.assertEqual(len(self.requests), 200)
+
+    def test_allocate_many_partial(self):
+        """
+        with partial, as many frame IDs as are free should be allocated
+        """
+        self.requests.allocate_many(('tx_status',), 200)
+        allocated = self.requests.allocate_many(('tx_status',), 100,
+                                                partial=True)
+        self.assertEqual([frame_id for frame_id, future in allocated],
+                         list(range(202, 256)))
+        self.assertEqual(self.requests.allocate_many(('tx_status',), 1, 
+                                                     partial=True), [])
+
+    def test_complete(self):
+        """
+        a request should only be completed by a response of the
+        expected type, after which its frame ID is free again
+        """
+        frame_id, future = self.requests.allocate(('at_response',))
+        response = {'id':'at_response', 'frame_id':b'\x01'}
+
+        self.assertFalse(self.requests.complete(frame_id, {'id':'tx_status'}))
+        self.assertTrue(self.requests.complete(frame_id, response))
+        self.assertEqual(future.result(0), response)
+        self.assertFalse(frame_id in self.requests)
+
+    def test_recycle_oldest_first(self):
+        """
+        released frame IDs should be reused only after all others
+        """
+        frame_id, future = self.requests.allocate(('at_response',))
+        self.requests.release(frame_id)
+
+        next_id, future = self.requests.allocate(('at_response',))
+        self.assertNotEqual(next_id, frame_id)
+
+    def test_timeout(self):
+        """
+        a request should fail once its timeout has passed
+        """
+        frame_id, future = self.requests.allocate(('at_response',), timeout=0)
+        self.requests.expire()
+
+        self.assertRaises(TimeoutError, future.result, 0)
+        self.assertEqual(len(self.requests), 0)
+
+    def test_cancel_all(self):
+        """
+        cancel_all should cancel every request and free its frame ID
+        """
+        frame_id, future = self.requests.allocate(('at_response',))
+        self.requests.allocate(('at_response',), timeout=10)
+        self.requests.cancel_all()
+
+        self.assertTrue(future.cancelled())
+        self.assertEqual(len(self.requests), 0)
+        self.assertEqual(len(self.requests.allocate_many(('at_response',), 254)), 254)
+
+    def test_next_deadline(self):
+        """
+        next_deadline should return the earliest deadline of the
+        requests which have one
+        """
+        self.assertEqual(self.requests.next_deadline(), None)
+
+        self.requests.allocate(('at_response',))
+        self.assertEqual(self.requests.next_deadline(), None)
+
+        start = time.time()
+        self.requests.allocate(('at_response',), timeout=10)
+        self.requests.allocate(('at_response',), timeout=1)
+        deadline = self.requests.next_deadline()
+        self.assertTrue(start + 1 <= deadline <= time.time() + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+#! /usr/bin/python
+"""
+test_records.py
+
+Tests the record classes made for received frames.
+"""
+import pickle, unittest
+from xbee.ieee import XBee
+from xbee.zigbee import ZigBee
+from xbee.base import XBeeBase
+from xbee.records import FrameRecord, LazyFrame
+
+class TestFrameRecords(unittest.TestCase):
+    """
+    With frame_format='record', frames should be returned as records
+    which behave like the dictionaries otherwise returned
+    """
+
+    def setUp(self):
+        self.zigbee = ZigBee(None, frame_format='record')
+
+    def test_rx(self):
+        """
+        a record should hold the same fields as the dictionary
+        """
+        data = b'\x90\x00\x13\xa2\x00@oG\xe4v\x1a\x01hello'
+        record = self.zigbee._split_response(data)
+
+        self.assertTrue(isinstance(record, FrameRecord))
+        self.assertEqual(record, ZigBee(None)._split_response(data))
+        self.assertEqual(record['id'], 'rx')
+        self.assertEqual(record.rf_data, b'hello')
+        self.assertEqual(record.get('source_addr'), b'v\x1a')
+        self.assertEqual(type(record).__name__, 'RxRecord')
+
+    def test_absent_field(self):
+        """
+        a field absent from the frame should be absent from the record
+        """
+        record = self.zigbee._split_response(b'\x88AMY\x00')
+
+        self.assertFalse('parameter' in record)
+        self.assertEqual(sorted(record), 
+                         ['command', 'frame_id', 'id', 'status'])
+        self.assertRaises(KeyError, lambda: record['parameter'])
+        self.assertRaises(KeyError, lambda: record['keys'])
+
+    def test_parsed_field(self):
+        """
+        parsing rules should still be applied
+        """
+        data = b'\x97A\x00\x13\xa2\x00@oG\xe4v\x1aIS\x00\x01\x1c\xc0\x06\x18\x00\x02\x8c\x03\x96'
+        record = self.zigbee._split_response(data)
+
+        self.assertEqual(record['parameter'][0]['adc-1'], 652)
+
+    def test_split_like_dict(self):
+        """
+        a record should be split as the dictionary is, and rejected 
+        where the dictionary would be
+        """
+        self.assertEqual(
+            CountingXBee(None, frame_format='record')._split_response(
+                b'\x01Aname\x00Z'),
+            {'id':'counted', 'first':b'A', 'name':b'name', 'last':1})
+
+        for data in (b'\x01Aname', b'\x01Aname\x00', b'\x01Aname\x00ZZ'):
+            self.assertRaises(ValueError, CountingXBee(None, frame_format='record')
+                              ._split_response, data)
+        self.assertRaises(ValueError, self.zigbee._split_response, 
+                          b'\x8b\x01\x00\x00\x00\x00\x00\xff\xff')
+
+    def test_slots(self):
+        """
+        records should not have an instance dictionary
+        """
+        record = XBee(None, frame_format='record')._split_response(
+            b'\x81\x00\x01\x28\x00x')
+
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertRaises(AttributeError, setattr, record, 'other', 1)
+
+    def test_pickle(self):
+        """
+        records should be unpickled as dictionaries
+        """
+        record = self.zigbee._split_response(b'\x88AMY\x00')
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+
+    def test_invalid_frame_format(self):
+        """
+        an unsupported frame_format should be rejected
+        """
+        self.assertRaises(ValueError, ZigBee, None, frame_format='tuple')
+
+class CountingXBee(XBeeBase):
+    """
+    Counts the applications of its parsing rule
+    """
+    api_responses = {b'\x01':
+                        {'name':'counted',
+                         'structure':
+                            [{'name':'first',  'len':1},
+                             {'name':'name',   'len':'null_terminated'},
+                             {'name':'last',   'len':1}],
+                         'parsing': [('last',
+                                      lambda xbee,original: xbee.count())]}}
+
+    parsed = 0
+
+    def count(self):
+        self.parsed += 1
+        return self.parsed
+
+class TestLazyFrames(unittest.TestCase):
+    """
+    With frame_format='lazy', frames should be returned as views which
+    split out each field when it is read
+    """
+
+    def setUp(self):
+        self.xbee = CountingXBee(None, frame_format='lazy')
+
+    def test_fixed_field(self):
+        """
+        a field at a fixed position should be read without splitting
+        the whole frame or applying parsing rules
+        """
+        frame = self.xbee._split_response(b'\x01Aname\x00Z')
+
+        self.assertTrue(isinstance(frame, LazyFrame))
+        self.assertEqual(frame['id'], 'counted')
+        self.assertEqual(frame['first'], b'A')
+        self.assertTrue(frame._raw is None)
+        self.assertEqual(self.xbee.parsed, 0)
+
+    def test_parsed_field(self):
+        """
+        parsing rules should be applied once, when their field is read
+        """
+        frame = self.xbee._split_response(b'\x01Aname\x00Z')
+
+        self.assertEqual(frame['name'], b'name')
+        self.assertEqual(self.xbee.parsed, 0)
+        self.assertEqual(frame['last'], 1)
+        self.assertEqual(frame['last'], 1)
+        self.assertEqual(dict(frame), {'id':'counted', 'first':b'A',
+                                       'name':b'name', 'last':1})
+
+    def test_error_raised_when_read(self):
+        """
+        a frame which cannot be split should raise an exception only
+        when a field which depends on the error is read
+        """
+        frame = self.xbee._split_response(b'\x01Aname')
+
+        self.assertEqual(frame['first'], b'A')
+        self.assertRaises(ValueError, lambda: frame['name'])
+
+    def test_wrong_length(self):
+        """
+        a frame too short or too long for its specification should be
+        rejected when it is split, as a dictionary would be
+        """
+        self.assertRaises(ValueError, self.xbee._split_response, b'\x01A\x00')
+
+        zigbee = ZigBee(None, frame_format='lazy')
+        self.assertRaises(ValueError, zigbee._split_response, 
+                          b'\x8b\x01\x00\x00\x00\x00\x00\xff\xff')
+
+    def test_fixed_field_cached(self):
+        """
+        a field at a fixed position should be sliced out only once
+        """
+        frame = ZigBee(None, frame_format='lazy')._split_response(
+            b'\x8b\x01\xff\xfe\x00\x00\x00')
+
+        self.assertEqual(frame['dest_addr'], b'\xff\xfe')
+        self.assertTrue(frame['dest_addr'] is frame['dest_addr'])
+        self.assertTrue(frame._raw is None)
+
+    def test_same_as_dict(self):
+        """
+        a lazy frame should hold the same fields as the dictionary
+        """
+        data = b'\x97A\x00\x13\xa2\x00@oG\xe4v\x1aIS\x00\x01\x1c\xc0\x06\x18\x00\x02\x8c\x03\x96'
+        frame = ZigBee(None, frame_format='lazy')._split_response(data)
+
+        self.assertEqual(frame, ZigBee(None)._split_response(data))
+        self.assertEqual(frame.data, data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+#! /usr/bin/python
+"""
+test_samples.py
+
+Tests the layouts of IO sample data headers.
+"""
+import unittest
+from xbee.samples import SampleFormat, ZigBeeSampleFormat, SampleColumns
+from xbee.python2to3 import intToByte
+
+class TestSampleFormat(unittest.TestCase):
+    """
+    SampleFormat should read the masks of an XBee 802.15.4 header and
+    lay out the channels they enable
+    """
+
+    def setUp(self):
+        self.format = SampleFormat()
+
+    def test_read_header(self):
+        """
+        the sample count and both masks should be read from the header
+        """
+        # ADC 0 and 1 enabled, DIO 0, 1 and 8 enabled
+        count, layout = self.format.read_header(b'\x02\x07\x03')
+
+        self.assertEqual(count, 2)
+        self.assertEqual(layout.dio_mask, 0x0103)
+        self.assertEqual(layout.aio_mask, 0x03)
+        self.assertEqual(layout.dio_chans, (0, 1, 8))
+        self.assertEqual(layout.aio_chans, (0, 1))
+        self.assertEqual(layout.dio_keys, ('dio-0', 'dio-1', 'dio-8'))
+        self.assertEqual(layout.aio_keys, ('adc-0', 'adc-1'))
+        self.assertEqual(layout.sample_size, 6)
+
+    def test_analog_only_sample_size(self):
+        """
+        no digital word should be expected when no digital channel is
+        enabled
+        """
+        layout = self.format.layout(0, 0x7F)
+        self.assertEqual(layout.dio_chans, ())
+        self.assertEqual(layout.sample_size, 14)
+
+    def test_layout_reused(self):
+        """
+        each combination of masks should be laid out only once
+        """
+        self.assertTrue(self.format.layout(0x0AA, 0x01) is 
+                        self.format.layout(0x0AA, 0x01))
+
+    def test_unpack_many_samples(self):
+        """
+        every sample of a long frame should be unpacked in order
+        """
+        # DIO 0 and ADC 1 enabled
+        count, layout = self.format.read_header(b'\xC8\x04\x01')
+        body = b''.join(b'\x00' + (b'\x01' if i % 2 else b'\x00') +
+                        b'\xFC' + intToByte(i) for i in range(count))
+
+        samples = layout.unpack(b'\xC8\x04\x01' + body, 3, count)
+
+        self.assertEqual(len(samples), 200)
+        self.assertEqual(samples[0], {'dio-0':False, 'adc-1':0})
+        self.assertEqual(samples[199], {'dio-0':True, 'adc-1':199})
+
+    def test_unpack_too_short(self):
+        """
+        a sample which is cut short should be rejected
+        """
+        count, layout = self.format.read_header(b'\x02\x02\x00')
+        self.assertRaises(IndexError, layout.unpack, 
+                          b'\x02\x02\x00\x00\x01\x00', 3, count)
+
+class TestZigBeeSampleFormat(unittest.TestCase):
+    """
+    ZigBeeSampleFormat should read the masks of an XBee ZB header
+    """
+
+    def test_read_header(self):
+        """
+        unused digital mask bits should be ignored
+        """
+        count, layout = ZigBeeSampleFormat().read_header(b'\x01\xFF\xFF\x81')
+
+        self.assertEqual(count, 1)
+        self.assertEqual(layout.dio_chans, (0, 1, 2, 3, 4, 5, 6, 9, 10, 11))
+        self.assertEqual(layout.aio_chans, (0, 7))
+        self.assertEqual(layout.sample_size, 6)
+
+class TestSampleColumns(unittest.TestCase):
+    """
+    SampleColumns should collect samples into arrays, a row per sample
+    """
+
+    def setUp(self):
+        self.columns = SampleColumns()
+        # DIO 0 and 1 and ADC 1 enabled
+        self.data = b'\x03\x04\x03' + b'\x00\x01\x00\x10' \
+                    + b'\x00\x02\x00\x20' + b'\x00\x03\xFC\x30'
+        count, layout = SampleFormat().read_header(self.data)
+        self.columns.extend(layout, self.data, 3, count, 0x1234, 10.0)
+
+    def test_extend(self):
+        """
+        each sample should be appended as a row
+        """
+        batch = self.columns.take()
+
+        self.assertEqual(list(batch['time']), [10.0] * 3)
+        self.assertEqual(list(batch['source']), [0x1234] * 3)
+        self.assertEqual(list(batch['dio_mask']), [0x03] * 3)
+        self.assertEqual(list(batch['dio']), [1, 2, 3])
+        self.assertEqual(list(batch['adc-1']), [0x10, 0x20, 0x30])
+        self.assertEqual(list(batch['adc-0']), [SampleColumns.MISSING] * 3)
+
+    def test_take_batches(self):
+        """
+        take should remove rows from the front of the columns
+        """
+        self.assertEqual(list(self.columns.take(2)['dio']), [1, 2])
+        self.assertEqual(len(self.columns), 1)
+        self.assertEqual(list(self.columns.take(2)['dio']), [3])
+        self.assertEqual(len(self.columns), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#! /usr/bin/python
+"""
+test_transmit.py
+
+Tests the queue of frames written to the serial port by a thread of
+its own.
+"""
+import threading, unittest
+from xbee.frame import APIFrame
+from xbee.transmit import TransmitQueue
+from xbee.zigbee import ZigBee
+
+class BlockingDevice(object):
+    """
+    Records every write, each of which waits until released
+    """
+
+    def __init__(self):
+        self.writes = []
+        self.release = threading.Event()
+        self.writing = threading.Event()
+
+    def write(self, data):
+        self.writing.set()
+        self.release.wait()
+        self.writes.append(data)
+
+class FailingDevice(object):
+    def write(self, data):
+        raise IOError("Device disconnected")
+
+class TestTransmitQueue(unittest.TestCase):
+    """
+    TransmitQueue should write every frame put, in order, joining
+    those which wait together
+    """
+
+    def setUp(self):
+        self.queue = TransmitQueue()
+        self.device = BlockingDevice()
+
+    def tearDown(self):
+        self.device.release.set()
+        if self.queue is not None:
+            self.queue.close()
+
+    def test_coalesced_in_order(self):
+        """
+        frames queued while a write is in progress should be written
+        together, in order
+        """
+        self.queue.start(self.device.write)
+        self.queue.put(b'first')
+        self.device.writing.wait()
+
+        for i in range(10):
+            self.queue.put(str(i).encode())
+        self.device.release.set()
+        self.queue.flush()
+
+        self.assertEqual(self.device.writes, [b'first', b'0123456789'])
+        self.assertEqual(self.queue.frames_written, 11)
+        self.assertEqual(self.queue.writes, 2)
+        self.assertEqual(self.queue.max_depth, 10)
+
+    def test_max_write(self):
+        """
+        no write should join more than max_write bytes of frames
+        """
+        self.queue = TransmitQueue(max_write=4)
+        self.queue.start(self.device.write)
+        self.queue.put(b'first')
+        self.device.writing.wait()
+
+        for frame in (b'ab', b'cd', b'ef', b'ghijk'):
+            self.queue.put(frame)
+        self.device.release.set()
+        self.queue.flush()
+
+        self.assertEqual(self.device.writes,
+                         [b'first', b'abcd', b'ef', b'ghijk'])
+
+    def test_producer_order(self):
+        """
+        each thread's frames should be written in the order it sent them
+        """
+        written = []
+        self.queue.start(written.append)
+
+        def produce(name):
+            for i in range(200):
+                self.queue.put(('%s:%d;' % (name, i)).encode())
+
+        threads = [threading.Thread(target=produce, args=(name,))
+                   for name in 'abcd']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.queue.close()
+
+        frames = b''.join(written).decode().split(';')[:-1]
+        self.assertEqual(len(frames), 800)
+        for name in 'abcd':
+            self.assertEqual([frame for frame in frames if frame[0] == name],
+                             ['%s:%d' % (name, i) for i in range(200)])
+
+    def test_write_error(self):
+        """
+        an error writing to the port should be raised by the next put()
+        """
+        self.queue.start(FailingDevice().write)
+        self.queue.put(b'frame')
+
+        self.assertRaises(IOError, self.queue.flush)
+        self.assertRaises(IOError, self.queue.put, b'frame')
+        self.assertRaises(IOError, self.queue.close)
+        self.queue = None
+
+class TestXBeeTransmitQueue(unittest.TestCase):
+    """
+    An XBee object with a transmit_queue should write frames through it
+    """
+
+    def test_send(self):
+        """
+        frames sent should be written by the time halt() returns
+        """
+        device = BlockingDevice()
+        device.release.set()
+        xbee = ZigBee(device, transmit_queue=TransmitQueue())
+
+        xbee.send('at', frame_id=b'\x01', command=b'MY')
+        xbee.send('at', frame_id=b'\x02', command=b'NI')
+        xbee.halt()
+
+        self.assertEqual(b''.join(device.writes),
+                         APIFrame(b'\x08\x01MY').output() +
+                         APIFrame(b'\x08\x02NI').output())
@@ -0,0 +1,165 @@
+#! /usr/bin/python
+"""
+test_workers.py
+
+Tests the pool of threads which call an XBeeBase callback.
+"""
+import threading, time, unittest
+from xbee.frame import APIFrame
+from xbee.tests.Fake import FakeReadDevice
+from xbee.workers import CallbackWorkers
+from xbee.zigbee import ZigBee
+
+class TestCallbackWorkers(unittest.TestCase):
+    """
+    CallbackWorkers should pass each frame put to the callback, from
+    its own threads
+    """
+
+    def setUp(self):
+        self.workers = None
+        self.received = []
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        if self.workers is not None:
+            self.workers.close()
+
+    def blocked_callback(self, frame):
+        self.release.wait()
+        self.received.append(frame)
+
+    def test_delivery(self):
+        """
+        every frame should be delivered once the workers are closed
+        """
+        self.workers = CallbackWorkers(workers=3)
+        self.workers.start(self.received.append)
+
+        for i in range(100):
+            self.workers.put({'id':'rx', 'seq':i})
+        self.workers.close()
+
+        self.assertEqual(sorted(frame['seq'] for frame in self.received),
+                         list(range(100)))
+        self.assertEqual(self.workers.delivered, 100)
+        self.assertEqual(self.workers.depth, 0)
+
+    def test_drop_newest(self):
+        """
+        with overflow='drop_newest', frames arriving at a full queue
+        should be dropped
+        """
+        self.workers = CallbackWorkers(workers=1, max_queue=2, 
+                                       overflow='drop_newest')
+        self.workers.start(self.blocked_callback)
+
+        self.workers.put({'seq':0})
+        # Wait for the worker to take the first frame
+        while self.workers.depth:
+            time.sleep(.001)
+        for i in range(1, 5):
+            self.workers.put({'seq':i})
+
+        self.assertEqual(self.workers.dropped, 2)
+        self.assertEqual(self.workers.max_depth, 2)
+        self.release.set()
+        self.workers.close()
+        self.assertEqual([frame['seq'] for frame in self.received], [0, 1, 2])
+
+    def test_drop_oldest(self):
+        """
+        with overflow='drop_oldest', the longest waiting frames should
+        make way for those arriving at a full queue
+        """
+        self.workers = CallbackWorkers(workers=1, max_queue=2, 
+                                       overflow='drop_oldest')
+        self.workers.start(self.blocked_callback)
+
+        self.workers.put({'seq':0})
+        while self.workers.depth:
+            time.sleep(.001)
+        for i in range(1, 5):
+            self.workers.put({'seq':i})
+
+        self.assertEqual(self.workers.dropped, 2)
+        self.release.set()
+        self.workers.close()
+        self.assertEqual([frame['seq'] for frame in self.received], [0, 3, 4])
+
+    def test_ordered(self):
+        """
+        with ordered=True, frames from each source should be delivered
+        in the order they arrived
+        """
+        self.workers = CallbackWorkers(workers=4, ordered=True)
+        self.workers.start(self.received.append)
+
+        sources = [b'\x00\x01', b'\x00\x02', b'\x00\x03']
+        for i in range(300):
+            self.workers.put({'source_addr':sources[i % 3], 'seq':i})
+        self.workers.close()
+
+        for source in sources:
+            seqs = [frame['seq'] for frame in self.received
+                    if frame['source_addr'] == source]
+            self.assertEqual(seqs, sorted(seqs))
+            self.assertEqual(len(seqs), 100)
+
+    @unittest.skipIf(not hasattr(unittest.TestCase, 'assertLogs'),
+                     "assertLogs requires Python 3.4")
+    def test_callback_errors(self):
+        """
+        an exception raised by the callback should be logged and 
+        counted, and the worker should carry on
+        """
+        def callback(frame):
+            if frame['seq'] == 1:
+                raise ValueError("bad frame")
+            self.received.append(frame)
+
+        self.workers = CallbackWorkers(workers=1)
+        self.workers.start(callback)
+        with self.assertLogs('xbee.workers', level='ERROR') as logs:
+            for i in range(3):
+                self.workers.put({'seq':i})
+            self.workers.close()
+
+        self.assertEqual(self.workers.errors, 1)
+        self.assertTrue(isinstance(self.workers.last_error, ValueError))
+        self.assertTrue('bad frame' in logs.output[0])
+        self.assertEqual(len(self.received), 2)
+
+    def test_invalid_overflow(self):
+        """
+        an unsupported overflow policy should be rejected
+        """
+        self.assertRaises(ValueError, CallbackWorkers, overflow='ignore')
+
+class TestXBeeCallbackWorkers(unittest.TestCase):
+    """
+    XBeeBase should pass frames read by its background thread to its
+    callback workers
+    """
+
+    def test_frames_delivered(self):
+        """
+        every frame read should be delivered by halt()
+        """
+        data = b''.join(APIFrame(b'\x8a' + bytearray([i])).output() 
+                        for i in range(20))
+        received = []
+        workers = CallbackWorkers(workers=2)
+
+        xbee = ZigBee(FakeReadDevice(data, silent_on_empty=True),
+                      callback=received.append, callback_workers=workers)
+        while workers.delivered < 20:
+            time.sleep(.01)
+        xbee.halt()
+
+        self.assertEqual(sorted(frame['status'] for frame in received),
+                         [bytearray([i]) for i in range(20)])
+
+if __name__ == '__main__':
+    unittest.main()
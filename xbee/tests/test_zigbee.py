@@ -6,8 +6,19 @@ pmalmsten@gmail.com
 
 Tests the XBee ZB (ZigBee) implementation class for API compliance
 """
-import unittest
+import struct, threading, time, unittest
+try:
+    from concurrent.futures import TimeoutError
+except ImportError:
+    # Python 2, without the futures package installed
+    TimeoutError = None
+from xbee.base import CommandFrameException
+from xbee.frame import APIFrame
+from xbee.pending import Future
+from xbee.samples import SampleColumns
+from xbee.tests.Fake import FakeReadDevice, FakePipeDevice
 from xbee.zigbee import ZigBee
+from xbee.python2to3 import byteToInt, intToByte
 
 class TestZigBee(unittest.TestCase):
     """
@@ -30,6 +41,15 @@ class TestZigBee(unittest.TestCase):
 
         self.assertEqual(data['node_id'], expected_data)
 
+    def test_null_terminated_field_unterminated(self):
+        """
+        A null-terminated field without its terminator should be
+        reported as too short
+        """
+        node_identifier = b'\x95' + b'\x00' * 21 + b'\x01\x02\x03\x04'
+
+        self.assertRaises(ValueError, self.zigbee._split_response, node_identifier)
+
     def test_split_node_identification_identifier(self):
             data = b'\x95\x00\x13\xa2\x00\x40\x52\x2b\xaa\x7d\x84\x02\x7d\x84\x00\x13\xa2\x00\x40\x52\x2b\xaa\x20\x00\xff\xfe\x01\x01\xc1\x05\x10\x1e'
             info = self.zigbee._split_response(data)
@@ -152,3 +172,446 @@ class TestParseZigBeeIOData(unittest.TestCase):
                                  'adc-3': 518}]
             results = self.zigbee._parse_samples(data)
             self.assertEqual(results, expected_results)
+
+    def test_parse_into_columns(self):
+        """
+        with sample_columns, samples should be appended to them, along
+        with the address of the device which sent them
+        """
+        columns = SampleColumns()
+        zigbee = ZigBee(None, sample_columns=columns)
+
+        data = b'\x97A\x00\x13\xa2\x00@oG\xe4v\x1aIS\x00\x01\x1c\xc0\x06\x18\x00\x02\x8c\x03\x96'
+        info = zigbee._split_response(data)
+        self.assertEqual(info['parameter'], 1)
+
+        batch = columns.take()
+        self.assertEqual(len(columns), 0)
+        self.assertEqual(list(batch['source']), [0x0013a200406f47e4])
+        self.assertEqual(list(batch['dio_mask']), [0x0C40])
+        self.assertEqual(list(batch['dio']), [0x0800])
+        self.assertEqual(list(batch['adc-1']), [652])
+        self.assertEqual(list(batch['adc-2']), [918])
+        self.assertEqual(list(batch['adc-0']), [SampleColumns.MISSING])
+
+    def test_columns_not_lazy(self):
+        """
+        sample_columns may not be used with lazy frames, whose samples
+        would only be appended if read
+        """
+        self.assertRaises(ValueError, ZigBee, None, 
+                          sample_columns=SampleColumns(), frame_format='lazy')
+
+class FakeReadWriteDevice(FakeReadDevice):
+    """
+    Records data written to a fake port which can also be read from
+    """
+    def __init__(self, data=b''):
+        super(FakeReadWriteDevice, self).__init__(data)
+        self.written = b''
+
+    def write(self, data):
+        self.written += data
+
+@unittest.skipIf(Future is None, "requests require concurrent.futures")
+class TestRequests(unittest.TestCase):
+    """
+    Requests should be given their own frame IDs and completed by
+    their responses
+    """
+
+    def setUp(self):
+        self.device = FakeReadWriteDevice()
+        self.zigbee = ZigBee(self.device)
+
+    def respond(self, *responses):
+        self.device.data += b''.join(APIFrame(data).output() for data in responses)
+
+    def test_request_frame_ids(self):
+        """
+        each request should be sent with a newly allocated frame ID
+        """
+        self.zigbee.request('at', command=b'MY')
+        self.zigbee.request('at', command=b'NI')
+
+        self.assertEqual(self.device.written,
+                         APIFrame(b'\x08\x02MY').output() +
+                         APIFrame(b'\x08\x03NI').output())
+
+    def test_responses_out_of_order(self):
+        """
+        responses should complete their own requests in any order,
+        and other frames should still be read as usual
+        """
+        first = self.zigbee.request('at', command=b'MY')
+        second = self.zigbee.request('tx', dest_addr_long=b'\x00' * 8,
+                                     dest_addr=b'\xFF\xFE', data=b'hi')
+
+        self.respond(b'\x8b\x03\xff\xfe\x00\x00\x00',
+                     b'\x8a\x01',
+                     b'\x88\x02MY\x00\x12\x34')
+        self.zigbee.poll()
+
+        self.assertEqual(first.result(0)['parameter'], b'\x12\x34')
+        self.assertEqual(second.result(0)['id'], 'tx_status')
+        self.assertEqual(self.zigbee.wait_read_frame(),
+                         {'id':'status', 'status':b'\x01'})
+
+    def test_unrequested_response(self):
+        """
+        a response to a frame ID which was not requested should be read
+        as usual
+        """
+        self.respond(b'\x88\x07MY\x00')
+
+        self.assertEqual(self.zigbee.wait_read_frame()['frame_id'], b'\x07')
+
+    def test_request_timeout(self):
+        """
+        a request should fail when no response arrives in time
+        """
+        future = self.zigbee.request('at', timeout=0, command=b'MY')
+        self.zigbee.poll()
+
+        self.assertRaises(TimeoutError, future.result, 0)
+
+    def test_invalid_request(self):
+        """
+        a frame ID may not be given, and a command must have a response
+        """
+        self.assertRaises(ValueError, self.zigbee.request, 'at', 
+                          frame_id=b'\x01', command=b'MY')
+
+        self.zigbee.api_command_responses = {}
+        self.assertRaises(ValueError, self.zigbee.request, 'at', command=b'MY')
+
+class FakePipeWriteDevice(FakePipeDevice):
+    """
+    Records data written to a fake port which can be waited upon
+    """
+    written = b''
+
+    def write(self, data):
+        self.written += data
+
+@unittest.skipIf(Future is None, "requests require concurrent.futures")
+class TestRequestThread(unittest.TestCase):
+    """
+    Requests made while the background thread waits for data should
+    time out without any data arriving, and be cancelled by halt()
+    """
+
+    def setUp(self):
+        self.device = FakePipeWriteDevice()
+
+    def tearDown(self):
+        self.zigbee.halt()
+        self.device.close()
+
+    def assert_times_out(self, **kwargs):
+        self.zigbee = ZigBee(self.device, callback=lambda frame: None, **kwargs)
+        # Let the thread start waiting
+        time.sleep(.05)
+
+        start = time.time()
+        future = self.zigbee.request('at', timeout=.1, command=b'MY')
+        self.assertRaises(TimeoutError, future.result, 5)
+        self.assertTrue(time.time() - start < 1)
+
+    def test_select_timeout(self):
+        """
+        a thread waiting in select() should end its wait at a request's 
+        deadline
+        """
+        self.assert_times_out(reader='select', read_timeout=30)
+
+    def test_blocking_timeout(self):
+        """
+        a thread waiting in read() should end its wait at a request's
+        deadline
+        """
+        self.assert_times_out(reader='blocking')
+
+    def test_halt_cancels(self):
+        """
+        halt() should cancel the requests awaiting a response
+        """
+        self.zigbee = ZigBee(self.device, callback=lambda frame: None,
+                             reader='blocking')
+        future = self.zigbee.request('at', command=b'MY')
+        self.zigbee.halt()
+
+        self.assertTrue(future.cancelled())
+
+class TestWaitFor(unittest.TestCase):
+    """
+    wait_for and wait_read_frame should wait for frames, keeping those
+    which do not match for later
+    """
+
+    def status(self, value):
+        return APIFrame(b'\x8a' + value).output()
+
+    def test_wait_read_frame_timeout(self):
+        """
+        wait_read_frame should return None if no frame arrives in time
+        """
+        zigbee = ZigBee(FakeReadDevice(b''))
+        self.assertEqual(zigbee.wait_read_frame(timeout=.05), None)
+
+    def test_wait_for_keeps_other_frames(self):
+        """
+        frames which do not match should be kept, in order
+        """
+        data = self.status(b'\x01') + self.status(b'\x02') + self.status(b'\x03')
+        zigbee = ZigBee(FakeReadDevice(data))
+
+        info = zigbee.wait_for(lambda frame: frame['status'] == b'\x02')
+        self.assertEqual(info['status'], b'\x02')
+        self.assertEqual(zigbee.wait_read_frame()['status'], b'\x01')
+        self.assertEqual(zigbee.wait_read_frame()['status'], b'\x03')
+        self.assertEqual(zigbee.wait_for(lambda frame: True, .05), None)
+
+    def test_unparsable_frame(self):
+        """
+        a frame which cannot be parsed should be skipped by wait_for,
+        then raised by wait_read_frame
+        """
+        data = b'\x7E\x00\x01\x08\xF7' + self.status(b'\x01')
+        zigbee = ZigBee(FakeReadDevice(data))
+
+        info = zigbee.wait_for(lambda frame: frame['id'] == 'status')
+        self.assertEqual(info['status'], b'\x01')
+        self.assertRaises(CommandFrameException, zigbee.wait_read_frame)
+
+    def test_concurrent_waiters(self):
+        """
+        threads waiting for different frames should each receive their
+        own, whichever of them reads from the port
+        """
+        device = FakePipeDevice(timeout=.01)
+        self.addCleanup(device.close)
+        zigbee = ZigBee(device, reader='select', read_timeout=.01)
+        results = {}
+
+        def wait(value):
+            results[value] = zigbee.wait_for(
+                lambda frame: frame['status'] == value, timeout=5)
+
+        threads = [threading.Thread(target=wait, args=(intToByte(i),))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+
+        time.sleep(.05)
+        for i in reversed(range(4)):
+            device.feed(self.status(intToByte(i)))
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(info['status'] for info in results.values()),
+                         [intToByte(i) for i in range(4)])
+
+    def test_max_inbox(self):
+        """
+        once max_inbox frames are waiting, the oldest should be dropped
+        and counted as each frame arrives
+        """
+        data = b''.join(self.status(intToByte(i)) for i in range(5))
+        zigbee = ZigBee(FakeReadDevice(data), max_inbox=3)
+
+        info = zigbee.wait_for(lambda frame: frame['status'] == b'\x04')
+        self.assertEqual(info['status'], b'\x04')
+        self.assertEqual(zigbee.inbox_frames_dropped, 2)
+        self.assertEqual(zigbee.wait_read_frame()['status'], b'\x02')
+        self.assertEqual(zigbee.wait_read_frame()['status'], b'\x03')
+
+    def test_max_inbox_poll(self):
+        """
+        frames read by poll() should be bounded by max_inbox, even if
+        nothing waits for them
+        """
+        data = b''.join(self.status(intToByte(i)) for i in range(5))
+        zigbee = ZigBee(FakeReadDevice(data), max_inbox=3)
+
+        zigbee.poll()
+        self.assertEqual(len(zigbee._frames), 3)
+        self.assertEqual(zigbee.inbox_frames_dropped, 2)
+        self.assertEqual(zigbee.wait_read_frame()['status'], b'\x02')
+
+    def test_predicate_tested_once(self):
+        """
+        a waiter should test each frame only once, however often it
+        is woken
+        """
+        data = b''.join(self.status(intToByte(i)) for i in range(3))
+        zigbee = ZigBee(FakeReadDevice(data))
+        tested = []
+
+        def predicate(frame):
+            tested.append(frame['status'])
+            return False
+
+        self.assertEqual(zigbee.wait_for(predicate, timeout=.1), None)
+        self.assertEqual(tested, [b'\x00', b'\x01', b'\x02'])
+
+class TestTemplates(unittest.TestCase):
+    """
+    Copies of a command template should be written as send() would
+    write the command
+    """
+
+    def setUp(self):
+        self.device = FakeReadWriteDevice(b'')
+        self.zigbee = ZigBee(self.device, escaped=True)
+
+    def test_send_template(self):
+        """
+        a template sent with replaced fields should match the command
+        sent in full
+        """
+        fields = {'frame_id': b'\x01', 
+                  'dest_addr_long': b'\x00\x13\xa2\x00\x40\x0a\x01\x27',
+                  'command': b'IS'}
+        template = self.zigbee.template('remote_at', **fields)
+
+        fields['frame_id'] = b'\x7E'
+        fields['dest_addr_long'] = b'\x00\x13\xa2\x00\x40\x0a\x7D\x11'
+        self.zigbee.send_template(template, frame_id=fields['frame_id'],
+                                  dest_addr_long=fields['dest_addr_long'])
+        sent = self.device.written
+        self.assertTrue(sent)
+
+        self.device.written = b''
+        self.zigbee.send('remote_at', **fields)
+        self.assertEqual(sent, self.device.written)
+
+    def test_variable_length_field(self):
+        """
+        a field without a specific length may not be replaced
+        """
+        template = self.zigbee.template('tx', dest_addr_long=b'\x00' * 8,
+                                        dest_addr=b'\xFF\xFE', data=b'hi')
+        self.assertRaises(KeyError, self.zigbee.send_template, template, 
+                          data=b'ho')
+
+@unittest.skipIf(Future is None, "requests require concurrent.futures")
+class TestSendMany(unittest.TestCase):
+    """
+    send_many should send a command to every destination at once, each
+    with its own frame ID
+    """
+
+    def setUp(self):
+        self.device = FakeReadWriteDevice()
+        self.zigbee = ZigBee(self.device)
+        self.addresses = [struct.pack('>Q', i) for i in range(3)]
+
+    def test_frames(self):
+        """
+        each destination's frame should be the command sent to it in
+        full, and its response should complete its Future
+        """
+        futures = self.zigbee.send_many('tx', self.addresses,
+                                        dest_addr=b'\xFF\xFE', data=b'hi')
+
+        self.assertEqual(self.device.written, b''.join(
+            APIFrame(b'\x10' + intToByte(i + 2) + addr + 
+                     b'\xFF\xFE\x00\x00hi').output()
+            for i, addr in enumerate(self.addresses)))
+
+        self.device.data += APIFrame(b'\x8b\x03\xff\xfe\x00\x00\x00').output()
+        self.zigbee.poll()
+        self.assertEqual([future.done() for future in futures],
+                         [False, True, False])
+
+    def test_destination_fields(self):
+        """
+        a destination may give any of the fields to replace
+        """
+        self.zigbee.send_many('tx', [{'dest_addr_long': self.addresses[1],
+                                      'dest_addr': b'\x12\x34'}],
+                              data=b'hi')
+
+        self.assertEqual(self.device.written, APIFrame(
+            b'\x10\x02' + self.addresses[1] + b'\x12\x34\x00\x00hi').output())
+
+    def test_without_responses(self):
+        """
+        with a frame_id given, no frame IDs should be allocated
+        """
+        addresses = [struct.pack('>Q', i) for i in range(300)]
+        result = self.zigbee.send_many('tx', addresses, frame_id=b'\x00',
+                                       dest_addr=b'\xFF\xFE', data=b'hi')
+
+        self.assertEqual(result, None)
+        self.assertEqual(len(self.zigbee._requests), 0)
+        self.assertEqual(len(self.device.written), 300 * 20)
+
+    def test_frame_ids_exhausted(self):
+        """
+        destinations beyond the frame IDs free should be sent frames
+        requesting no response, and given no Future
+        """
+        addresses = [struct.pack('>Q', i) for i in range(500)]
+        futures = self.zigbee.send_many('tx', addresses, 
+                                        dest_addr=b'\xFF\xFE', data=b'hi')
+
+        self.assertEqual(len(futures), 500)
+        self.assertTrue(all(future is not None for future in futures[:254]))
+        self.assertEqual(futures[254:], [None] * 246)
+        self.assertEqual(len(self.zigbee._requests), 254)
+
+        written = self.device.written
+        self.assertEqual(len(written), 500 * 20)
+        frame_ids = [byteToInt(written[i * 20 + 4:i * 20 + 5])
+                     for i in range(500)]
+        self.assertEqual(frame_ids, list(range(2, 256)) + [0] * 246)
+
+    def test_invalid_destination(self):
+        """
+        an invalid destination should release the frame IDs allocated
+        """
+        self.assertRaises(ValueError, self.zigbee.send_many, 'tx', 
+                          [self.addresses[0], b'\x00'],
+                          dest_addr=b'\xFF\xFE', data=b'hi')
+
+        self.assertEqual(self.device.written, b'')
+        self.assertEqual(len(self.zigbee._requests), 0)
+
+@unittest.skipIf(Future is None, "requests require concurrent.futures")
+class TestFrameIdConflicts(unittest.TestCase):
+    """
+    Frames sent without a request should not be able to take the
+    response to a request
+    """
+
+    def setUp(self):
+        self.device = FakeReadWriteDevice()
+        self.zigbee = ZigBee(self.device)
+
+    def test_default_frame_id(self):
+        """
+        the default frame ID should never be allocated to a request, so
+        that its response is read as usual
+        """
+        future = self.zigbee.request('at', command=b'MY')
+        self.zigbee.send('at', command=b'NI')
+
+        self.device.data += APIFrame(b'\x88\x01NI\x00').output()
+        self.assertEqual(self.zigbee.wait_read_frame()['command'], b'NI')
+        self.assertFalse(future.done())
+
+    def test_frame_id_in_use(self):
+        """
+        a frame ID in use by a request may not be sent
+        """
+        self.zigbee.request('at', command=b'MY')
+
+        self.assertRaises(ValueError, self.zigbee.send, 'at', 
+                          frame_id=b'\x02', command=b'NI')
+        self.assertRaises(ValueError, self.zigbee.send_many, 'tx', 
+                          [b'\x00' * 8], frame_id=b'\x02',
+                          dest_addr=b'\xFF\xFE', data=b'hi')
+        self.assertEqual(self.device.written,
+                         APIFrame(b'\x08\x02MY').output())
@@ -0,0 +1,166 @@
+"""
+transmit.py
+
+Provides a queue of frames waiting to be written to the serial port by
+a thread of its own, so that many threads may send at once without
+each making a write() call of its own. Every frame waiting when the
+writer thread is ready is written with a single write() call.
+"""
+import threading
+from collections import deque
+
+class TransmitQueue(object):
+    """
+    Writes frames to an XBeeBase's serial port from a writer thread;
+    pass an instance to XBeeBase as transmit_queue. Frames are written
+    in the order in which they were queued, so each thread's frames
+    keep their order.
+
+    Constructor arguments:
+        max_queue: number of frames which may wait to be written; a
+                   thread which sends while the queue is full waits for
+                   space.
+
+        max_write: the greatest number of bytes joined into one write()
+                   call (a single larger frame is still written whole).
+
+    Attributes:
+        frames_written: number of frames which have been written.
+        writes: number of write() calls made; frames_written / writes
+                is the average number of frames coalesced per call.
+        max_depth: the greatest number of frames which have waited at
+                   once.
+
+    An exception raised by the port's write() stops the writer thread,
+    and is raised again by the next put(), flush() or close().
+    """
+
+    def __init__(self, max_queue=1024, max_write=4096):
+        self.max_queue = max_queue
+        self.max_write = max_write
+        self.frames_written = 0
+        self.writes = 0
+        self.max_depth = 0
+        self._frames = deque()
+        self._ready = threading.Condition(threading.Lock())
+        # Frames taken from the queue but not yet written
+        self._writing = 0
+        self._closed = False
+        self._error = None
+        self._thread = None
+
+    def __len__(self):
+        return len(self._frames)
+
+    def start(self, write):
+        """
+        start: function -> None
+
+        Starts the writer thread, which will call the given function
+        (a serial port's write method) with the frames put().
+        """
+        self._thread = threading.Thread(target=self._work, args=(write,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, frame):
+        """
+        put: binary data -> None
+
+        Queues the given frame, as it should be written to the port.
+        """
+        with self._ready:
+            while len(self._frames) >= self.max_queue and \
+                  self._error is None and not self._closed:
+                self._ready.wait()
+
+            self._raise_error()
+            if self._closed:
+                raise ValueError("The transmit queue has been closed")
+
+            frames = self._frames
+            frames.append(frame)
+            if len(frames) > self.max_depth:
+                self.max_depth = len(frames)
+            if len(frames) == 1:
+                # The writer may be waiting for a frame
+                self._ready.notify_all()
+
+    def flush(self):
+        """
+        flush: None -> None
+
+        Waits until every frame queued has been written.
+        """
+        with self._ready:
+            while (self._frames or self._writing) and self._error is None:
+                self._ready.wait()
+            self._raise_error()
+
+    def close(self):
+        """
+        close: None -> None
+
+        Waits until every frame queued has been written, then stops
+        the writer thread.
+        """
+        with self._ready:
+            self._closed = True
+            self._ready.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        with self._ready:
+            self._raise_error()
+
+    def _raise_error(self):
+        # Must be called with _ready held
+        if self._error is not None:
+            raise self._error
+
+    def _take(self):
+        """
+        Removes every frame waiting, up to max_write bytes in all;
+        returns None once closed and empty. Must be called with _ready
+        held.
+        """
+        while not self._frames:
+            if self._closed:
+                return None
+            self._ready.wait()
+
+        frames = self._frames
+        batch = [frames.popleft()]
+        size = len(batch[0])
+        while frames and size + len(frames[0]) <= self.max_write:
+            size += len(frames[0])
+            batch.append(frames.popleft())
+
+        self._writing = len(batch)
+        # Release threads waiting for space
+        self._ready.notify_all()
+        return batch
+
+    def _work(self, write):
+        while True:
+            with self._ready:
+                batch = self._take()
+            if batch is None:
+                return
+
+            try:
+                write(b''.join(batch) if len(batch) > 1 else batch[0])
+            except Exception as error:
+                with self._ready:
+                    self._error = error
+                    self._writing = 0
+                    self._ready.notify_all()
+                return
+
+            with self._ready:
+                self.frames_written += len(batch)
+                self.writes += 1
+                self._writing = 0
+                self._ready.notify_all()
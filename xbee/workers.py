@@ -0,0 +1,202 @@
+"""
+workers.py
+
+Provides a pool of threads which call an XBeeBase callback, so that a
+slow callback does not hold up reading from the serial port. Frames
+wait in a bounded queue between the reader thread and the workers.
+"""
+import logging, threading
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+# Marks the end of a queue's frames
+_CLOSED = object()
+
+class _FrameQueue(object):
+    """
+    A bounded queue of frames waiting for a worker
+    """
+
+    def __init__(self, max_size):
+        self.frames = deque()
+        self.max_size = max_size
+        self.ready = threading.Condition(threading.Lock())
+
+    def __len__(self):
+        return len(self.frames)
+
+    def put(self, frame, overflow):
+        """
+        Adds a frame to the queue, applying the given overflow policy
+        if it is full; returns the number of frames dropped
+        """
+        with self.ready:
+            dropped = 0
+
+            if len(self.frames) >= self.max_size:
+                if overflow == 'drop_newest':
+                    return 1
+                elif overflow == 'drop_oldest':
+                    self.frames.popleft()
+                    dropped = 1
+                else:
+                    while len(self.frames) >= self.max_size:
+                        self.ready.wait()
+
+            self.frames.append(frame)
+            self.ready.notify_all()
+            return dropped
+
+    def close(self):
+        with self.ready:
+            self.frames.append(_CLOSED)
+            self.ready.notify_all()
+
+    def get(self):
+        with self.ready:
+            while not self.frames:
+                self.ready.wait()
+
+            frame = self.frames.popleft()
+            if frame is _CLOSED:
+                # Leave it for any other workers
+                self.frames.appendleft(frame)
+            else:
+                # Release a reader waiting for space
+                self.ready.notify_all()
+            return frame
+
+class CallbackWorkers(object):
+    """
+    Calls an XBeeBase callback from a pool of worker threads; pass an
+    instance to XBeeBase as callback_workers.
+
+    Constructor arguments:
+        workers: number of worker threads.
+
+        max_queue: number of frames which may wait for a worker before
+                   the overflow policy applies (for each worker, if
+                   ordered is True).
+
+        overflow: what to do with a frame which arrives when the queue
+                  is full:
+                  'block': wait for space, so that reading stops until
+                           the workers catch up (the default).
+                  'drop_oldest': drop the longest waiting frame.
+                  'drop_newest': drop the frame which arrived.
+
+        ordered: if True, frames from the same source address are always
+                 passed to the same worker, which keeps them in order
+                 (frames without a source address also keep to one
+                 worker). Otherwise, all workers share a single queue.
+
+    Attributes:
+        delivered: number of frames which have been passed to the
+                   callback.
+        dropped: number of frames dropped by the overflow policy.
+        errors: number of frames for which the callback raised an
+                exception; the worker logs it (to the xbee.workers
+                logger) and carries on with the next frame.
+        last_error: the last such exception, or None.
+        max_depth: the greatest number of frames which have waited at
+                   once.
+    """
+    OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+    def __init__(self, workers=4, max_queue=1024, overflow='block',
+                 ordered=False):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError("overflow must be one of %s, not '%s'"
+                             % (', '.join(self.OVERFLOW_POLICIES), overflow))
+
+        self.workers = workers
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.ordered = ordered
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.max_depth = 0
+        self._counter_lock = threading.Lock()
+        self._queues = []
+        self._threads = []
+
+    @property
+    def depth(self):
+        """
+        The number of frames waiting for a worker
+        """
+        return sum(len(queue) for queue in self._queues)
+
+    def start(self, callback):
+        """
+        start: function -> None
+
+        Starts the worker threads, which will call the given function
+        with each frame put().
+        """
+        queue_count = self.workers if self.ordered else 1
+        self._queues = [_FrameQueue(self.max_queue) for i in range(queue_count)]
+
+        for i in range(self.workers):
+            queue = self._queues[i % queue_count]
+            thread = threading.Thread(target=self._work, args=(queue, callback))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, frame):
+        """
+        put: frame info dictionary -> None
+
+        Queues the given frame for a worker.
+        """
+        if self.ordered:
+            source = frame.get('source_addr_long') or frame.get('source_addr')
+            queue = self._queues[hash(source) % len(self._queues)]
+        else:
+            queue = self._queues[0]
+
+        dropped = queue.put(frame, self.overflow)
+        depth = self.depth
+
+        if dropped or depth > self.max_depth:
+            with self._counter_lock:
+                self.dropped += dropped
+                self.max_depth = max(self.max_depth, depth)
+
+    def close(self):
+        """
+        close: None -> None
+
+        Waits for the workers to finish the frames already queued, then
+        stops them.
+        """
+        for queue in self._queues:
+            queue.close()
+
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._queues = []
+
+    def _work(self, queue, callback):
+        while True:
+            frame = queue.get()
+            if frame is _CLOSED:
+                return
+
+            failed = 0
+            try:
+                callback(frame)
+            except Exception as error:
+                log.exception("The callback raised an exception for frame %r", 
+                              frame)
+                self.last_error = error
+                failed = 1
+
+            with self._counter_lock:
+                self.delivered += 1
+                self.errors += failed
@@ -10,7 +10,7 @@ This module implements an XBee ZB (ZigBee) API library.
 """
 import struct
 from xbee.base import XBeeBase
-from xbee.python2to3 import byteToInt, intToByte
+from xbee.samples import ZigBeeSampleFormat
 
 class ZigBee(XBeeBase):
     """
@@ -113,7 +113,7 @@ class ZigBee(XBeeBase):
                              {'name':'options',         'len':1},
                              {'name':'samples',         'len':None}],
                          'parsing': [('samples', 
-                                      lambda xbee,original: xbee._parse_samples(original['samples'])
+                                      lambda xbee,original: xbee._parse_samples(original['samples'], original)
                                      )]},
                      b"\x8b":
                         {'name':'tx_status',
@@ -167,13 +167,16 @@ class ZigBee(XBeeBase):
                              {'name':'manufacturer_id', 'len':2}]}
                      }
     
+    # Reads the headers of IO sample data, which has more IO lines
+    sample_format = ZigBeeSampleFormat()
+    
     def _parse_IS_at_response(self, packet_info):
         """
         If the given packet is a successful remote AT response for an IS
         command, parse the parameter field as IO data.
         """
         if packet_info['id'] in ('at_response','remote_at_response') and packet_info['command'] == b'IS' and packet_info['status'] == b'\x00':
-               return self._parse_samples(packet_info['parameter'])
+               return self._parse_samples(packet_info['parameter'], packet_info)
         else:
             return packet_info['parameter']
             
@@ -213,45 +216,3 @@ class ZigBee(XBeeBase):
     def __init__(self, *args, **kwargs):
         # Call the super class constructor to save the serial port
         super(ZigBee, self).__init__(*args, **kwargs)
-
-    def _parse_samples_header(self, io_bytes):
-        """
-        _parse_samples_header: binary data in XBee ZB IO data format ->
-                        (int, [int ...], [int ...], int, int)
-                        
-        _parse_samples_header will read the first three bytes of the 
-        binary data given and will return the number of samples which
-        follow, a list of enabled digital inputs, a list of enabled
-        analog inputs, the dio_mask, and the size of the header in bytes
-
-        _parse_samples_header is overloaded here to support the additional
-        IO lines offered by the XBee ZB
-        """
-        header_size = 4
-
-        # number of samples (always 1?) is the first byte
-        sample_count = byteToInt(io_bytes[0])
-        
-        # bytes 1 and 2 are the DIO mask; bits 9 and 8 aren't used
-        dio_mask = (byteToInt(io_bytes[1]) << 8 | byteToInt(io_bytes[2])) & 0x0E7F
-        
-        # byte 3 is the AIO mask
-        aio_mask = byteToInt(io_bytes[3])
-        
-        # sorted lists of enabled channels; value is position of bit in mask
-        dio_chans = []
-        aio_chans = []
-        
-        for i in range(0,13):
-            if dio_mask & (1 << i):
-                dio_chans.append(i)
-        
-        dio_chans.sort()
-        
-        for i in range(0,8):
-            if aio_mask & (1 << i):
-                aio_chans.append(i)
-        
-        aio_chans.sort()
-        
-        return (sample_count, dio_chans, aio_chans, dio_mask, header_size)